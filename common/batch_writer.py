@@ -0,0 +1,55 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Writing of large data frames to influx in batches.
+#  influx cannot handle large data frame to be written in one go - it generates excepton
+#  influxdb.exceptions.InfluxDBClientError: 413: {"error":"Request Entity Too Large"}
+#  The data frame is sorted once by time and cut by position into batches of batch_size points,
+#  when influx still answers 413 the batch size is halved and the same batch is written again.
+#  Rows are counted in the sorted data frame, so written batches can be recorded (see ingest_checkpoint.py)
+#  and the next run of the same file can start after the last written row.
+
+from influxdb.exceptions import InfluxDBClientError
+
+import logging
+
+DEFAULT_BATCH_SIZE = 10000
+MIN_BATCH_SIZE = 100
+REQUEST_TOO_LARGE = 413
+
+LOGGER = logging.getLogger(__name__)
+
+
+def is_request_too_large(error):
+    ''' true if influx rejected the write because the request body was too large '''
+    return isinstance(error, InfluxDBClientError) and error.code == REQUEST_TOO_LARGE
+
+
+def write_in_batches(df, write_batch, batch_size=DEFAULT_BATCH_SIZE, start_row=0, on_batch_written=None):
+    ''' writes data frame indexed by time in batches of batch_size points '''
+    ''' write_batch(batch) returns (result, datapoints count) and raises InfluxDBClientError 413 for too large batch '''
+    ''' start_row: rows of the sorted data frame before start_row were written in a previous run and are skipped '''
+    ''' on_batch_written(start row, end row, batch) is called after each written batch '''
+    ''' returns (result, datapoints count, batch size), result is False if a batch was not written '''
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind='stable')
+    rows = df.shape[0]
+    datapoints_count = 0
+    start = start_row
+    while start < rows:
+        batch = df.iloc[start:start + batch_size]
+        try:
+            res = write_batch(batch)
+        except InfluxDBClientError as error:
+            if not is_request_too_large(error) or batch_size <= MIN_BATCH_SIZE:
+                raise
+            batch_size = max(MIN_BATCH_SIZE, batch_size // 2)
+            LOGGER.warning(f"Request Entity Too Large, batch size reduced to {batch_size} datapoints.")
+            continue
+        if res is None or not res[0]:
+            LOGGER.error(f"Batch starting at {batch.index[0]} not written, {datapoints_count} datapoints written before.")
+            return (False, datapoints_count, batch_size)
+        datapoints_count += res[1]
+        if on_batch_written is not None:
+            on_batch_written(start, start + batch.shape[0], batch)
+        start += batch.shape[0]
+    return (True, datapoints_count, batch_size)
@@ -0,0 +1,311 @@
+#Anna Wojciechowska, Oslo, October 2026
+# benchmark suite of the ingestion stages, to catch throughput and memory regressions
+# inputs are generated by synthetic_data.py with fixed seeds, so runs are comparable:
+# an OWHL csv file of --hours at 4 Hz and a Weather Cloud export of --days every 10 minutes
+# stages:
+#   owhl_parse           pd.read_csv of the OWHL file
+#   owhl_timestamps      build_timestamps of the parsed file (owhl_timestamps.py)
+#   owhl_read            read_sensor_file (parse, timestamps, tags) as csv_to_influx.py
+#   slicing              sorting and cutting into --batch-size batches (write_in_batches of batch_writer.py)
+#   serialize            line protocol of the batches and gzip (line_protocol_encoder.py, as LineProtocolWriter)
+#   http                 posting the compressed batches to the fake influx /write (fake_influx_server.py, in process)
+#   owhl_ingest          read_sensor_file and write_in_batches with LineProtocolWriter, end to end
+#   owhl_qc              quality control flags of the parsed file (owhl_qc.py, csv_to_influx.py writes flagged samples only)
+#   owhl_compensate      depth of the parsed file compensated with atmospheric pressure (barometric_compensation.py),
+#                        readings of a synthetic Weather Cloud series covering the file instead of influx, cache empty
+#                        at the start of each run (grids of the windows built and joined to the file), checked once
+#                        against np.interp of the readings at the UTC times of the file (logger time minus utc_offset, UTC+2)
+#   owhl_stream          as owhl_ingest with read_sensor_file_chunks of --chunk-size rows (csv_to_influx.py --chunk-size)
+#   weather_cloud_read   read_weather_cloud_file of the whole export
+#   weather_cloud_new    read_weather_cloud_file after a high-water mark one day before the end of the export
+# every stage runs in its own python process, best of --repeat runs after a warm up run is reported as rows/s,
+# peak RSS is the maximum resident memory of that process (imports, input and stage)
+# --save writes the results as json, --baseline compares with saved results and the exit code is 1 when
+# rows/s of a stage dropped or its peak RSS grew by more than --threshold (0.3 = 30%),
+# short stages vary by 20-30% between runs on a busy or single cpu machine
+# usage: python3 benchmark_ingest.py --save baseline.json
+#        python3 benchmark_ingest.py --baseline baseline.json --threshold 0.3
+
+import subprocess
+import tempfile
+import resource
+import shutil
+import gzip
+import json
+import time
+import sys
+import os
+import argparse
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(REPO_DIR, 'common'))
+sys.path.append(os.path.join(REPO_DIR, 'owhl'))
+sys.path.append(os.path.join(REPO_DIR, 'weather_cloud'))
+
+OWHL_FILE = 'owhl.csv'
+WEATHER_CLOUD_FILE = 'weather_cloud.csv'
+TAGS = ['sensor_model', 'sensor_position']
+FIELDS = ['pressure_mbar', 'temp_c', 'utc_offset']
+
+
+def read_owhl(input_dir):
+    from owhl_csv import read_sensor_file
+    df, meta_data = read_sensor_file(os.path.join(input_dir, OWHL_FILE))
+    return df.set_index('time')
+
+
+def batches_of(df, batch_size):
+    return [df.iloc[start:start + batch_size] for start in range(0, df.shape[0], batch_size)]
+
+
+def stage_owhl_parse(input_dir, args):
+    import pandas as pd
+    path = os.path.join(input_dir, OWHL_FILE)
+    return lambda: pd.read_csv(path, skiprows=1).shape[0]
+
+
+def stage_owhl_timestamps(input_dir, args):
+    import pandas as pd
+    from owhl_timestamps import build_timestamps
+    df = pd.read_csv(os.path.join(input_dir, OWHL_FILE), skiprows=1)
+    return lambda: build_timestamps(df).shape[0]
+
+
+def stage_owhl_read(input_dir, args):
+    from owhl_csv import read_sensor_file
+    path = os.path.join(input_dir, OWHL_FILE)
+    return lambda: read_sensor_file(path)[0].shape[0]
+
+
+def stage_slicing(input_dir, args):
+    import pandas as pd
+    from batch_writer import write_in_batches
+    # rows of the files are in time order but csv_to_influx.py does not rely on it, swapped hours make sorting work
+    blocks = batches_of(read_owhl(input_dir), 4 * 3600)
+    df = pd.concat(blocks[1::2] + blocks[::2])
+    return lambda: write_in_batches(df, lambda batch: (True, batch.shape[0]), args.batch_size)[1]
+
+
+def stage_serialize(input_dir, args):
+    from line_protocol_encoder import encode_lines
+    batches = batches_of(read_owhl(input_dir), args.batch_size)
+    def serialize():
+        rows = 0
+        for batch in batches:
+            lines = encode_lines(batch, 'sensor_test', TAGS, FIELDS, 'ms')
+            gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'), compresslevel=1)
+            rows += len(lines)
+        return rows
+    return serialize
+
+
+def stage_http(input_dir, args):
+    from line_protocol_encoder import encode_lines
+    from influx_line_writer import LineProtocolWriter
+    from fake_influx_server import start_fake_influx
+    server = start_fake_influx(databases=['sensor'])
+    writer = LineProtocolWriter(host='127.0.0.1', port=server.port, database='sensor', precision='ms')
+    bodies = []
+    for batch in batches_of(read_owhl(input_dir), args.batch_size):
+        lines = encode_lines(batch, 'sensor_test', TAGS, FIELDS, 'ms')
+        bodies.append((len(lines), gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'), compresslevel=1)))
+    def post():
+        for points, body in bodies:
+            writer.post(writer.params, body)
+        return sum(points for points, body in bodies)
+    return post
+
+
+def stage_owhl_ingest(input_dir, args):
+    from owhl_csv import read_sensor_file
+    from batch_writer import write_in_batches
+    from influx_line_writer import LineProtocolWriter
+    from fake_influx_server import start_fake_influx
+    server = start_fake_influx(databases=['sensor'])
+    writer = LineProtocolWriter(host='127.0.0.1', port=server.port, database='sensor', precision='ms')
+    path = os.path.join(input_dir, OWHL_FILE)
+    def ingest():
+        df, meta_data = read_sensor_file(path)
+        write_batch = lambda batch: (writer.write_points(batch, 'sensor_test', TAGS, FIELDS), batch.shape[0])
+        return write_in_batches(df.set_index('time'), write_batch, args.batch_size)[1]
+    return ingest
+
+
+def stage_owhl_qc(input_dir, args):
+    from owhl_qc import StreamQC
+    df = read_owhl(input_dir)
+    def flag():
+        StreamQC(TAGS).flagged(df, final=True)
+        return df.shape[0]
+    return flag
+
+
+def stage_owhl_compensate(input_dir, args):
+    import numpy as np
+    import pandas as pd
+    from synthetic_data import weather_cloud_frame
+    from barometric_compensation import BarometricSeries, compensated_depth, hydrostatic_depth, DEPTH_DECIMALS
+    df = read_owhl(input_dir)
+    weather = weather_cloud_frame(end=df.index.max().ceil('1D') + pd.Timedelta(days=1), days=args.hours // 24 + 3)
+    # station times as UTC, enough for a benchmark
+    readings = pd.DataFrame({'atm_pressure_hpa': weather['Pressure (hPa)'].to_numpy(), 'lat': weather['Latitude'].to_numpy(),
+        'lon': weather['Longitude'].to_numpy()}, index=pd.to_datetime(weather['Date (Europe/Oslo)'])).sort_index()
+    fetch = lambda start, end: readings[(readings.index >= start) & (readings.index < end)]
+    utc_ns = (df.index - pd.to_timedelta(df['utc_offset'].astype(np.int64), unit='h')).to_numpy().astype('datetime64[ns]').view(np.int64)
+    reading_ns = readings.index.to_numpy().astype('datetime64[ns]').view(np.int64)
+    expected = np.round(hydrostatic_depth(df['pressure_mbar'].to_numpy(dtype=np.float64),
+        np.interp(utc_ns, reading_ns, readings['atm_pressure_hpa'].to_numpy())), DEPTH_DECIMALS)
+    differences = np.count_nonzero(~np.isclose(compensated_depth(df, BarometricSeries(fetch)), expected, rtol=0, atol=2 * 10.0 ** -DEPTH_DECIMALS))
+    if differences:
+        raise ValueError(f"{differences} depths differ from the air pressure at the UTC times of the file")
+    def compensate():
+        compensated_depth(df, BarometricSeries(fetch))
+        return df.shape[0]
+    return compensate
+
+
+def stage_owhl_stream(input_dir, args):
+    from owhl_csv import sensor_file_metadata, read_sensor_file_chunks
+    from batch_writer import write_in_batches
+    from influx_line_writer import LineProtocolWriter
+    from fake_influx_server import start_fake_influx
+    server = start_fake_influx(databases=['sensor'])
+    writer = LineProtocolWriter(host='127.0.0.1', port=server.port, database='sensor', precision='ms')
+    path = os.path.join(input_dir, OWHL_FILE)
+    def ingest():
+        rows = 0
+        write_batch = lambda batch: (writer.write_points(batch, 'sensor_test', TAGS, FIELDS), batch.shape[0])
+        for chunk, decimals in read_sensor_file_chunks(path, sensor_file_metadata(path), args.chunk_size):
+            rows += write_in_batches(chunk, write_batch, args.batch_size)[1]
+        return rows
+    return ingest
+
+
+def stage_weather_cloud_read(input_dir, args):
+    from weather_cloud_csv import read_weather_cloud_file
+    path = os.path.join(input_dir, WEATHER_CLOUD_FILE)
+    return lambda: read_weather_cloud_file(path)[0].shape[0]
+
+
+def stage_weather_cloud_new(input_dir, args):
+    import pandas as pd
+    from weather_cloud_csv import read_weather_cloud_file
+    path = os.path.join(input_dir, WEATHER_CLOUD_FILE)
+    df, skipped = read_weather_cloud_file(path)
+    after = df.index.max() - pd.Timedelta(days=1)
+    def read_new():
+        read_weather_cloud_file(path, after)
+        # rows/s counts all rows of the export, also the rows up to the mark which are not decoded
+        return df.shape[0]
+    return read_new
+
+
+STAGES = {
+    'owhl_parse': stage_owhl_parse,
+    'owhl_timestamps': stage_owhl_timestamps,
+    'owhl_read': stage_owhl_read,
+    'slicing': stage_slicing,
+    'serialize': stage_serialize,
+    'http': stage_http,
+    'owhl_ingest': stage_owhl_ingest,
+    'owhl_qc': stage_owhl_qc,
+    'owhl_compensate': stage_owhl_compensate,
+    'owhl_stream': stage_owhl_stream,
+    'weather_cloud_read': stage_weather_cloud_read,
+    'weather_cloud_new': stage_weather_cloud_new,
+}
+
+
+def run_stage(name, input_dir, args):
+    ''' runs stage in this process, returns {rows, seconds, rows_per_s, peak_rss_mb} '''
+    stage = STAGES[name](input_dir, args)
+    # first run is not measured, it fills the page cache and the lazy caches of pandas
+    stage()
+    best = None
+    for i in range(args.repeat):
+        start = time.perf_counter()
+        rows = stage()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {'rows': rows, 'seconds': round(best, 4), 'rows_per_s': round(rows / best), 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+
+def peak_rss_mb():
+    ''' peak resident memory of this process, VmHWM of /proc (ru_maxrss keeps the peak of the parent across exec) '''
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    # ru_maxrss is in kB on linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def generate_inputs(input_dir, args):
+    from synthetic_data import write_owhl_csv, write_weather_cloud_export
+    owhl_rows = write_owhl_csv(os.path.join(input_dir, OWHL_FILE), hours=args.hours, seed=0)
+    weather_cloud_rows = write_weather_cloud_export(os.path.join(input_dir, WEATHER_CLOUD_FILE), days=args.days, seed=0)
+    print(f"inputs: OWHL {owhl_rows} rows, Weather Cloud {weather_cloud_rows} rows")
+
+
+def regressions(results, baseline, threshold):
+    ''' list of messages for stages slower or larger than in baseline by more than threshold '''
+    messages = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        if result['rows_per_s'] < before['rows_per_s'] * (1 - threshold):
+            messages.append(f"{name}: {result['rows_per_s']} rows/s, baseline {before['rows_per_s']} rows/s")
+        if result['peak_rss_mb'] > before['peak_rss_mb'] * (1 + threshold):
+            messages.append(f"{name}: peak RSS {result['peak_rss_mb']} MB, baseline {before['peak_rss_mb']} MB")
+    return messages
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+parser.add_argument('--hours', type=int, default=24, help="hours of 4 Hz data of the OWHL file")
+parser.add_argument('--days', type=int, default=365, help="days of history of the Weather Cloud export")
+parser.add_argument('-b', '--batch-size', type=int, default=10000)
+parser.add_argument('--chunk-size', type=int, default=200000, help="rows of a chunk of owhl_stream")
+parser.add_argument('--repeat', type=int, default=5)
+parser.add_argument('--save', default=None, help="writes results to this json file")
+parser.add_argument('--baseline', default=None, help="json file of results saved before")
+parser.add_argument('--threshold', type=float, default=0.3,
+    help="allowed drop of rows/s and growth of peak RSS compared with --baseline, as fraction")
+# internal: runs one stage on generated inputs and prints its result as json
+parser.add_argument('--run-stage', default=None, help=argparse.SUPPRESS)
+parser.add_argument('--input-dir', default=None, help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+if args.run_stage:
+    print(json.dumps(run_stage(args.run_stage, args.input_dir, args)))
+    sys.exit(0)
+
+input_dir = tempfile.mkdtemp(prefix='benchmark_ingest_')
+generate_inputs(input_dir, args)
+results = {}
+for name in args.stages:
+    command = [sys.executable, os.path.abspath(__file__), '--run-stage', name, '--input-dir', input_dir,
+               '--repeat', str(args.repeat), '--batch-size', str(args.batch_size), '--chunk-size', str(args.chunk_size)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    results[name] = json.loads(output.strip().splitlines()[-1])
+    result = results[name]
+    print(f"{name:20} {result['rows']:>9} rows {result['seconds']:>8.3f} s {result['rows_per_s']:>11} rows/s  peak RSS {result['peak_rss_mb']:>7.1f} MB")
+shutil.rmtree(input_dir)
+
+if args.save:
+    with open(args.save, 'w') as file:
+        json.dump({'hours': args.hours, 'days': args.days, 'batch_size': args.batch_size, 'stages': results}, file, indent=1)
+if args.baseline:
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if (baseline['hours'], baseline['days'], baseline['batch_size']) != (args.hours, args.days, args.batch_size):
+        print(f"baseline was measured with --hours {baseline['hours']} --days {baseline['days']} --batch-size {baseline['batch_size']}")
+        sys.exit(2)
+    messages = regressions(results, baseline['stages'], args.threshold)
+    for message in messages:
+        print(f"REGRESSION {message}")
+    if messages:
+        sys.exit(1)
+    print(f"no regression above {args.threshold:.0%} compared with {args.baseline}")
@@ -0,0 +1,91 @@
+#Anna Wojciechowska, Oslo, October 2026
+# compares line protocol built by DataFrameClient with encode_lines from line_protocol_encoder.py
+# checks both give byte for byte the same lines (nanosecond precision) and prints the timings
+# usage: python3 benchmark_line_protocol.py [OWHL csv files]
+# without files synthetic OWHL data (24 hours at 4 Hz) and weather cloud like data with missing values are used
+
+from influxdb import DataFrameClient
+
+import pandas as pd
+import numpy as np
+
+import sys
+import os
+import time
+
+import argparse
+
+from line_protocol_encoder import encode_lines
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'owhl'))
+from owhl_csv import read_sensor_file
+
+OWHL_TAGS = ['sensor_model', 'sensor_position']
+OWHL_FIELDS = ['pressure_mbar', 'temp_c', 'utc_offset']
+
+
+def synthetic_owhl(hours=24):
+    index = pd.DatetimeIndex(np.datetime64('2024-06-18', 'ns') + np.arange(hours * 3600 * 4) * np.timedelta64(250, 'ms'), name='time')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'pressure_mbar': (1013 + rng.normal(0, 5, index.size)).round(2),
+        'temp_c': (15 + rng.normal(0, 0.1, index.size)).round(2),
+        'utc_offset': 2,
+        'sensor_model': 'sensor_05.07.2024',
+        'sensor_position': 'SALTSTEIN_E'}, index=index)
+
+
+def synthetic_weather(days=365):
+    index = pd.DatetimeIndex(np.datetime64('2024-01-01', 'ns') + np.arange(days * 24 * 12) * np.timedelta64(5, 'm'), name='time')
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'temp_c': (5 + rng.normal(0, 5, index.size)).round(1),
+        'humidity_percent': rng.integers(20, 100, index.size).astype(float),
+        'atm_pressure_hpa': (1013 + rng.normal(0, 10, index.size)).round(1),
+        'sensor_type': 'skywatch_bl_500',
+        'position': 'Hospitveien 12b'}, index=index)
+    df.loc[df.sample(frac=0.05, random_state=0).index, 'humidity_percent'] = np.nan
+    return df
+
+
+def best_time(function, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def benchmark(name, df, measurement, tags, fields, repeat):
+    client = DataFrameClient()
+    old, old_time = best_time(lambda: client._convert_dataframe_to_lines(df, measurement, field_columns=fields, tag_columns=tags), repeat)
+    new, new_time = best_time(lambda: encode_lines(df, measurement, tags, fields), repeat)
+    identical = '\n'.join(old).encode('utf-8') == '\n'.join(new).encode('utf-8')
+    print(f"{name}: {df.shape[0]} rows, DataFrameClient {old_time * 1000:.0f} ms, encode_lines {new_time * 1000:.0f} ms, "
+          f"speedup {old_time / new_time:.1f}x, identical: {identical}")
+    return identical
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('files', nargs='*', help="OWHL csv files")
+parser.add_argument('-r', '--repeat', type=int, default=3, help="number of runs, best time is reported")
+args = parser.parse_args()
+
+all_identical = True
+if not args.files:
+    all_identical &= benchmark('synthetic OWHL 24h 4Hz', synthetic_owhl(), 'sensor_test', OWHL_TAGS, OWHL_FIELDS, args.repeat)
+    weather = synthetic_weather()
+    all_identical &= benchmark('synthetic weather cloud 1 year', weather, 'weather_cloud', ['sensor_type', 'position'],
+        ['temp_c', 'humidity_percent', 'atm_pressure_hpa'], args.repeat)
+for file_path in args.files:
+    df, meta_data = read_sensor_file(file_path)
+    if df is not None:
+        df = df.set_index('time')
+        all_identical &= benchmark(file_path, df, 'sensor_test', OWHL_TAGS, OWHL_FIELDS, args.repeat)
+
+if not all_identical:
+    print("line protocol differs")
+    sys.exit(1)
@@ -0,0 +1,98 @@
+#Anna Wojciechowska, Oslo, October 2026
+# compares reading a range with one DataFrameClient.query and with InfluxQueryClient (influx_query_client.py)
+# against local fake influx (fake_influx_server.py --keep-lines in its own process, so its memory is not counted):
+# chunked without cache, cold cache, warm cache and warm cache after one hour block was written again
+# (only that block is fetched)
+# prints time, rows read from influx and peak memory allocated by python during the read (tracemalloc)
+# the fake server answers selects in python, much slower than influx, cold reads show the cost of the
+# server rather than of the client, warm reads show what a repeated analysis saves
+# usage: python3 benchmark_query_cache.py --hours 12 --chunk-size 10000
+
+from influxdb import DataFrameClient
+
+import pandas as pd
+import numpy as np
+
+import subprocess
+import tempfile
+import tracemalloc
+import argparse
+import socket
+import time
+import sys
+import os
+
+import requests
+
+from influx_line_writer import LineProtocolWriter
+from influx_query_client import InfluxQueryClient, BlockCache
+
+
+def synthetic_frame(hours):
+    index = pd.date_range('2024-06-18', periods=hours * 3600 * 4, freq='250ms', name='time')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'pressure_mbar': (1013 + rng.normal(0, 5, index.size)).round(2),
+        'temp_c': (15 + rng.normal(0, 0.1, index.size)).round(2),
+        'sensor_position': 'SALTSTEIN_E'}, index=index)
+
+
+def start_server_process():
+    ''' fake influx with kept points in a child process, returns (process, port) '''
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_influx_server.py'),
+                                '--port', str(port), '--database', 'sensor', '--keep-lines'], stdout=subprocess.DEVNULL)
+    for attempt in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/ping", timeout=1)
+            return process, port
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("fake influx did not start")
+
+
+def run(name, read, client=None):
+    rows_before = client.stats['rows'] if client is not None else 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = read()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    from_influx = f", {client.stats['rows'] - rows_before} rows from influx" if client is not None else ''
+    print(f"{name:32s} {rows} rows in {elapsed:.3f} s, peak {peak:.1f} MB{from_influx}")
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--hours', type=int, default=12, help="hours of 4 Hz data")
+parser.add_argument('--chunk-size', type=int, default=10000)
+args = parser.parse_args()
+
+df = synthetic_frame(args.hours)
+server, port = start_server_process()
+writer = LineProtocolWriter(host='127.0.0.1', port=port, database='sensor', precision='ms', block_markers={'sensor_test'})
+for start in range(0, df.shape[0], 50000):
+    writer.write_points(df.iloc[start:start + 50000], 'sensor_test', ['sensor_position'], ['pressure_mbar', 'temp_c'])
+first, last = df.index[0], df.index[-1] + pd.Timedelta('250ms')
+fields = ['pressure_mbar', 'temp_c']
+
+client = DataFrameClient(host='127.0.0.1', port=port, database='sensor')
+statement = f"SELECT \"pressure_mbar\", \"temp_c\" FROM \"sensor_test\" WHERE time >= {first.value} AND time < {last.value}"
+run('DataFrameClient.query', lambda: client.query(statement, epoch='ns')['sensor_test'].shape[0])
+
+chunked = InfluxQueryClient(host='127.0.0.1', port=port, database='sensor', chunk_size=args.chunk_size)
+run('chunked, no cache', lambda: chunked.read_arrays('sensor_test', fields, first, last)[0].size, chunked)
+
+cached = InfluxQueryClient(host='127.0.0.1', port=port, database='sensor', chunk_size=args.chunk_size,
+                           cache=BlockCache(tempfile.mkdtemp(prefix='query_cache_')))
+read_cached = lambda: cached.read_arrays('sensor_test', fields, first, last)[0].size
+run('chunked, cold cache', read_cached, cached)
+run('chunked, warm cache', read_cached, cached)
+writer.write_points(df.iloc[:4 * 3600], 'sensor_test', ['sensor_position'], ['pressure_mbar', 'temp_c'])
+run('warm cache, first hour written', read_cached, cached)
+print(cached.report())
+writer.close()
+server.kill()
@@ -0,0 +1,70 @@
+#Anna Wojciechowska, Oslo, October 2026
+# compares startup of the ingest scripts run one by one (one cron job per script) with ingest.py
+# every pipeline is started with empty data directories (dry run), so the measured time is the cold start:
+# interpreter, imports, log, credentials and argument parsing; best of --repeat runs in seconds
+# --repo can point to another checkout, e.g. of a commit before ingest.py (git worktree add /tmp/before <commit>)
+# usage: python3 benchmark_startup.py --repeat 5 [--repo /tmp/before]
+
+import subprocess
+import tempfile
+import shutil
+import time
+import sys
+import os
+import argparse
+
+# pipeline: (directory, script, arguments), forecast has no dry run before ingest.py, --help parses arguments only
+PIPELINES = {
+    'owhl': ('owhl', 'csv_to_influx.py', ['-d']),
+    'weather-cloud': ('weather_cloud', 'store_weather_cloud_data.py', ['-d']),
+    'locations': ('owhl', 'store_sensor_location_data_to_influx.py', ['-d']),
+    'forecast': ('forecast', 'get_forecast_data.py', ['--help']),
+}
+
+
+def make_run_dir(repo):
+    ''' directories of the pipelines with empty data directories and credentials '''
+    base_dir = tempfile.mkdtemp(prefix='startup_')
+    for directory in ['owhl/sensor_data', 'weather_cloud/weather_cloud_data', 'forecast', 'database_settings']:
+        os.makedirs(os.path.join(base_dir, directory))
+    with open(os.path.join(base_dir, 'database_settings', 'influxdb_credentials'), 'w') as file:
+        file.write('{"username": "user", "password": "password"}')
+    shutil.copy(os.path.join(repo, 'owhl', 'sensor_location_data.csv'), os.path.join(base_dir, 'owhl'))
+    return base_dir
+
+
+def best_time(command, cwd, repeat):
+    ''' shortest wall time of repeat runs of command '''
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--repo', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+parser.add_argument('--repeat', type=int, default=5)
+args = parser.parse_args()
+
+repo = os.path.abspath(args.repo)
+base_dir = make_run_dir(repo)
+runner = os.path.join(repo, 'ingest.py')
+print(f"python without imports: {best_time([sys.executable, '-c', 'pass'], base_dir, args.repeat):.3f} s")
+scripts_total = 0
+for name, (directory, script, arguments) in PIPELINES.items():
+    script_time = best_time([sys.executable, os.path.join(repo, directory, script)] + arguments, os.path.join(base_dir, directory), args.repeat)
+    scripts_total += script_time
+    line = f"{name}: script {script_time:.3f} s"
+    if os.path.exists(runner):
+        runner_time = best_time([sys.executable, runner, '--base-dir', base_dir, name] + arguments, base_dir, args.repeat)
+        line += f", ingest.py {runner_time:.3f} s"
+    print(line)
+print(f"all pipelines as separate scripts: {scripts_total:.3f} s")
+if os.path.exists(runner):
+    command = [sys.executable, runner, '--base-dir', base_dir]
+    for name, (directory, script, arguments) in PIPELINES.items():
+        command += [name] + arguments + ['+']
+    print(f"all pipelines in one ingest.py process: {best_time(command[:-1], base_dir, args.repeat):.3f} s")
+shutil.rmtree(base_dir)
@@ -0,0 +1,67 @@
+#Anna Wojciechowska, Oslo, October 2026
+# compares DataFrameClient.write_points with LineProtocolWriter against local fake influx (fake_influx_server.py)
+# writes the same synthetic OWHL like data (4 Hz pressure and temperature) in batches with both
+# and prints time, requests and bytes received by the server
+# usage: python3 benchmark_writer.py --hours 24 --batch-size 10000 --concurrent-writes 4
+
+from influxdb import DataFrameClient
+
+import pandas as pd
+import numpy as np
+
+import time
+import argparse
+
+from fake_influx_server import start_fake_influx
+from influx_line_writer import LineProtocolWriter
+
+
+def synthetic_frame(hours):
+    index = pd.date_range('2024-06-18', periods=hours * 3600 * 4, freq='250ms', name='time')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'pressure_mbar': (1013 + rng.normal(0, 5, index.size)).round(2),
+        'temp_c': (15 + rng.normal(0, 0.1, index.size)).round(2),
+        'utc_offset': 2,
+        'sensor_model': 'sensor_05.07.2024',
+        'sensor_position': 'SALTSTEIN_E'}, index=index)
+
+
+def run(name, server, write):
+    before = dict(server.stats)
+    start = time.perf_counter()
+    write()
+    elapsed = time.perf_counter() - start
+    requests = server.stats['requests'] - before['requests']
+    received = server.stats['received_bytes'] - before['received_bytes']
+    points = server.stats['points'] - before['points']
+    print(f"{name}: {points} points, {requests} requests, {received} bytes received, {elapsed:.2f} s")
+    return received
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--hours', type=int, default=6, help="hours of 4 Hz data")
+parser.add_argument('-b', '--batch-size', type=int, default=10000)
+parser.add_argument('-c', '--concurrent-writes', type=int, default=4)
+parser.add_argument('--precision', default='ms')
+args = parser.parse_args()
+
+tags = ['sensor_model', 'sensor_position']
+fields = ['pressure_mbar', 'temp_c', 'utc_offset']
+df = synthetic_frame(args.hours)
+batches = [df.iloc[i:i + args.batch_size] for i in range(0, df.shape[0], args.batch_size)]
+server = start_fake_influx(databases=['sensor'])
+
+client = DataFrameClient(host='127.0.0.1', port=server.port, database='sensor')
+def write_with_client():
+    for batch in batches:
+        client.write_points(batch, 'sensor_test', tag_columns=tags, field_columns=fields, protocol='line')
+client_bytes = run('DataFrameClient', server, write_with_client)
+
+writer = LineProtocolWriter(host='127.0.0.1', port=server.port, database='sensor',
+    precision=args.precision, concurrent_writes=args.concurrent_writes)
+writer_bytes = run('LineProtocolWriter', server, lambda: writer.write_batches(batches, 'sensor_test', tags, fields))
+print(writer.report())
+print(f"bytes received: {writer_bytes} instead of {client_bytes}, {100 * (1 - writer_bytes / client_bytes):.1f}% saved")
+writer.close()
+server.shutdown()
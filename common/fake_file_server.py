@@ -0,0 +1,142 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Local stand-in for a file server such as thredds.met.no fileServer, for trying out http_download.py.
+#  It serves the files of a directory like thredds (Tomcat):
+#  GET/HEAD /<path>   200 with ETag, Last-Modified and Content-Length,
+#                     304 when If-None-Match matches the ETag or the file is not modified since If-Modified-Since,
+#                     206 with Content-Range for Range: bytes=<start>- (when If-Range matches, otherwise 200),
+#                     416 when the range starts after the end of the file, 404 for unknown files
+#  --drop-after N closes the connection after N bytes of the body of the first transfer of each file,
+#  to simulate interrupted downloads.
+#  It counts requests, answers per status and bytes sent.
+#  usage: python3 fake_file_server.py --port 8087 --directory /tmp/thredds --drop-after 1000000
+#  or in-process: server = start_fake_file_server(directory); ...; server.shutdown()
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlparse, unquote
+
+import os
+import re
+import threading
+import argparse
+
+RANGE = re.compile(r'bytes=(\d+)-$')
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class FakeFileHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def count(self, status, sent=0):
+        with self.server.stats_lock:
+            self.server.stats['requests'] += 1
+            self.server.stats[status] = self.server.stats.get(status, 0) + 1
+            self.server.stats['sent_bytes'] += sent
+
+    def answer(self, status, headers=None):
+        self.count(status)
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return if_none_match == etag
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        server = self.server
+        path = os.path.join(server.directory, unquote(urlparse(self.path).path).lstrip('/'))
+        if not os.path.isfile(path):
+            return self.answer(404)
+        stat = os.stat(path)
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        validators = {'ETag': etag, 'Last-Modified': last_modified, 'Accept-Ranges': 'bytes'}
+        if self.not_modified(etag, stat.st_mtime):
+            return self.answer(304, validators)
+        start, status = 0, 200
+        requested = RANGE.match(self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        if requested and (if_range is None or if_range in (etag, last_modified)):
+            start, status = int(requested.group(1)), 206
+            if start >= stat.st_size:
+                return self.answer(416, {'Content-Range': f'bytes */{stat.st_size}'})
+        self.send_response(status)
+        for key, value in validators.items():
+            self.send_header(key, value)
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{stat.st_size - 1}/{stat.st_size}')
+        self.send_header('Content-Length', str(stat.st_size - start))
+        self.send_header('Content-Type', 'application/x-netcdf')
+        self.end_headers()
+        sent = 0
+        if body:
+            with server.stats_lock:
+                drop_after = server.drop_after if path not in server.dropped else None
+                server.dropped.add(path)
+            with open(path, 'rb') as file:
+                file.seek(start)
+                for chunk in iter(lambda: file.read(COPY_CHUNK_SIZE), b''):
+                    if drop_after is not None and sent + len(chunk) > drop_after:
+                        self.wfile.write(chunk[:drop_after - sent])
+                        sent = drop_after
+                        self.close_connection = True
+                        break
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+        self.count(status, sent)
+
+
+class FakeFileServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, directory, drop_after=None):
+        super().__init__(address, FakeFileHandler)
+        self.directory = directory
+        self.drop_after = drop_after
+        self.dropped = set()
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'sent_bytes': 0}
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+def start_fake_file_server(directory, port=0, drop_after=None):
+    ''' starts fake file server in a background thread, port 0 picks a free port, see server.port '''
+    server = FakeFileServer(('127.0.0.1', port), directory, drop_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-p', '--port', type=int, default=8087)
+    parser.add_argument('--directory', default='.', help="directory with the served files")
+    parser.add_argument('--drop-after', type=int, default=None,
+        help="closes the connection after this many bytes of the first transfer of each file")
+    args = parser.parse_args()
+    server = FakeFileServer(('127.0.0.1', args.port), args.directory, args.drop_after)
+    print(f"fake file server listening on 127.0.0.1:{server.port}, serving {os.path.abspath(args.directory)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.stats)
@@ -0,0 +1,249 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Local stand-in for the influx db 1.8 http api, for trying out writers without a database.
+#  It answers like influx 1.8:
+#  POST /write?db=<database>&precision=<n|u|ms|s>  204 when written,
+#       404 {"error":"database not found: ..."} for unknown database,
+#       413 {"error":"Request Entity Too Large"} when body is larger than max_body_size,
+#       400 for malformed lines, gzip compressed bodies are accepted (Content-Encoding: gzip)
+#  GET or POST /query?db=<database>&q=<statement> 200 {"results":[{"statement_id":0}]}, statements are not executed,
+#       except with keep_lines simple selects of the kept points (select_points):
+#       SELECT "field", ... FROM ["rp".]"measurement" [WHERE "tag" = 'value' AND time >= <ns> AND time < <ns> ...]
+#       answered as influx 1.8 does (one series, sorted by time, epoch=ns timestamps, chunked=true&chunk_size=
+#       as one json object per line), enough for influx_query_client.py and barometric_compensation.py
+#  GET  /ping                                     204
+#  It counts requests, received bytes and points, nothing is stored.
+#  usage: python3 fake_influx_server.py --port 8086 --database sensor --database weather_cloud [--keep-lines]
+#  or in-process: server = start_fake_influx(databases=['sensor']); ...; server.shutdown()
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import re
+import gzip
+import json
+import threading
+import argparse
+
+
+class FakeInfluxHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def answer(self, status, error=None):
+        self.answer_json(status, {'error': error} if error else None)
+
+    def answer_json(self, status, content):
+        body = json.dumps(content).encode('utf-8') if content else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/ping':
+            self.answer(204)
+        elif url.path == '/query':
+            self.answer_query(parse_qs(url.query))
+        else:
+            self.answer(404, 'not found')
+
+    def answer_query(self, params):
+        server = self.server
+        with server.stats_lock:
+            server.stats['queries'] += 1
+        statement = params.get('q', [''])[0]
+        if server.keep_lines and SELECT.match(statement):
+            return self.answer_select(params, statement)
+        return self.answer_json(200, {'results': [{'statement_id': 0}]})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        if url.path == '/query':
+            return self.answer_query(params)
+        if url.path != '/write':
+            return self.answer(404, 'not found')
+        database = params.get('db', [None])[0]
+        if database is None:
+            return self.answer(400, 'database is required')
+        if server.databases and database not in server.databases:
+            return self.answer(404, f'database not found: "{database}"')
+        if server.max_body_size and len(data) > server.max_body_size:
+            return self.answer(413, 'Request Entity Too Large')
+        body = gzip.decompress(data) if self.headers.get('Content-Encoding') == 'gzip' else data
+        lines = [line for line in body.split(b'\n') if line and not line.startswith(b'#')]
+        if any(line.count(b' ') < 1 for line in lines):
+            return self.answer(400, 'unable to parse')
+        with server.stats_lock:
+            server.stats['requests'] += 1
+            server.stats['received_bytes'] += len(data)
+            server.stats['body_bytes'] += len(body)
+            server.stats['points'] += len(lines)
+            if server.keep_lines:
+                server.kept.append((len(server.lines), database, params.get('rp', [''])[0], params.get('precision', ['n'])[0]))
+                server.lines.extend(lines)
+        self.answer(204)
+
+
+    def answer_select(self, params, statement):
+        ''' answers a select of the kept points, chunked when asked to '''
+        try:
+            columns, rows, name = select_points(self.server, params.get('db', [''])[0], statement)
+        except ValueError as error:
+            return self.answer_json(400, {'error': str(error)})
+        if params.get('epoch', [None])[0] is None:
+            rows = [[rfc3339_time(row[0])] + row[1:] for row in rows]
+        chunk_size = int(params.get('chunk_size', ['10000'])[0])
+        chunked = params.get('chunked', ['false'])[0] == 'true'
+        if not chunked:
+            chunk_size = max(len(rows), 1)
+        bodies = []
+        for start in range(0, max(len(rows), 1), chunk_size):
+            result = {'statement_id': 0}
+            if rows:
+                result['series'] = [{'name': name, 'columns': columns, 'values': rows[start:start + chunk_size]}]
+                if start + chunk_size < len(rows):
+                    result['partial'] = True
+            bodies.append(json.dumps({'results': [result]}))
+        body = ('\n'.join(bodies) + '\n').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+SELECT = re.compile(r'^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?:"(?P<rp>[^"]+)"\.)?"?(?P<measurement>[^"\s]+)"?(?:\s+WHERE\s+(?P<where>.+?))?\s*$', re.IGNORECASE)
+CONDITION = re.compile(r'^\s*(?:"(?P<tag>[^"]+)"\s*=\s*\'(?P<value>(?:[^\'\\]|\\.)*)\'|time\s*(?P<op>>=|<=|>|<)\s*(?P<time>-?\d+))\s*$', re.IGNORECASE)
+PRECISION_NS = {'n': 1, 'u': 10**3, 'ms': 10**6, 's': 10**9, 'm': 60 * 10**9, 'h': 3600 * 10**9}
+
+
+def rfc3339_time(time_ns):
+    ''' RFC3339 time as answered without epoch '''
+    from datetime import datetime, timezone
+    return datetime.fromtimestamp(time_ns // 10**9, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S') + f".{time_ns % 10**9:09d}Z"
+
+
+def unescape(value):
+    return re.sub(r'\\(.)', r'\1', value)
+
+
+def parse_line(line):
+    ''' (measurement, tags, fields, time) of a line protocol line, time in the precision of its request '''
+    key, rest = re.split(r'(?<!\\) ', line, maxsplit=1)
+    field_part, time = rest.rsplit(' ', 1)
+    measurement, *tag_parts = re.split(r'(?<!\\),', key)
+    tags = dict(unescape(part).split('=', 1) for part in tag_parts)
+    fields = {}
+    for name, value in re.findall(r'((?:[^,=\\]|\\.)+)=("(?:[^"\\]|\\.)*"|[^,]*)', field_part):
+        if value.startswith('"'):
+            fields[unescape(name)] = value[1:-1].replace('\\"', '"')
+        elif value.endswith('i'):
+            fields[unescape(name)] = int(value[:-1])
+        elif value in ('t', 'true', 'T', 'True'):
+            fields[unescape(name)] = True
+        elif value in ('f', 'false', 'F', 'False'):
+            fields[unescape(name)] = False
+        else:
+            fields[unescape(name)] = float(value)
+    return unescape(measurement), tags, fields, int(time)
+
+
+def select_points(server, database, statement):
+    ''' (columns, rows, measurement) of a simple select of the kept points, see the header '''
+    match = SELECT.match(statement)
+    fields = [field.strip().strip('"') for field in match.group('fields').split(',')]
+    measurement, rp = match.group('measurement'), match.group('rp') or ''
+    tags, times = {}, []
+    if match.group('where'):
+        for condition in re.split(r'\s+AND\s+', match.group('where'), flags=re.IGNORECASE):
+            parsed = CONDITION.match(condition)
+            if parsed is None:
+                raise ValueError(f"condition not supported by fake influx: {condition}")
+            if parsed.group('tag'):
+                tags[parsed.group('tag')] = unescape(parsed.group('value'))
+            else:
+                times.append((parsed.group('op'), int(parsed.group('time'))))
+    compare = {'>=': lambda a, b: a >= b, '>': lambda a, b: a > b, '<=': lambda a, b: a <= b, '<': lambda a, b: a < b}
+    points = {}
+    with server.stats_lock:
+        kept = list(server.kept) + [(len(server.lines), None, None, None)]
+        lines = list(server.lines)
+    prefix = measurement.replace(' ', '\\ ').replace(',', '\\,').encode('utf-8')
+    for (first, db, request_rp, precision), next_request in zip(kept[:-1], kept[1:]):
+        if db != database or request_rp != rp:
+            continue
+        for index in range(first, next_request[0]):
+            line = lines[index]
+            if not (line.startswith(prefix + b',') or line.startswith(prefix + b' ')):
+                continue
+            # lines are parsed once, by the first select reading them
+            if index not in server.parsed:
+                name, line_tags, line_fields, time = parse_line(line.decode('utf-8'))
+                server.parsed[index] = (name, line_tags, line_fields, time * PRECISION_NS[precision])
+            name, line_tags, line_fields, time = server.parsed[index]
+            if name != measurement or any(line_tags.get(tag) != value for tag, value in tags.items()):
+                continue
+            if not all(compare[op](time, value) for op, value in times):
+                continue
+            # a point with the same series and time is replaced, its fields merged
+            points.setdefault((time, tuple(sorted(line_tags.items()))), {}).update(line_fields)
+    merged = {}
+    for (time, series), values in sorted(points.items()):
+        row = merged.setdefault(time, {})
+        row.update(values)
+    rows = [[time] + [values.get(field) for field in fields] for time, values in sorted(merged.items())
+            if any(field in values for field in fields)]
+    return ['time'] + fields, rows, measurement
+
+
+class FakeInfluxServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, databases=None, max_body_size=None, keep_lines=False):
+        super().__init__(address, FakeInfluxHandler)
+        self.databases = set(databases or [])
+        self.max_body_size = max_body_size
+        self.keep_lines = keep_lines
+        self.lines = []
+        # (index of the first kept line, database, retention policy, precision) of each request
+        self.kept = []
+        # index of kept line -> (measurement, tags, fields, time in ns), see select_points
+        self.parsed = {}
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'received_bytes': 0, 'body_bytes': 0, 'points': 0, 'queries': 0}
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+def start_fake_influx(port=0, databases=None, max_body_size=None, keep_lines=False):
+    ''' starts fake influx in a background thread, port 0 picks a free port, see server.port '''
+    server = FakeInfluxServer(('127.0.0.1', port), databases, max_body_size, keep_lines)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-p', '--port', type=int, default=8086)
+    parser.add_argument('--database', action='append', help="accepted database, any database when not given")
+    parser.add_argument('--max-body-size', type=int, default=None,
+        help="bodies larger than this many bytes are rejected with 413 Request Entity Too Large")
+    parser.add_argument('--keep-lines', action='store_true',
+        help="keeps written lines in memory and answers simple selects of them")
+    args = parser.parse_args()
+    server = FakeInfluxServer(('127.0.0.1', args.port), args.database, args.max_body_size, args.keep_lines)
+    print(f"fake influx listening on 127.0.0.1:{server.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.stats)
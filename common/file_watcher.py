@@ -0,0 +1,134 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Watching of a data directory for new, completely written files.
+#  On linux inotify is used (through libc with ctypes, no extra package needed):
+#  a file is ready when it is closed after writing (IN_CLOSE_WRITE) or moved into the directory (IN_MOVED_TO).
+#  Where inotify is not available the directory is polled and a file is ready
+#  when its size and modification time did not change for stable_time seconds.
+#  The directory is also scanned every rescan_interval seconds, so files left after a failed write are retried.
+
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import time
+import logging
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = os.O_NONBLOCK
+EVENT_HEADER = struct.Struct('iIII')
+
+LOGGER = logging.getLogger(__name__)
+
+
+def inotify_watch(directory):
+    ''' returns inotify file descriptor watching directory, None when inotify is not available '''
+    library = ctypes.util.find_library('c')
+    if library is None:
+        return None
+    try:
+        libc = ctypes.CDLL(library, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class DirectoryWatcher:
+    ''' returns names of files in directory matching pattern once they are completely written '''
+
+    def __init__(self, directory, pattern='*.csv', poll_interval=0.5, stable_time=1.0, rescan_interval=60, use_inotify=True):
+        self.directory = directory
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.stable_time = stable_time
+        self.rescan_interval = rescan_interval
+        self.inotify_fd = inotify_watch(directory) if use_inotify else None
+        # polling: file name -> (size, modification time, time when first seen with them)
+        self.seen = {}
+        # polling: (file name, size, modification time) already returned, cleared on rescan
+        self.reported = set()
+        self.last_rescan = time.monotonic()
+        LOGGER.info(f"Watching {directory} using {'inotify' if self.inotify_fd is not None else 'polling'}.")
+
+    def matching_files(self):
+        return [name for name in os.listdir(self.directory) if fnmatch.fnmatch(name, self.pattern)]
+
+    def read_inotify_events(self, timeout):
+        ''' names of files closed after writing or moved into directory during timeout seconds '''
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not readable:
+            return []
+        names = []
+        try:
+            data = os.read(self.inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode()
+            offset += length
+            if fnmatch.fnmatch(name, self.pattern) and name not in names:
+                names.append(name)
+        return names
+
+    def stable_files(self):
+        ''' polling: files with size and modification time unchanged for stable_time seconds '''
+        now = time.monotonic()
+        ready = []
+        current = {}
+        for name in self.matching_files():
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self.seen.get(name)
+            first_seen = previous[2] if previous is not None and previous[:2] == signature else now
+            current[name] = signature + (first_seen,)
+            if now - first_seen >= self.stable_time and (name,) + signature not in self.reported:
+                self.reported.add((name,) + signature)
+                ready.append(name)
+        self.seen = current
+        return ready
+
+    def settled_files(self):
+        ''' rescan: files not modified for stable_time seconds '''
+        now = time.time()
+        ready = []
+        for name in self.matching_files():
+            try:
+                if now - os.stat(os.path.join(self.directory, name)).st_mtime >= self.stable_time:
+                    ready.append(name)
+            except FileNotFoundError:
+                continue
+        return ready
+
+    def wait_for_files(self, timeout=None):
+        ''' waits up to timeout seconds (poll_interval by default), returns list of ready file names '''
+        timeout = self.poll_interval if timeout is None else timeout
+        if time.monotonic() - self.last_rescan >= self.rescan_interval:
+            self.last_rescan = time.monotonic()
+            self.reported.clear()
+            if self.inotify_fd is not None:
+                return self.settled_files()
+        if self.inotify_fd is not None:
+            names = self.read_inotify_events(timeout)
+            return [name for name in names if os.path.exists(os.path.join(self.directory, name))]
+        time.sleep(timeout)
+        return self.stable_files()
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
@@ -0,0 +1,156 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Streaming, conditional and resumable downloads of large files (forecast NetCDF files from thredds.met.no).
+#  - the body is streamed in chunks to <file>.part, which is renamed to <file> when complete,
+#    so a file in the download directory is never partial and the file is never held in memory
+#  - ETag and Last-Modified of every url are kept in a json state file in the download directory, the next
+#    download of the url sends If-None-Match / If-Modified-Since and nothing is transferred on 304 Not Modified
+#  - an interrupted transfer leaves <file>.part, the next attempt (retried right away, or in the next run) asks
+#    for the rest with Range and If-Range, so a file changed on the server meanwhile is downloaded from the start
+#  - files are downloaded concurrently over one requests session with a pool of keep-alive connections
+#  Can be tried against the local stand-in server fake_file_server.py.
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import re
+import json
+import threading
+import logging
+
+STATE_FILE = '.download_state.json'
+CHUNK_SIZE = 1024 * 1024
+CONTENT_RANGE_TOTAL = re.compile(r'bytes \d+-\d+/(\d+)')
+
+LOGGER = logging.getLogger(__name__)
+
+
+class IncompleteDownload(Exception):
+    ''' fewer bytes received than announced by the server, the part is kept for resuming '''
+
+
+class Downloader:
+    ''' downloads urls to files of download_dir, can be used from several threads '''
+
+    def __init__(self, download_dir, pool_size=4, timeout=60, retries=3, chunk_size=CHUNK_SIZE):
+        self.download_dir = download_dir
+        self.timeout = timeout
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        # sizes are compared with Content-Length, bodies must not be decoded on the fly
+        self.session.headers.update({'Accept-Encoding': 'identity'})
+        self.state_path = os.path.join(download_dir, STATE_FILE)
+        self.state_lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as file:
+                self.state = json.load(file)
+
+    def update_state(self, url, **values):
+        ''' updates state of url and writes the state file atomically '''
+        with self.state_lock:
+            self.state.setdefault(url, {}).update(values)
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(self.state, file, indent=1)
+            os.replace(tmp_path, self.state_path)
+
+    def conditional_headers(self, url):
+        ''' If-None-Match / If-Modified-Since when the last download of url is still in the download directory '''
+        with self.state_lock:
+            state = dict(self.state.get(url, {}))
+        if not state.get('file_name') or not os.path.exists(os.path.join(self.download_dir, state['file_name'])):
+            return {}
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        return headers
+
+    def resume_headers(self, url, part_path):
+        ''' (offset, Range and If-Range headers) to continue an interrupted transfer of url '''
+        with self.state_lock:
+            partial = self.state.get(url, {}).get('partial')
+        if not partial or not os.path.exists(part_path):
+            return 0, {}
+        offset = os.path.getsize(part_path)
+        validator = partial.get('etag') or partial.get('last_modified')
+        if offset == 0 or not validator:
+            return 0, {}
+        return offset, {'Range': f'bytes={offset}-', 'If-Range': validator}
+
+    def transfer(self, url, file_name):
+        ''' one attempt to download url, returns (status, bytes transferred) '''
+        path = os.path.join(self.download_dir, file_name)
+        part_path = path + '.part'
+        offset, headers = self.resume_headers(url, part_path)
+        if not offset:
+            headers = self.conditional_headers(url)
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                return ('not modified', 0)
+            if response.status_code == 416:
+                # part is not a prefix of the file on the server any more
+                os.remove(part_path)
+                raise IncompleteDownload(f"{file_name}.part does not match the file on the server, removed")
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0
+            validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+            self.update_state(url, partial=validators)
+            if response.status_code == 206:
+                total = CONTENT_RANGE_TOTAL.match(response.headers.get('Content-Range', ''))
+                expected = int(total.group(1)) if total else None
+            else:
+                expected = int(response.headers['Content-Length']) if 'Content-Length' in response.headers else None
+            received = 0
+            with open(part_path, 'r+b' if offset else 'wb') as file:
+                file.seek(offset)
+                file.truncate()
+                try:
+                    for chunk in response.iter_content(self.chunk_size):
+                        file.write(chunk)
+                        received += len(chunk)
+                finally:
+                    file.flush()
+                    os.fsync(file.fileno())
+            if expected is not None and offset + received != expected:
+                raise IncompleteDownload(f"{file_name}: {offset + received} of {expected} bytes received")
+        os.replace(part_path, path)
+        self.update_state(url, file_name=file_name, size=offset + received, partial=None, **validators)
+        return ('resumed' if offset else 'downloaded', received)
+
+    def download(self, url, file_name):
+        ''' downloads url to file_name in the download directory unless not modified since the last download '''
+        ''' interrupted transfers are resumed up to retries times, returns (status, bytes transferred) '''
+        for attempt in range(self.retries + 1):
+            try:
+                status, transferred = self.transfer(url, file_name)
+                LOGGER.info(f"{file_name}: {status}, {transferred} bytes transferred.")
+                return (status, transferred)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout, IncompleteDownload) as error:
+                LOGGER.warning(f"{file_name}: transfer interrupted ({error}), attempt {attempt + 1} of {self.retries + 1}.")
+                if attempt == self.retries:
+                    raise
+
+    def download_all(self, downloads, workers=2):
+        ''' downloads list of (url, file_name) concurrently, returns list of (status, bytes) or the exception per file '''
+        def download_or_error(download):
+            try:
+                return self.download(*download)
+            except Exception as error:
+                LOGGER.error(f"{download[1]}: download from {download[0]} failed: {error}")
+                return error
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(download_or_error, downloads))
+
+    def close(self):
+        self.session.close()
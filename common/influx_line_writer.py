@@ -0,0 +1,244 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Line protocol writer for influx db 1.8 shared by the ingest scripts
+#  (owhl/csv_to_influx.py, weather_cloud/store_weather_cloud_data.py, owhl/store_sensor_location_data_to_influx.py),
+#  created by create_influx_writer of script_setup.py.
+#  Compared to DataFrameClient.write_points:
+#  - one requests session with a pool of keep-alive connections is reused for all writes
+#  - request bodies are gzip compressed (influx 1.8 accepts Content-Encoding: gzip on /write)
+#  - timestamps are written with explicit coarse precision, 'ms' by default: OWHL samples every 250 ms,
+#    so 13 instead of 19 digits per point are sent without losing anything
+#  - several batches can be written concurrently from a thread pool
+#  - lines are built by the vectorized encoder in line_protocol_encoder.py
+#  - with spool_dir, requests failing because influx is down or slow (connection error, timeout, 5xx)
+#    are appended to a durable spool (write_spool.py) and written later by a background drainer;
+#    while the spool is not empty new requests go to the spool as well
+#  - points can be written to another retention policy than the writer's one (retention_policy of write_points),
+#    statements such as CREATE RETENTION POLICY are sent with query
+#  - writers of several databases can share one session (session argument), see InfluxWriters of script_setup.py
+#  - write_points of a measurement in block_markers (the ones cached by influx_query_client.py, e.g. sensor_test,
+#    weather_cloud) adds a point of measurement 'ingested_blocks' for each hour block it writes to (version of the
+#    block), so the caches see which blocks changed; marker points are not counted in the points and bytes of report()
+#  - last_request() gives encode time, request time and bytes sent of the last write_points of the calling thread,
+#    recorded per batch by ingest_stats.py
+#  Other errors are raised as by DataFrameClient (InfluxDBClientError, InfluxDBServerError, requests exceptions),
+#  so error handling in store_points (script_setup.py) stays the same.
+#  Scripts import it after adding this directory to sys.path:
+#  sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+
+from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from concurrent.futures import ThreadPoolExecutor
+
+import gzip
+import time
+import threading
+import logging
+
+from line_protocol_encoder import encode_lines, timestamps_ns, PRECISION_NS_FACTOR
+from influx_query_client import block_marker_lines
+from write_spool import WriteSpool, SpoolDrainer
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LineProtocolWriter:
+    ''' writes data frames as line protocol to influx /write endpoint '''
+
+    def __init__(self, host='localhost', port=8086, database=None, username=None, password=None,
+                 precision='ms', compress_level=1, pool_size=4, concurrent_writes=1, timeout=60, retention_policy=None,
+                 spool_dir=None, session=None, block_markers=()):
+        if precision not in PRECISION_NS_FACTOR:
+            raise ValueError(f"precision must be one of {list(PRECISION_NS_FACTOR)}, got {precision}")
+        self.url = f"http://{host}:{port}/write"
+        self.database = database
+        self.precision = precision
+        self.compress_level = compress_level
+        # measurements whose writes add BLOCK_MEASUREMENT points
+        self.block_markers = frozenset(block_markers)
+        self.concurrent_writes = concurrent_writes
+        self.timeout = timeout
+        self.params = {'db': database, 'precision': precision}
+        if retention_policy:
+            self.params['rp'] = retention_policy
+        # a session given by the caller (InfluxWriters of script_setup.py) is shared with other writers and not closed
+        self.own_session = session is None
+        self.session = session or requests.Session()
+        if self.own_session:
+            self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, concurrent_writes)))
+        if username:
+            self.session.auth = (username, password)
+        self.session.headers.update({'Content-Type': 'application/octet-stream'})
+        if compress_level:
+            self.session.headers.update({'Content-Encoding': 'gzip'})
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'points': 0, 'body_bytes': 0, 'sent_bytes': 0, 'ns_body_bytes': 0,
+                      'spooled_points': 0, 'replayed_points': 0}
+        # encode_s, request_s, sent_bytes and spooled of the last write of each thread, see last_request
+        self.last = threading.local()
+        self.spool = None
+        self.drainer = None
+        if spool_dir:
+            self.spool = WriteSpool(spool_dir)
+            self.drainer = SpoolDrainer(self.spool, self.send_spooled)
+            self.drainer.start()
+
+    def encode(self, df, measurement, tag_columns, field_columns):
+        ''' returns list of line protocol lines for data frame indexed by time '''
+        return encode_lines(df, measurement, tag_columns, field_columns, self.precision)
+
+    def post(self, params, data):
+        ''' posts request body (compressed when compress_level is set), raises when not written '''
+        response = self.session.post(self.url, params=params, data=data, timeout=self.timeout)
+        if 500 <= response.status_code < 600:
+            raise InfluxDBServerError(response.content)
+        if response.status_code != 204:
+            raise InfluxDBClientError(response.content, response.status_code)
+
+    def request_params(self, retention_policy=None):
+        ''' /write parameters, retention_policy overrides the one of the writer '''
+        if retention_policy is None:
+            return self.params
+        return dict(self.params, rp=retention_policy)
+
+    def query(self, statement, epoch=None):
+        ''' sends statement to /query of the writer's database, returns the json answer, raises as post '''
+        ''' epoch: precision of the returned timestamps (e.g. 'ns'), RFC3339 strings by default '''
+        params = {'db': self.database, 'q': statement}
+        if epoch:
+            params['epoch'] = epoch
+        response = self.session.post(self.url.replace('/write', '/query'), params=params,
+                                     headers={'Content-Encoding': None}, timeout=self.timeout)
+        if 500 <= response.status_code < 600:
+            raise InfluxDBServerError(response.content)
+        if response.status_code != 200:
+            raise InfluxDBClientError(response.content, response.status_code)
+        return response.json()
+
+    def spool_lines(self, body, params, points):
+        ''' appends request to the spool, spooled bodies are always gzip compressed '''
+        self.spool.append(params, points, gzip.compress(body, compresslevel=self.compress_level or 1))
+        with self.stats_lock:
+            self.stats['spooled_points'] += points
+        return True
+
+    def send_spooled(self, params, points, data):
+        ''' drainer callback, writes one spooled request '''
+        try:
+            self.post(params, data if self.compress_level else gzip.decompress(data))
+        except InfluxDBClientError as error:
+            if error.code == 413:
+                # spooled with a larger batch size than influx accepts now, written in halves
+                lines = gzip.decompress(data).decode('utf-8').splitlines()
+                if len(lines) <= 1:
+                    # a single point larger than influx accepts, it cannot be split further
+                    LOGGER.error(f"spooled point too large for influx and dropped: {lines[0][:200] if lines else ''}")
+                    return
+                for half in (lines[:len(lines) // 2], lines[len(lines) // 2:]):
+                    self.send_spooled(params, len(half), gzip.compress(('\n'.join(half) + '\n').encode('utf-8'), compresslevel=1))
+                return
+            if error.code == 400:
+                # influx rejects such points every time, keeping them would block the spool
+                LOGGER.error(f"{points} spooled points rejected by influx and dropped: {error.content}")
+                return
+            raise
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['replayed_points'] += points
+
+    def write_lines(self, lines, retention_policy=None, markers=0):
+        ''' posts lines to influx, returns True when written or spooled '''
+        ''' markers: number of BLOCK_MEASUREMENT lines at the end of lines, left out of the stats '''
+        self.last.request_s, self.last.sent_bytes, self.last.spooled = 0, 0, False
+        if not lines:
+            return True
+        params = self.request_params(retention_policy)
+        body = ('\n'.join(lines) + '\n').encode('utf-8')
+        points = len(lines) - markers
+        if self.spool is not None and self.spool.has_pending:
+            # influx was not available, keep order of writes until the drainer emptied the spool
+            self.last.spooled = True
+            return self.spool_lines(body, params, points)
+        start = time.perf_counter()
+        data = gzip.compress(body, compresslevel=self.compress_level) if self.compress_level else body
+        try:
+            self.post(params, data)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, InfluxDBServerError) as error:
+            if self.spool is None:
+                raise
+            LOGGER.warning(f"Influx not available ({type(error).__name__}), {points} points spooled.")
+            self.last.spooled = True
+            return self.spool_lines(body, params, points)
+        self.last.request_s = time.perf_counter() - start
+        # bytes of the marker lines, compressed bytes of the points are their share of the request
+        points_bytes = len(body) - sum(len(line) + 1 for line in lines[len(lines) - markers:]) if markers else len(body)
+        sent_bytes = round(len(data) * points_bytes / len(body))
+        self.last.sent_bytes = sent_bytes
+        # size of the same body with nanosecond timestamps, to report what precision saves
+        ns_digits = len(str(PRECISION_NS_FACTOR[self.precision])) - 1
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['points'] += points
+            self.stats['body_bytes'] += points_bytes
+            self.stats['sent_bytes'] += sent_bytes
+            self.stats['ns_body_bytes'] += points_bytes + ns_digits * points
+        return True
+
+    def write_points(self, df, measurement, tag_columns=None, field_columns=None, retention_policy=None):
+        ''' writes data frame indexed by time, same arguments as DataFrameClient.write_points '''
+        start = time.perf_counter()
+        lines = self.encode(df, measurement, tag_columns, field_columns)
+        markers = []
+        if measurement in self.block_markers and len(lines) > 0:
+            # versions of the written hour blocks, in the same request as the points, see influx_query_client.py
+            markers = block_marker_lines(measurement, timestamps_ns(df), self.precision)
+            lines = list(lines) + markers
+        self.last.encode_s = time.perf_counter() - start
+        return self.write_lines(lines, retention_policy, len(markers))
+
+    def last_request(self):
+        ''' {encode_s, request_s (gzip and post), sent_bytes, spooled} of the last write_points of the calling thread '''
+        return {name: getattr(self.last, name, default) for name, default in
+                [('encode_s', 0), ('request_s', 0), ('sent_bytes', 0), ('spooled', False)]}
+
+    def write_batches(self, batches, measurement, tag_columns=None, field_columns=None):
+        ''' writes list of data frames, concurrent_writes of them at the same time '''
+        ''' returns list of results in the order of batches, first error is raised '''
+        if self.concurrent_writes <= 1 or len(batches) <= 1:
+            return [self.write_points(batch, measurement, tag_columns, field_columns) for batch in batches]
+        with ThreadPoolExecutor(max_workers=self.concurrent_writes) as executor:
+            futures = [executor.submit(self.write_points, batch, measurement, tag_columns, field_columns) for batch in batches]
+            return [future.result() for future in futures]
+
+    def connections_opened(self):
+        ''' number of tcp connections opened by the pool, each request over a kept-alive connection saves one '''
+        pools = self.session.get_adapter(self.url).poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def report(self):
+        ''' summary of written data and what compression, precision and keep-alive saved '''
+        with self.stats_lock:
+            stats = dict(self.stats)
+        connections = self.connections_opened()
+        saved_bytes = stats['ns_body_bytes'] - stats['sent_bytes']
+        saved_percent = 100 * saved_bytes / stats['ns_body_bytes'] if stats['ns_body_bytes'] else 0
+        report = (f"{stats['points']} points in {stats['requests']} requests over {connections} connections "
+                  f"({stats['requests'] - connections} connection setups saved), "
+                  f"{stats['sent_bytes']} bytes sent instead of {stats['ns_body_bytes']} "
+                  f"({saved_bytes} bytes, {saved_percent:.1f}% saved by gzip and '{self.precision}' precision)")
+        if self.spool is not None:
+            report += f", {stats['spooled_points']} points spooled, {stats['replayed_points']} spooled points written"
+        return report
+
+    def close(self, drain_timeout=60):
+        ''' waits up to drain_timeout seconds for the drainer to empty the spool, what is left is written by the next run '''
+        if self.drainer is not None:
+            if not self.drainer.wait_until_empty(drain_timeout):
+                LOGGER.warning(f"Spool {self.spool.spool_dir} not empty, it is written by the next run.")
+            self.drainer.stop()
+            self.spool.close()
+        if self.own_session:
+            self.session.close()
@@ -0,0 +1,396 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Read side of influx db 1.8 for analysis (notebooks, python ports of the Neumeier scripts), next to the writers:
+#  ranges of a measurement (e.g. sensor_test, weather_cloud) are read without one large query each time.
+#  - queries are sent with chunked=true, each chunk of the answer (a json object per line) is parsed straight into
+#    numpy arrays (int64 ns times, float64 fields), so the whole answer is never held as json or python lists
+#  - ranges are cut into hour blocks, fetched blocks are kept on local disk (BlockCache) as .npy structured arrays
+#    (time int64, fields float64), a repeated analysis reads them from disk and asks influx only for missing blocks,
+#    contiguous missing blocks are fetched with one query
+#  - the cache is limited to max_cache_mb, least recently used blocks are removed first
+#  - invalidation: LineProtocolWriter (influx_line_writer.py) adds to every write of the measurements in its
+#    block_markers (sensor_test, weather_cloud, given by the ingest scripts) a point of BLOCK_MEASUREMENT
+#    for each hour block written: tag measurement, field written_at (ns, a new value on every write), time the start
+#    of the block, the same point is overwritten by the next write to that block. The client reads these versions
+#    of the requested blocks with one small query and fetches again every cached block whose version changed,
+#    wherever the ingest ran (spooled writes are covered, the marker is in the same request as the points).
+#    Blocks written before the markers existed have no version and stay valid until invalidate() is called,
+#    deletes (DROP SERIES, DELETE) are not seen either, call invalidate() after them.
+#  - blocks of the current hour are not cached, they are still being written
+#  Fields are read as float64 (integer fields included, missing values NaN), string fields are not supported.
+#  usage: client = create_query_client('sensor') (script_setup.py, credentials as for the writers)
+#         df = client.read_range('sensor_test', ['pressure_mbar', 'temp_c'], '2024-06-01', '2024-07-01',
+#                                where={'sensor_position': 'SALTSTEIN_E'})
+#         times, values = client.read_arrays(...)   same as numpy arrays
+#  or: python3 influx_query_client.py sensor sensor_test pressure_mbar --from 2024-06-01 --to 2024-07-01
+
+from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
+
+import numpy as np
+import pandas as pd
+
+import requests
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+
+from line_protocol_encoder import escape_tag, PRECISION_NS_FACTOR
+
+LOGGER = logging.getLogger(__name__)
+
+BLOCK_MEASUREMENT = 'ingested_blocks'
+BLOCK_NS = 3600 * 10**9
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_CACHE_MB = 2048
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sensor_scripts', 'influx_blocks')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blocks (
+    series TEXT,
+    block INTEGER,
+    version INTEGER,
+    rows INTEGER,
+    bytes INTEGER,
+    last_used REAL,
+    PRIMARY KEY (series, block)
+);
+CREATE INDEX IF NOT EXISTS blocks_last_used ON blocks (last_used);
+'''
+
+
+def block_marker_lines(measurement, timestamps, precision='n', written_at=None):
+    ''' line protocol lines of BLOCK_MEASUREMENT for the hour blocks of timestamps (int64 ns) written to measurement '''
+    blocks = np.unique(np.asarray(timestamps, dtype=np.int64) // BLOCK_NS) * BLOCK_NS
+    written_at = time.time_ns() if written_at is None else written_at
+    tag = escape_tag(measurement)
+    return [f"{BLOCK_MEASUREMENT},measurement={tag} written_at={written_at}i {block // PRECISION_NS_FACTOR[precision]}"
+            for block in blocks]
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def quote_string(value):
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def time_ns(value):
+    ''' int64 ns since epoch (UTC) of a timestamp, string or datetime '''
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.as_unit('ns').value
+
+
+def chunk_arrays(values, field_count):
+    ''' (times int64, fields float64 array rows x field_count) of the values of a series of an answer '''
+    times = np.fromiter((row[0] for row in values), dtype=np.int64, count=len(values))
+    fields = np.array([row[1:] for row in values], dtype=np.float64).reshape(len(values), field_count)
+    return times, fields
+
+
+class BlockCache:
+    ''' hour blocks on local disk: <cache_dir>/<series>/<block>.npy and the index <cache_dir>/index.sqlite '''
+    ''' can be shared by threads and processes (sqlite WAL, files replaced atomically) '''
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_cache_mb=DEFAULT_CACHE_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_cache_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def block_path(self, series, block):
+        return os.path.join(self.cache_dir, series, f"{block}.npy")
+
+    def versions(self, series, blocks):
+        ''' dict block -> version of the cached blocks of series among blocks '''
+        with self.lock:
+            rows = self.connection.execute('SELECT block, version FROM blocks WHERE series = ? AND block >= ? AND block <= ?',
+                                           (series, int(min(blocks)), int(max(blocks)))).fetchall()
+        return dict(rows)
+
+    def get(self, series, blocks):
+        ''' dict block -> structured array of the blocks of series read from disk, blocks missing on disk are left out '''
+        arrays = {}
+        for block in blocks:
+            try:
+                arrays[block] = np.load(self.block_path(series, block), allow_pickle=False)
+            except (OSError, ValueError):
+                continue
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany('UPDATE blocks SET last_used = ? WHERE series = ? AND block = ?',
+                                        [(now, series, int(block)) for block in arrays])
+        self.hits += len(arrays)
+        return arrays
+
+    def put(self, series, block, array, version):
+        ''' stores array (structured, time and fields) as block of series with version (written_at of the block) '''
+        path = self.block_path(series, block)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written to a file of this process first, readers never see a partial block
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            np.save(file, array, allow_pickle=False)
+        os.replace(temporary_path, path)
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?, ?)',
+                                    (series, int(block), version, array.shape[0], os.path.getsize(path), time.time()))
+        self.misses += 1
+
+    def evict(self):
+        ''' removes least recently used blocks until the cache is not larger than max_cache_mb, returns blocks removed '''
+        with self.lock:
+            total = self.connection.execute('SELECT coalesce(sum(bytes), 0) FROM blocks').fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            removed = []
+            for series, block, size in self.connection.execute('SELECT series, block, bytes FROM blocks ORDER BY last_used'):
+                if total <= self.max_bytes:
+                    break
+                removed.append((series, block))
+                total -= size
+            with self.connection:
+                self.connection.executemany('DELETE FROM blocks WHERE series = ? AND block = ?', removed)
+        for series, block in removed:
+            try:
+                os.remove(self.block_path(series, block))
+            except OSError:
+                pass
+        return len(removed)
+
+    def invalidate(self, series=None, start=None, end=None):
+        ''' removes cached blocks of series (all series by default) overlapping [start, end) (int64 ns), returns blocks removed '''
+        conditions, values = [], []
+        if series is not None:
+            conditions.append('series = ?')
+            values.append(series)
+        if start is not None:
+            conditions.append('block > ?')
+            values.append(int(start) - BLOCK_NS)
+        if end is not None:
+            conditions.append('block < ?')
+            values.append(int(end))
+        where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        with self.lock, self.connection:
+            removed = self.connection.execute('SELECT series, block FROM blocks' + where, values).fetchall()
+            self.connection.execute('DELETE FROM blocks' + where, values)
+        for series, block in removed:
+            try:
+                os.remove(self.block_path(series, block))
+            except OSError:
+                pass
+        return len(removed)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class InfluxQueryClient:
+    ''' chunked reads of influx /query with the hour block cache, see the header '''
+
+    def __init__(self, host='localhost', port=8086, database=None, username=None, password=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, timeout=300, session=None, cache=None):
+        self.url = f"http://{host}:{port}/query"
+        self.database = database
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.cache = cache
+        self.own_session = session is None
+        self.session = session or requests.Session()
+        if username:
+            self.session.auth = (username, password)
+        self.stats = {'queries': 0, 'chunks': 0, 'rows': 0}
+
+    def query_chunks(self, statement):
+        ''' yields (columns, times int64 ns, fields float64 rows x columns) of each chunk of the answer to statement '''
+        params = {'db': self.database, 'q': statement, 'epoch': 'ns', 'chunked': 'true', 'chunk_size': self.chunk_size}
+        with self.session.post(self.url, params=params, stream=True, timeout=self.timeout) as response:
+            if 500 <= response.status_code < 600:
+                raise InfluxDBServerError(response.content)
+            if response.status_code != 200:
+                raise InfluxDBClientError(response.content, response.status_code)
+            self.stats['queries'] += 1
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                answer = json.loads(line)
+                if 'error' in answer:
+                    raise InfluxDBClientError(answer['error'])
+                for result in answer.get('results', []):
+                    if 'error' in result:
+                        raise InfluxDBClientError(result['error'])
+                    for series in result.get('series', []):
+                        columns = series['columns'][1:]
+                        times, fields = chunk_arrays(series['values'], len(columns))
+                        self.stats['chunks'] += 1
+                        self.stats['rows'] += times.size
+                        yield columns, times, fields
+
+    def select_statement(self, measurement, fields, start_ns, end_ns, where=None, retention_policy=None):
+        ''' SELECT of fields of measurement in [start_ns, end_ns), where: dict tag -> value '''
+        source = quote_identifier(measurement)
+        if retention_policy:
+            source = quote_identifier(retention_policy) + '.' + source
+        conditions = [f"{quote_identifier(tag)} = {quote_string(value)}" for tag, value in sorted((where or {}).items())]
+        conditions += [f"time >= {start_ns}", f"time < {end_ns}"]
+        return f"SELECT {', '.join(quote_identifier(field) for field in fields)} FROM {source} WHERE {' AND '.join(conditions)}"
+
+    def fetch(self, measurement, fields, start_ns, end_ns, where=None, retention_policy=None):
+        ''' yields (times, fields rows x len(fields)) chunks of the points in [start_ns, end_ns) '''
+        statement = self.select_statement(measurement, fields, start_ns, end_ns, where, retention_policy)
+        for columns, times, values in self.query_chunks(statement):
+            if columns != list(fields):
+                values = values[:, [columns.index(field) for field in fields]]
+            yield times, values
+
+    def block_versions(self, measurement, start_ns, end_ns, retention_policy=None):
+        ''' dict block -> written_at of BLOCK_MEASUREMENT points of measurement in [start_ns, end_ns) '''
+        versions = {}
+        for times, values in self.fetch(BLOCK_MEASUREMENT, ['written_at'], start_ns, end_ns,
+                                        {'measurement': measurement}, retention_policy):
+            versions.update(zip(times.tolist(), values[:, 0].astype(np.int64).tolist()))
+        return versions
+
+    def series_key(self, measurement, fields, where, retention_policy):
+        ''' name of the cache directory of a query, blocks of different fields or tags are kept apart '''
+        key = json.dumps([self.database, retention_policy or '', measurement, list(fields), sorted((where or {}).items())])
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def read_arrays(self, measurement, fields, start, end, where=None, retention_policy=None):
+        ''' (times int64 ns, dict field -> float64 array) of the points of measurement in [start, end), sorted by time '''
+        ''' start, end: timestamps or strings (UTC when without time zone), where: dict tag -> value '''
+        fields = list(fields)
+        start_ns, end_ns = time_ns(start), time_ns(end)
+        dtype = np.dtype([('time', np.int64)] + [(field, np.float64) for field in fields])
+        if end_ns <= start_ns:
+            return np.array([], dtype=np.int64), {field: np.array([], dtype=np.float64) for field in fields}
+        first_block = start_ns // BLOCK_NS * BLOCK_NS
+        blocks = list(range(first_block, end_ns, BLOCK_NS))
+        if self.cache is None:
+            parts = [self.structured(chunk, dtype) for chunk in self.fetch(measurement, fields, start_ns, end_ns, where, retention_policy)]
+            return self.result(parts, dtype, start_ns, end_ns)
+        series = self.series_key(measurement, fields, where, retention_policy)
+        current = time.time_ns() // BLOCK_NS * BLOCK_NS
+        versions = self.block_versions(measurement, first_block, blocks[-1] + BLOCK_NS, retention_policy)
+        cached_versions = self.cache.versions(series, blocks)
+        valid = [block for block in blocks if block in cached_versions and block < current
+                 and cached_versions[block] == versions.get(block)]
+        arrays = self.cache.get(series, valid)
+        missing = [block for block in blocks if block not in arrays]
+        for run_start, run_end in self.runs(missing):
+            arrays.update(self.fetch_blocks(series, measurement, fields, dtype, run_start, run_end, where,
+                                            retention_policy, versions, current))
+        self.cache.evict()
+        return self.result([arrays[block] for block in blocks if block in arrays], dtype, start_ns, end_ns)
+
+    def read_range(self, measurement, fields, start, end, where=None, retention_policy=None):
+        ''' data frame indexed by time (UTC) with fields of the points of measurement in [start, end), see read_arrays '''
+        times, values = self.read_arrays(measurement, fields, start, end, where, retention_policy)
+        return pd.DataFrame(values, index=pd.DatetimeIndex(times.view('datetime64[ns]'), name='time'))
+
+    def runs(self, blocks):
+        ''' [start, end) of runs of consecutive blocks '''
+        runs = []
+        for block in blocks:
+            if runs and runs[-1][1] == block:
+                runs[-1][1] = block + BLOCK_NS
+            else:
+                runs.append([block, block + BLOCK_NS])
+        return runs
+
+    def fetch_blocks(self, series, measurement, fields, dtype, start_ns, end_ns, where, retention_policy, versions, current):
+        ''' fetches [start_ns, end_ns) chunk by chunk, stores each complete block in the cache, returns dict block -> array '''
+        arrays = {}
+        pending = []
+        pending_block = start_ns
+        def finish(block):
+            array = np.concatenate(pending) if pending else np.empty(0, dtype=dtype)
+            arrays[block] = array
+            if block < current:
+                self.cache.put(series, block, array, versions.get(block))
+        for chunk in self.fetch(measurement, fields, start_ns, end_ns, where, retention_policy):
+            array = self.structured(chunk, dtype)
+            chunk_blocks = array['time'] // BLOCK_NS * BLOCK_NS
+            # chunks are sorted by time, a block is complete when a later block starts
+            bounds = np.flatnonzero(np.diff(chunk_blocks)) + 1
+            for part, block in zip(np.split(array, bounds), chunk_blocks[np.concatenate([[0], bounds])]):
+                while pending_block < block:
+                    finish(pending_block)
+                    pending, pending_block = [], pending_block + BLOCK_NS
+                pending.append(part)
+        while pending_block < end_ns:
+            finish(pending_block)
+            pending, pending_block = [], pending_block + BLOCK_NS
+        return arrays
+
+    def structured(self, chunk, dtype):
+        ''' structured array (time and fields) of a (times, fields) chunk '''
+        times, values = chunk
+        array = np.empty(times.size, dtype=dtype)
+        array['time'] = times
+        for i, field in enumerate(dtype.names[1:]):
+            array[field] = values[:, i]
+        return array
+
+    def result(self, parts, dtype, start_ns, end_ns):
+        ''' (times, dict field -> array) of parts (structured arrays sorted by time) limited to [start_ns, end_ns) '''
+        array = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        array = array[(array['time'] >= start_ns) & (array['time'] < end_ns)]
+        return array['time'].copy(), {field: array[field].copy() for field in dtype.names[1:]}
+
+    def invalidate(self, measurement=None, fields=None, start=None, end=None, where=None, retention_policy=None):
+        ''' removes cached blocks, of one query (measurement and fields given) or all, in [start, end) '''
+        series = None if measurement is None else self.series_key(measurement, fields or [], where, retention_policy)
+        return self.cache.invalidate(series, None if start is None else time_ns(start), None if end is None else time_ns(end))
+
+    def report(self):
+        ''' summary of queries and cache use '''
+        report = f"{self.stats['queries']} queries, {self.stats['chunks']} chunks, {self.stats['rows']} rows read from influx"
+        if self.cache is not None:
+            report += f", {self.cache.hits} blocks read from cache, {self.cache.misses} blocks cached"
+        return report
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        if self.own_session:
+            self.session.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from script_setup import create_query_client
+    parser = argparse.ArgumentParser()
+    parser.add_argument('database')
+    parser.add_argument('measurement')
+    parser.add_argument('fields', nargs='+')
+    parser.add_argument('--from', dest='start', required=True)
+    parser.add_argument('--to', dest='end', required=True)
+    parser.add_argument('--where', action='append', default=[], help="tag=value, can be repeated")
+    parser.add_argument('--retention-policy', default=None)
+    parser.add_argument('--out', default=None, help="writes the points to this csv file")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--max-cache-mb', type=float, default=DEFAULT_CACHE_MB)
+    args = parser.parse_args()
+    client = create_query_client(args.database, args.cache_dir, args.max_cache_mb)
+    start = time.perf_counter()
+    df = client.read_range(args.measurement, args.fields, args.start, args.end,
+                           dict(condition.split('=', 1) for condition in args.where), args.retention_policy)
+    print(f"{df.shape[0]} points in {time.perf_counter() - start:.3f} s, {client.report()}")
+    if args.out:
+        df.to_csv(args.out)
+    client.close()
@@ -0,0 +1,116 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Persistent index of ingested files, so an interrupted run can be resumed.
+#  Files are identified by hash of their content, not by name, so a renamed or re-downloaded copy
+#  of an already ingested file is recognised as well.
+#  sqlite database with three tables:
+#  files:   file_hash, file_name, datapoints, completed_at   - files fully written to influx
+#  batches: file_hash, start_row, end_row, first_time, last_time, written_at
+#           - batches written to influx, rows counted in the data frame sorted by time,
+#             first_time and last_time in nanoseconds since epoch
+#  high_water_marks: series, last_time, updated_at
+#           - last time written of a series (e.g. a weather station), in nanoseconds since epoch,
+#             for sources repeating old data in every file, only newer rows are read
+#  A file found in files is skipped with a single primary key lookup,
+#  for other files writing starts at the first row after the last written batch.
+
+import pandas as pd
+
+import sqlite3
+import hashlib
+import threading
+
+from datetime import datetime as dt
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    file_hash TEXT PRIMARY KEY,
+    file_name TEXT,
+    datapoints INTEGER,
+    completed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS batches (
+    file_hash TEXT,
+    start_row INTEGER,
+    end_row INTEGER,
+    first_time INTEGER,
+    last_time INTEGER,
+    written_at TEXT,
+    PRIMARY KEY (file_hash, start_row)
+);
+CREATE TABLE IF NOT EXISTS high_water_marks (
+    series TEXT PRIMARY KEY,
+    last_time INTEGER,
+    updated_at TEXT
+);
+'''
+
+
+def file_content_hash(file_path):
+    ''' sha256 of file content '''
+    content_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class IngestCheckpoint:
+    ''' sqlite index of ingested files and written batches, can be shared by writer threads '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+
+    def is_completed(self, file_hash):
+        ''' true if file with this content was fully written '''
+        with self.lock:
+            row = self.connection.execute('SELECT 1 FROM files WHERE file_hash = ?', (file_hash,)).fetchone()
+        return row is not None
+
+    def committed_rows(self, file_hash):
+        ''' number of rows of the sorted file written in previous runs, writing resumes after them '''
+        with self.lock:
+            row = self.connection.execute('SELECT max(end_row) FROM batches WHERE file_hash = ?', (file_hash,)).fetchone()
+        return row[0] or 0
+
+    def commit_batch(self, file_hash, start_row, end_row, first_time, last_time):
+        ''' records batch written to influx, first_time and last_time are pandas timestamps '''
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?, ?, ?)',
+                (file_hash, start_row, end_row, first_time.value, last_time.value, dt.now().isoformat()))
+
+    def complete_file(self, file_hash, file_name, datapoints):
+        ''' records file as fully written '''
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                (file_hash, file_name, datapoints, dt.now().isoformat()))
+
+    def batch_recorder(self, file_hash):
+        ''' callback for write_in_batches recording each written batch '''
+        def record(start_row, end_row, batch):
+            self.commit_batch(file_hash, start_row, end_row, batch.index[0], batch.index[-1])
+        return record
+
+    def high_water_mark(self, series):
+        ''' last time written of series as UTC pandas timestamp, None if nothing was written '''
+        with self.lock:
+            row = self.connection.execute('SELECT last_time FROM high_water_marks WHERE series = ?', (series,)).fetchone()
+        return None if row is None else pd.Timestamp(row[0], unit='ns', tz='UTC')
+
+    def advance_high_water_mark(self, series, last_time):
+        ''' records last_time (pandas timestamp) as last time written of series, unless a later one is recorded '''
+        with self.lock, self.connection:
+            self.connection.execute('INSERT INTO high_water_marks VALUES (?, ?, ?) ON CONFLICT(series) DO UPDATE '
+                'SET last_time = excluded.last_time, updated_at = excluded.updated_at WHERE excluded.last_time > last_time',
+                (series, last_time.value, dt.now().isoformat()))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,238 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Telemetry of the ingest stages, so it can be seen in Grafana where ingest time goes.
+#  A record is kept for each stage of each file and for each written batch:
+#  read (content hash of the file), parse (pd.read_csv), transform (tags and timestamps),
+#  encode (line protocol of all batches), write (requests to influx), qc (quality control flags, owhl_qc.py),
+#  compensate (depth from pressure and atmospheric pressure, barometric_compensation.py),
+#  move (to the processed directory),
+#  batch (one write_in_batches call: encode and request)
+#  fields: duration_s, rows, bytes_sent (gzip body), retries (413 Request Entity Too Large),
+#  rss_mb (resident memory at the end of the stage), peak_rss_mb (peak resident memory of the process so far),
+#  peak_traced_mb (peak of memory allocated by python during the stage, only with trace_memory, see tracemalloc)
+#  Records are written as measurement 'ingest_stats' with tags script, stage, sensor_position and file name as
+#  string field (not a tag, so the number of series does not grow with the number of files),
+#  and/or as Prometheus textfile <script>.prom for the textfile collector of node_exporter
+#  (totals of each stage since the start of the script).
+#  Stages of a file parsed in a worker process are recorded there and passed back as plain dicts (records).
+#  tracemalloc slows down pandas by about 2x and its peak is shared by all threads, it is off by default.
+
+import time
+import threading
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+MEASUREMENT = 'ingest_stats'
+TAGS = ['script', 'stage', 'sensor_position']
+FIELDS = ['duration_s', 'rows', 'bytes_sent', 'retries', 'rss_mb', 'peak_rss_mb', 'peak_traced_mb', 'file']
+# totals of each stage written to the Prometheus textfile: record field, metric name, help
+PROMETHEUS_TOTALS = [
+    ('count', 'ingest_stage_runs_total', "stage runs (files or batches)"),
+    ('duration_s', 'ingest_stage_seconds_total', "time spent in the stage"),
+    ('rows', 'ingest_stage_rows_total', "rows handled by the stage"),
+    ('bytes_sent', 'ingest_stage_bytes_sent_total', "compressed bytes sent to influx"),
+    ('retries', 'ingest_stage_retries_total', "batches written again after 413 Request Entity Too Large"),
+]
+
+
+def process_memory_mb():
+    ''' (resident memory, peak resident memory) of this process in MB from /proc, (None, None) elsewhere '''
+    rss, peak = None, None
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return (rss, peak)
+
+
+class StageTimer:
+    ''' context manager of IngestStats.stage, the record can be completed in the with block (rows, sensor_position) '''
+
+    def __init__(self, stats, record):
+        self.stats = stats
+        self.record = record
+
+    def __enter__(self):
+        if self.stats.trace_memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+        self.record['time'] = time.time()
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.record['duration_s'] = time.perf_counter() - self.start
+        self.record['rss_mb'], self.record['peak_rss_mb'] = process_memory_mb()
+        if self.stats.trace_memory:
+            import tracemalloc
+            self.record['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        # stages failing with an exception are not recorded
+        if exc_type is None:
+            self.stats.add(self.record)
+        return False
+
+
+class NoStage:
+    ''' stage of stats None, the record is filled but not kept '''
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+
+def stage(stats, name, **fields):
+    ''' stats.stage(name, **fields), or a stage not recorded when stats is None '''
+    return NoStage() if stats is None else stats.stage(name, **fields)
+
+
+class IngestStats:
+    ''' stage and batch records of a script run, shared by its threads '''
+
+    def __init__(self, script, trace_memory=False):
+        self.script = script
+        self.trace_memory = trace_memory
+        self.records = []
+        self.totals = {}
+        self.lock = threading.Lock()
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def stage(self, name, **fields):
+        ''' with stats.stage('parse', file=filename) as record: ... times the block and keeps the record '''
+        return StageTimer(self, dict({'stage': name, 'rows': 0, 'bytes_sent': 0, 'retries': 0}, **fields))
+
+    def add(self, record):
+        ''' keeps record (dict with stage, time, duration_s and FIELDS), adds it to the totals of its stage '''
+        with self.lock:
+            self.records.append(record)
+            totals = self.totals.setdefault(record['stage'], {'count': 0, 'duration_s': 0, 'rows': 0, 'bytes_sent': 0, 'retries': 0})
+            totals['count'] += 1
+            for field in ['duration_s', 'rows', 'bytes_sent', 'retries']:
+                totals[field] += record.get(field, 0)
+
+    def extend(self, records):
+        ''' adds records of another process (e.g. stages of a file parsed in a worker process) '''
+        for record in records:
+            self.add(record)
+
+    def take_records(self):
+        ''' records kept since the last call, as written by write '''
+        with self.lock:
+            records, self.records = self.records, []
+        return records
+
+    def frame(self, records):
+        ''' data frame of records indexed by time (UTC) as written to MEASUREMENT '''
+        import pandas as pd
+        df = pd.DataFrame(records, columns=['time', 'stage'] + [column for column in FIELDS + TAGS if column not in ['stage']])
+        df['script'] = self.script
+        df['sensor_position'] = df['sensor_position'].fillna('')
+        df['file'] = df['file'].fillna('')
+        df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
+        return df.set_index('time')
+
+    def summary(self):
+        ''' one line with the total time and rows of each stage, for the log '''
+        with self.lock:
+            totals = {name: dict(values) for name, values in self.totals.items()}
+        return ', '.join(f"{name} {values['duration_s']:.3f} s ({values['count']} x, {values['rows']} rows)" for name, values in totals.items())
+
+    def write(self, client):
+        ''' writes records kept since the last write as MEASUREMENT with client (LineProtocolWriter) '''
+        ''' telemetry must not stop the ingest, errors are logged '''
+        records = self.take_records()
+        if not records:
+            return True
+        try:
+            return client.write_points(self.frame(records), MEASUREMENT, tag_columns=TAGS, field_columns=FIELDS)
+        except Exception as error:
+            LOGGER.error(f"{len(records)} {MEASUREMENT} records not written: {error}")
+            return False
+
+    def prometheus_text(self):
+        ''' totals of each stage and peak memory in Prometheus text exposition format '''
+        with self.lock:
+            totals = {name: dict(values) for name, values in self.totals.items()}
+        lines = []
+        for field, metric, description in PROMETHEUS_TOTALS:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, values in totals.items():
+                lines.append(f'{metric}{{script="{self.script}",stage="{name}"}} {values[field]}')
+        rss, peak = process_memory_mb()
+        if peak is not None:
+            lines.append("# HELP ingest_peak_rss_bytes peak resident memory of the script")
+            lines.append("# TYPE ingest_peak_rss_bytes gauge")
+            lines.append(f'ingest_peak_rss_bytes{{script="{self.script}"}} {int(peak * 1024 * 1024)}')
+        lines.append("# HELP ingest_last_update_timestamp_seconds time the file was written")
+        lines.append("# TYPE ingest_last_update_timestamp_seconds gauge")
+        lines.append(f'ingest_last_update_timestamp_seconds{{script="{self.script}"}} {time.time():.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, directory):
+        ''' writes <directory>/<script>.prom, replaced atomically so node_exporter never reads a partial file '''
+        import os
+        path = os.path.join(directory, f"{self.script}.prom")
+        try:
+            with open(path + '.tmp', 'w') as file:
+                file.write(self.prometheus_text())
+            os.replace(path + '.tmp', path)
+        except OSError as error:
+            LOGGER.error(f"{path} not written: {error}")
+
+
+class BatchStats:
+    ''' wraps write_batch of write_in_batches: records every batch, and encode and write stages of the file '''
+
+    def __init__(self, stats, write_batch, client, **fields):
+        self.stats = stats
+        self.write_batch = write_batch
+        self.client = client
+        self.fields = fields
+        self.start = time.time()
+        self.encode_s = 0
+        self.request_s = 0
+        self.rows = 0
+        self.bytes_sent = 0
+        self.retries = 0
+        # retries since the last written batch
+        self.pending_retries = 0
+
+    def __call__(self, batch):
+        from batch_writer import is_request_too_large
+        with self.stats.stage('batch', **self.fields) as record:
+            try:
+                result = self.write_batch(batch)
+            except Exception as error:
+                if is_request_too_large(error):
+                    self.pending_retries += 1
+                raise
+            request = self.client.last_request() if hasattr(self.client, 'last_request') else {}
+            record['rows'] = result[1] if result else 0
+            record['bytes_sent'] = request.get('sent_bytes', 0)
+            # a batch written after 413 carries the retries before it
+            record['retries'], self.pending_retries = self.pending_retries, 0
+        self.encode_s += request.get('encode_s', 0)
+        self.request_s += request.get('request_s', 0)
+        self.rows += record['rows']
+        self.bytes_sent += record['bytes_sent']
+        self.retries += record['retries']
+        return result
+
+    def finish(self):
+        ''' adds encode and write records of the file, totals of its batches '''
+        rss, peak = process_memory_mb()
+        self.stats.add(dict(self.fields, stage='encode', time=self.start, duration_s=self.encode_s, rows=self.rows,
+                            bytes_sent=0, retries=0, rss_mb=rss, peak_rss_mb=peak))
+        self.stats.add(dict(self.fields, stage='write', time=self.start, duration_s=self.request_s, rows=self.rows,
+                            bytes_sent=self.bytes_sent, retries=self.retries, rss_mb=rss, peak_rss_mb=peak))
@@ -0,0 +1,37 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Token bucket limiting the number of points written per second, shared by writer threads.
+#  Used by replay_to_influx.py so a replay of archived data leaves influx capacity for the live ingestion:
+#  tokens are added at rate per second up to burst, writing n points takes n tokens and waits until they are available.
+#  A request larger than burst is let through once the bucket is full, the debt is paid by the following requests.
+
+import time
+import threading
+
+
+class RateLimiter:
+    ''' token bucket of rate points per second, rate None or 0 does not limit '''
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self, points):
+        ''' waits until points can be written, returns time waited in seconds '''
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # tokens needed before the request may start, at most a full bucket
+            wait = max(0.0, (min(points, self.burst) - self.tokens) / self.rate)
+            self.tokens -= points
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
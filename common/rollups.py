@@ -0,0 +1,160 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Rollups (continuous aggregates) of high rate sensor data computed while ingesting.
+#  Dashboards reading long time ranges query the rollups instead of the raw 4 Hz points:
+#  a 1 minute bucket replaces 240 points, a 1 hour bucket 14400 points.
+#  Each rollup is written to its own retention policy and measurement, e.g. "rollup_1m"."sensor_test_1m",
+#  with fields mean_<field>, min_<field>, max_<field>, stddev_<field>, count_<field> (names as written by
+#  influx continuous queries SELECT mean(*), ...), timestamp is the start of the bucket.
+#  Statistics are computed with one groupby per file as partial statistics (count, mean, sum of squared
+#  deviations m2, min, max), which can be combined exactly with partial statistics of the same bucket
+#  from other files (Chan et al. parallel variance).
+#  Buckets at the start and the end of a file can be cut by the file boundary, partial statistics of those
+#  buckets are kept in sqlite (table rollup_partials, by default in the ingest checkpoint database) with the
+#  hash of the file they come from. The edge buckets of a new file are combined with the parts from other files
+#  and written again, so the point in influx is replaced by the statistics of the whole bucket,
+#  in whatever order the files are ingested. Writing the same file again replaces its own part.
+#  Buckets inside a file are assumed not to contain data of other files (OWHL files do not overlap in time).
+
+import numpy as np
+import pandas as pd
+
+import sqlite3
+import threading
+import json
+import logging
+
+# bucket length (pandas frequency), retention policy, suffix of the measurement name
+ROLLUPS = [('1min', 'rollup_1m', '1m'), ('1h', 'rollup_1h', '1h')]
+STATISTICS = ['mean', 'min', 'max', 'stddev', 'count']
+PARTIALS = ['count', 'mean', 'm2', 'min', 'max']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rollup_partials (
+    rollup TEXT,
+    series TEXT,
+    field TEXT,
+    bucket INTEGER,
+    file_hash TEXT,
+    count INTEGER,
+    mean REAL,
+    m2 REAL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (rollup, series, field, bucket, file_hash)
+);
+'''
+
+LOGGER = logging.getLogger(__name__)
+
+
+def rollup_field_names(field_columns):
+    ''' names of the rollup fields of field_columns '''
+    return [f"{statistic}_{field}" for field in field_columns for statistic in STATISTICS]
+
+
+def bucket_partials(df, freq, tag_columns, field_columns):
+    ''' partial statistics of each bucket of data frame indexed by time '''
+    ''' returns data frame with columns PARTIALS indexed by (field, time, tags...), empty buckets are left out '''
+    keys = [df.index.floor(freq).as_unit('ns').rename('time')] + [df[tag] for tag in tag_columns]
+    grouped = df.groupby(keys, sort=True)
+    frames = {}
+    for field in field_columns:
+        values = grouped[field]
+        count = values.count()
+        frames[field] = pd.DataFrame({'count': count, 'mean': values.mean(), 'm2': values.var(ddof=0) * count,
+                                      'min': values.min(), 'max': values.max()})
+    partials = pd.concat(frames, names=['field'])
+    return partials[partials['count'] > 0]
+
+
+def combine_partials(partials):
+    ''' combines partial statistics with the same index (parts of a bucket from several files) '''
+    levels = list(range(partials.index.nlevels))
+    grouped = partials.groupby(level=levels, sort=True)
+    count = grouped['count'].sum()
+    mean = (partials['count'] * partials['mean']).groupby(level=levels, sort=True).sum() / count
+    deviation = partials['count'] * (partials['mean'] - mean.reindex(partials.index).to_numpy()) ** 2
+    m2 = grouped['m2'].sum() + deviation.groupby(level=levels, sort=True).sum()
+    return pd.DataFrame({'count': count, 'mean': mean, 'm2': m2, 'min': grouped['min'].min(), 'max': grouped['max'].max()})
+
+
+def edge_buckets(partials):
+    ''' true for the first and the last bucket of each field and series, which can continue in other files '''
+    series = [level for level in range(partials.index.nlevels) if level != 1]
+    times = pd.Series(partials.index.get_level_values('time'), index=partials.index)
+    grouped = times.groupby(level=series, sort=False)
+    return ((times == grouped.transform('min')) | (times == grouped.transform('max'))).to_numpy()
+
+
+def rollup_statistics(partials, tag_columns):
+    ''' data frame indexed by bucket start with tag columns and rollup fields (see rollup_field_names) '''
+    statistics = pd.DataFrame({
+        'mean': partials['mean'],
+        'min': partials['min'],
+        'max': partials['max'],
+        # sample standard deviation as influx STDDEV, not defined for a single value
+        'stddev': np.sqrt(partials['m2'] / (partials['count'] - 1)).where(partials['count'] > 1),
+        'count': partials['count'].astype('int64')})
+    wide = statistics.unstack('field')
+    wide.columns = [f"{statistic}_{field}" for statistic, field in wide.columns]
+    # a field without values in a bucket has count 0, counts are integer fields in influx
+    counts = [column for column in wide.columns if column.startswith('count_')]
+    wide[counts] = wide[counts].fillna(0).astype('int64')
+    return wide.reset_index(level=tag_columns)
+
+
+class RollupState:
+    ''' sqlite store of partial statistics of buckets at the edges of ingested files, can be shared by writer threads '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+
+    def exchange(self, rollup, file_hash, partials):
+        ''' stores partials of file_hash, returns partials of the same buckets from other files (same index) '''
+        rows = []
+        for (field, time, *tags), values in zip(partials.index, partials[PARTIALS].itertuples(index=False)):
+            rows.append((rollup, json.dumps(tags), field, time.value, file_hash, int(values[0]), *map(float, values[1:])))
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO rollup_partials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            stored = []
+            for row in rows:
+                stored += self.connection.execute('SELECT series, field, bucket, count, mean, m2, min, max FROM rollup_partials '
+                    'WHERE rollup = ? AND series = ? AND field = ? AND bucket = ? AND file_hash != ?',
+                    (rollup, row[1], row[2], row[3], file_hash)).fetchall()
+        index = pd.MultiIndex.from_tuples([(field, pd.Timestamp(bucket, unit='ns'), *json.loads(series))
+                                           for series, field, bucket, *values in stored], names=partials.index.names)
+        return pd.DataFrame([values for series, field, bucket, *values in stored], index=index, columns=PARTIALS)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def file_rollup(df, freq, rollup, tag_columns, field_columns, state=None, file_hash=None):
+    ''' rollup of one file (data frame indexed by time) as written to influx, see rollup_statistics '''
+    ''' with state, edge buckets are combined with the parts of them from other files '''
+    partials = bucket_partials(df, freq, tag_columns, field_columns)
+    if state is not None and not partials.empty:
+        edges = edge_buckets(partials)
+        stored = state.exchange(rollup, file_hash, partials[edges])
+        if not stored.empty:
+            LOGGER.info(f"{rollup}: {stored.shape[0]} bucket parts from other files combined with edge buckets.")
+            combined = combine_partials(pd.concat([partials[edges], stored]))
+            partials = pd.concat([partials[~edges], combined]).sort_index()
+    return rollup_statistics(partials, tag_columns)
+
+
+def create_retention_policies(writer, duration='INF'):
+    ''' creates the retention policies of ROLLUPS in the writer's database, existing ones are left as they are '''
+    for freq, retention_policy, suffix in ROLLUPS:
+        try:
+            writer.query(f'CREATE RETENTION POLICY "{retention_policy}" ON "{writer.database}" DURATION {duration} REPLICATION 1')
+        except Exception as error:
+            # e.g. policy exists with another duration, or influx is down (points are spooled until it is up)
+            LOGGER.warning(f"Retention policy {retention_policy} not created: {error}")
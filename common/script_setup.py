@@ -0,0 +1,156 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Set up shared by the ingest scripts (log, credentials, influx writer, store_points), each script had its own copy.
+#  Scripts do their work in main(argv, writers), so they can be run by ingest.py in one process:
+#  - run as a script, main creates its own LineProtocolWriter and closes it at the end
+#  - run by ingest.py, writers (InfluxWriters) hands out writers which share one requests session,
+#    so the pipelines of a run reuse the same pool of keep-alive connections to influx
+#  Nothing heavy is imported here, influx_line_writer (influxdb, pandas) is imported when a writer is created.
+
+import sys
+import os
+import json
+import threading
+import traceback
+import logging
+
+CREDENTIALS_PATH = '../database_settings/influxdb_credentials'
+INFLUX_HOST = 'localhost'
+INFLUX_PORT = 8086
+
+LOGGER = logging.getLogger(__name__)
+
+
+def set_up_log(log_dir, log_filename, mode='a'):
+    ''' creates a log in script running directory '''
+    script_run_dir = os.getcwd()
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+        handler.close()
+    #check if log dir exist, create both log dir and log file if necessary
+    if not os.path.isdir(os.path.join(script_run_dir, log_dir)):
+        os.mkdir(os.path.join(script_run_dir, log_dir))
+    file_handler = logging.FileHandler(os.path.join(script_run_dir, log_dir, log_filename), mode=mode)
+    file_handler.setFormatter(logging.Formatter(fmt='%(asctime)s [%(pathname)s:%(lineno)d] [%(levelname)s] %(message)s', datefmt='%a, %d %b %Y %H:%M:%S'))
+    logger = logging.getLogger()
+    logger.addHandler(file_handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+def get_script_name(script_path=None):
+    ''' gets a script name, log are named after the script, by default the script started (sys.argv[0]) '''
+    return os.path.splitext(os.path.basename(script_path or sys.argv[0]))[0]
+
+
+def read_influx_credentials(credentials_path=CREDENTIALS_PATH):
+    ''' username and password of influx, relative path from the script running directory, exits when missing '''
+    if not os.path.exists(os.path.join(os.getcwd(), credentials_path)):
+        LOGGER.error("influxdb_credentials file is missing")
+        sys.exit(1)
+    with open(os.path.join(os.getcwd(), credentials_path)) as file:
+        return json.load(file)
+
+
+def create_influx_writer(database, spool_name, precision='ms', session=None, influx_auth=None, block_markers=()):
+    ''' LineProtocolWriter of database, spooling to spool/<spool_name> of the script running directory '''
+    ''' block_markers: measurements cached by influx_query_client.py, their writes add block versions '''
+    from influx_line_writer import LineProtocolWriter
+    influx_auth = influx_auth or read_influx_credentials()
+    # writes failing while influx is down or slow are kept in spool/<script name> and written later, see write_spool.py
+    return LineProtocolWriter(
+        host = INFLUX_HOST,
+        port = INFLUX_PORT,
+        database = database,
+        username = influx_auth['username'],
+        password = influx_auth['password'],
+        precision = precision,
+        session = session,
+        block_markers = block_markers,
+        spool_dir = os.path.join(os.getcwd(), 'spool', spool_name))
+
+
+def create_query_client(database, cache_dir=None, max_cache_mb=None, influx_auth=None):
+    ''' InfluxQueryClient of database with the hour block cache in cache_dir (~/.cache/sensor_scripts/influx_blocks) '''
+    from influx_query_client import InfluxQueryClient, BlockCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MB
+    influx_auth = influx_auth or read_influx_credentials()
+    return InfluxQueryClient(
+        host = INFLUX_HOST,
+        port = INFLUX_PORT,
+        database = database,
+        username = influx_auth['username'],
+        password = influx_auth['password'],
+        cache = BlockCache(cache_dir or DEFAULT_CACHE_DIR, max_cache_mb or DEFAULT_CACHE_MB))
+
+
+class InfluxWriters:
+    ''' writers of the pipelines run by ingest.py, all of them share one requests session '''
+
+    def __init__(self, pool_size=4):
+        self.pool_size = pool_size
+        self.session = None
+        self.influx_auth = None
+        self.writers = []
+        self.lock = threading.Lock()
+
+    def writer(self, database, spool_name, precision='ms', block_markers=()):
+        ''' new writer of database for a pipeline, closed by close() '''
+        with self.lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self.influx_auth = read_influx_credentials()
+                self.session = requests.Session()
+                self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+            writer = create_influx_writer(database, spool_name, precision, self.session, self.influx_auth, block_markers)
+            self.writers.append(writer)
+            return writer
+
+    def close(self):
+        ''' waits for spools of all writers to drain and closes the session '''
+        for writer in self.writers:
+            writer.close()
+        if self.session is not None:
+            self.session.close()
+
+
+def open_influx_writer(writers, database, spool_name, precision='ms', block_markers=()):
+    ''' writer from writers of ingest.py, or the own writer of a script when writers is None '''
+    if writers is None:
+        return create_influx_writer(database, spool_name, precision, block_markers=block_markers)
+    return writers.writer(database, spool_name, precision, block_markers)
+
+
+def store_points(client, df, measurement, tag_columns, field_columns, retention_policy=None):
+    ''' writes df with client, returns (result, number of points written) as expected by write_in_batches '''
+    ''' exits when influx cannot be reached or refuses the database, request too large is raised for write_in_batches '''
+    from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
+    from requests.exceptions import Timeout, ConnectionError
+    from batch_writer import is_request_too_large
+    try:
+        result = client.write_points(df, measurement, tag_columns = tag_columns, field_columns = field_columns, retention_policy = retention_policy)
+        if result:
+            LOGGER.info(f" {df.shape[0]} data points written.")
+            return (result,df.shape[0])
+        else:
+            LOGGER.error(f"No data written.")
+            return (result,0)
+    except ConnectionError:
+            # thrown if influxdb is down or (spelling) errors in connection configuration
+            LOGGER.error("ConnectionError, check connection setting and if influxdb is up: 'systemctl status influxdb'.")
+            LOGGER.error(traceback.format_exc())
+            sys.exit(1)
+    except Timeout:
+            LOGGER.error("Timeout, check influx timeout setting and network connection.")
+            LOGGER.error(traceback.format_exc())
+            return (False,0)
+    except InfluxDBClientError as error:
+            if is_request_too_large(error):
+                # write_in_batches retries with smaller batches
+                raise
+            LOGGER.error("InfluxDBClientError, check if database exist in influx: 'SHOW DATABASES'.")
+            LOGGER.error(traceback.format_exc())
+            sys.exit(1)
+    except InfluxDBServerError:
+            LOGGER.error("InfluxDBServerError")
+            LOGGER.error(traceback.format_exc())
+            sys.exit(1)
@@ -0,0 +1,130 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Reproducible synthetic input files for benchmarks and trying out the ingest scripts, same seed gives the same file:
+#  - OWHL csv as written by the logger: mission information line (read by read_settings_line of owhl_csv.py),
+#    then POSIXt,DateTime,frac.seconds,Pressure.mbar,TempC sampled at 4 Hz (frac.seconds 0, 25, 50, 75),
+#    pressure of about 2 m of water with tide, swell and wind waves, temperature changing slowly,
+#    optionally with spikes (single samples of 0 mbar, twice the pressure or -40 degC) and gaps of 1 to 60 s,
+#    as found by quality control in csv_to_influx.py (owhl/owhl_qc.py)
+#  - Weather Cloud export: UTF-16LE with BOM, ';' separated, "Date (Europe/Oslo)" in local time,
+#    newest row first, one row every 10 minutes, columns as in the exports read by weather_cloud_csv.py
+#    (rows have one value more than the header has names)
+#  usage: python3 synthetic_data.py owhl --hours 24 --out sensor_data
+#         python3 synthetic_data.py weather-cloud --days 90 --out weather_cloud_data
+
+import numpy as np
+import pandas as pd
+
+import os
+import argparse
+
+OWHL_COLUMNS = ['POSIXt', 'DateTime', 'frac.seconds', 'Pressure.mbar', 'TempC']
+WEATHER_CLOUD_COLUMNS = ['Date (Europe/Oslo)', 'Temperature (°C)', 'Wind chill (°C)', 'Heat index (°C)', 'Dew point (°C)',
+    'Humidity (%)', 'Average wind speed (m/s)', 'Gust of wind (m/s)', 'Average wind direction (°)', 'Pressure (hPa)',
+    'UV index', 'Altitude (m)', 'Latitude', 'Longitude']
+
+
+def owhl_frame(start='2024-06-10 00:00:00', hours=24, frequency=4, seed=0, spikes=0, gaps=0):
+    ''' OWHL raw data frame (columns OWHL_COLUMNS) of hours of data sampled at frequency Hz '''
+    ''' with spikes single bad samples and gaps missing runs of samples '''
+    rng = np.random.default_rng(seed)
+    first = int(pd.Timestamp(start).value // 1_000_000_000)
+    seconds = np.repeat(np.arange(first, first + hours * 3600), frequency)
+    frac = np.tile(np.arange(frequency) * (100 // frequency), hours * 3600)
+    t = (seconds - first) + frac / 100
+    # 1 m water column is about 98 mbar: tide 0.5 m, swell 0.3 m at 12 s, wind waves 0.1 m at 4 s
+    pressure = (1013 + 196 + 49 * np.sin(2 * np.pi * t / 44712) + 29 * np.sin(2 * np.pi * t / 12)
+                + 10 * np.sin(2 * np.pi * t / 4 + rng.uniform(0, 2 * np.pi)) + rng.normal(0, 1, t.size))
+    temp = 15 + 2 * np.sin(2 * np.pi * t / 86400) + rng.normal(0, 0.02, t.size)
+    if spikes:
+        rows = rng.choice(t.size, spikes, replace=False)
+        pressure[rows[::3]] = 0
+        pressure[rows[1::3]] *= 2
+        temp[rows[2::3]] = -40
+    df = pd.DataFrame({
+        'POSIXt': seconds,
+        'DateTime': pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%d %H:%M:%S'),
+        'frac.seconds': frac,
+        'Pressure.mbar': pressure.round(2),
+        'TempC': temp.round(2)})
+    if gaps:
+        keep = np.ones(t.size, dtype=bool)
+        for start_row, length in zip(rng.integers(0, t.size, gaps), rng.integers(1, 60, gaps) * frequency):
+            keep[start_row:start_row + length] = False
+        df = df[keep]
+    return df
+
+
+def write_owhl_csv(file_path, start='2024-06-10 00:00:00', hours=24, frequency=4, seed=0,
+                   position='SALTSTEIN_E', model='sensor_05.07.2024', utc_offset='UTC+2', spikes=0, gaps=0):
+    ''' writes OWHL csv file, returns number of data rows '''
+    df = owhl_frame(start, hours, frequency, seed, spikes, gaps)
+    with open(file_path, 'w', newline='') as file:
+        file.write(f"{position} {model} {utc_offset},startMinute,0,minutes per hour,60\n")
+        df.to_csv(file, index=False, lineterminator='\n')
+    return df.shape[0]
+
+
+def weather_cloud_frame(end='2025-08-01 00:00:00', days=90, interval_minutes=10, seed=0):
+    ''' Weather Cloud export as data frame, newest row first '''
+    rng = np.random.default_rng(seed)
+    # the station clock is in Europe/Oslo: no times in the hour skipped in spring, the hour repeated in autumn
+    utc_end = pd.Timestamp(end).tz_localize('Europe/Oslo', ambiguous=False).tz_convert('UTC')
+    utc_times = pd.date_range(end=utc_end, periods=days * 24 * 60 // interval_minutes, freq=f'{interval_minutes}min')[::-1]
+    times = utc_times.tz_convert('Europe/Oslo').tz_localize(None)
+    hours = (utc_times - utc_times[-1]).total_seconds().to_numpy() / 3600
+    temp = 12 + 6 * np.sin(2 * np.pi * (hours - 9) / 24) + rng.normal(0, 0.3, times.size)
+    humidity = np.clip(75 - 3 * (temp - 12) + rng.normal(0, 3, times.size), 20, 100)
+    wind = np.abs(3 + np.cumsum(rng.normal(0, 0.2, times.size)) % 8)
+    dew_point = temp - (100 - humidity) / 5
+    return pd.DataFrame({
+        'Date (Europe/Oslo)': times.strftime('%Y-%m-%d %H:%M:%S'),
+        'Temperature (°C)': temp.round(1),
+        'Wind chill (°C)': (temp - 0.7 * wind).round(1),
+        'Heat index (°C)': (temp + 0.1 * humidity / 10).round(1),
+        'Dew point (°C)': dew_point.round(1),
+        'Humidity (%)': humidity.round(0),
+        'Average wind speed (m/s)': wind.round(1),
+        'Gust of wind (m/s)': (wind * 1.6).round(1),
+        'Average wind direction (°)': rng.integers(0, 360, times.size),
+        'Pressure (hPa)': (1013 + 10 * np.sin(2 * np.pi * hours / 120) + rng.normal(0, 0.3, times.size)).round(1),
+        'UV index': np.clip(4 * np.sin(2 * np.pi * (hours - 6) / 24), 0, None).round(0),
+        'Altitude (m)': 95.0,
+        'Latitude': 59.94,
+        'Longitude': 10.72,
+        # exports have one value more than there are column names, it is dropped by weather_cloud_csv.py
+        '': 0.0})
+
+
+def write_weather_cloud_export(file_path, end='2025-08-01 00:00:00', days=90, interval_minutes=10, seed=0):
+    ''' writes Weather Cloud export, lines end with ';' as in the exports, returns number of data rows '''
+    df = weather_cloud_frame(end, days, interval_minutes, seed)
+    text = df.to_csv(sep=';', index=False, header=False, lineterminator=';\n')
+    with open(file_path, 'wb') as file:
+        file.write(('\ufeff' + ';'.join(WEATHER_CLOUD_COLUMNS) + ';\n' + text).encode('utf-16le'))
+    return df.shape[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('kind', choices=['owhl', 'weather-cloud'])
+    parser.add_argument('--out', default='.', help="directory the files are written to")
+    parser.add_argument('--files', type=int, default=1, help="number of files, following each other in time")
+    parser.add_argument('--hours', type=int, default=24, help="hours of data of an OWHL file")
+    parser.add_argument('--days', type=int, default=90, help="days of history of a Weather Cloud export")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spikes', type=int, default=0, help="bad samples in an OWHL file")
+    parser.add_argument('--gaps', type=int, default=0, help="runs of missing samples in an OWHL file")
+    args = parser.parse_args()
+    if not os.path.isdir(args.out):
+        os.makedirs(args.out)
+    for i in range(args.files):
+        if args.kind == 'owhl':
+            start = pd.Timestamp('2024-06-10') + pd.Timedelta(hours=i * args.hours)
+            file_path = os.path.join(args.out, f"synthetic_{start:%Y%m%d_%H%M}.csv")
+            rows = write_owhl_csv(file_path, start, args.hours, seed=args.seed + i, spikes=args.spikes, gaps=args.gaps)
+        else:
+            end = pd.Timestamp('2025-08-01') + pd.Timedelta(days=i)
+            file_path = os.path.join(args.out, f"weather_cloud_{end:%Y%m%d}.csv")
+            rows = write_weather_cloud_export(file_path, end, args.days, seed=args.seed + i)
+        print(f"{file_path}: {rows} rows")
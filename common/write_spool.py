@@ -0,0 +1,183 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Durable on-disk spool for line protocol requests that could not be written to influx.
+#  When influx is down or too slow the encoded (gzip compressed) request bodies are appended to
+#  segment files in the spool directory instead of stopping the script, and a background drainer
+#  sends them again with exponential backoff. Points carry explicit timestamps, so sending a
+#  request twice (e.g. after a crash during draining) overwrites the same points and is harmless.
+#
+#  segment_<number>.spool  records: 4 bytes payload length, 4 bytes crc32 of payload, payload
+#                          payload: json line with request parameters and points count, then the gzip body
+#  segment_<number>.sent   offset of the first record not yet sent, drained segments are removed
+#  Records are fsynced in batches (every fsync_records records or fsync_interval seconds) and when a segment is sealed.
+#  A torn record at the end of a segment (crash while appending) fails the crc check, the segment is kept as
+#  segment_<number>.torn with its .sent offset for inspection and no longer sent.
+#  Only sealed segments are drained, the segment appended to is never read or removed while it is open.
+
+import os
+import glob
+import json
+import time
+import struct
+import zlib
+import threading
+import logging
+
+RECORD_HEADER = struct.Struct('>II')
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+LOGGER = logging.getLogger(__name__)
+
+
+class WriteSpool:
+    ''' append only spool of request bodies in segment files, safe to use from several threads '''
+
+    def __init__(self, spool_dir, segment_bytes=DEFAULT_SEGMENT_BYTES, fsync_records=16, fsync_interval=1.0):
+        self.spool_dir = spool_dir
+        self.segment_bytes = segment_bytes
+        self.fsync_records = fsync_records
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.current = None
+        self.current_path = None
+        self.unsynced_records = 0
+        self.last_fsync = time.monotonic()
+        if not os.path.isdir(spool_dir):
+            os.makedirs(spool_dir)
+        existing = self.segments()
+        self.next_number = int(os.path.basename(existing[-1])[8:-6]) + 1 if existing else 0
+        self.has_pending = bool(existing)
+        if existing:
+            LOGGER.info(f"{len(existing)} spooled segments found in {spool_dir}, they will be sent again.")
+
+    def segments(self):
+        ''' segment files in the order they were written '''
+        return sorted(glob.glob(os.path.join(self.spool_dir, 'segment_*.spool')))
+
+    def append(self, params, points, body):
+        ''' appends request body with its request parameters (db, precision, rp) '''
+        meta = json.dumps({'params': params, 'points': points}).encode('utf-8')
+        payload = meta + b'\n' + body
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self.lock:
+            if self.current is None:
+                self.current_path = os.path.join(self.spool_dir, f"segment_{self.next_number:012d}.spool")
+                self.next_number += 1
+                self.current = open(self.current_path, 'ab')
+            self.current.write(record)
+            self.has_pending = True
+            self.unsynced_records += 1
+            if self.unsynced_records >= self.fsync_records or time.monotonic() - self.last_fsync >= self.fsync_interval:
+                self.sync()
+            if self.current.tell() >= self.segment_bytes:
+                self.seal_current()
+
+    def sync(self):
+        ''' flushes current segment to disk, called with lock held '''
+        self.current.flush()
+        os.fsync(self.current.fileno())
+        self.unsynced_records = 0
+        self.last_fsync = time.monotonic()
+
+    def seal_current(self):
+        ''' closes current segment, next append starts a new one, called with lock held '''
+        if self.current is not None:
+            self.sync()
+            self.current.close()
+            self.current = None
+            self.current_path = None
+
+    def seal(self):
+        with self.lock:
+            self.seal_current()
+
+    def read_records(self, path, offset):
+        ''' yields (offset after record, request parameters, points, body) from offset '''
+        with open(path, 'rb') as segment:
+            segment.seek(offset)
+            while True:
+                header = segment.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                length, crc = RECORD_HEADER.unpack(header)
+                payload = segment.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    LOGGER.error(f"Torn record at offset {offset} of {path} dropped.")
+                    return
+                offset += RECORD_HEADER.size + length
+                meta, body = payload.split(b'\n', 1)
+                meta = json.loads(meta)
+                yield offset, meta['params'], meta['points'], body
+
+    def drain(self, send):
+        ''' sends all spooled records in order with send(params, points, body), which raises when not written '''
+        ''' returns number of points sent, stops at the first failure leaving the rest for later '''
+        with self.lock:
+            self.seal_current()
+            # appends after this start a new segment, it is drained next time
+            paths = [path for path in self.segments() if path != self.current_path]
+        points_sent = 0
+        for path in paths:
+            sent_path = path[:-len('.spool')] + '.sent'
+            offset = 0
+            if os.path.exists(sent_path):
+                with open(sent_path) as sent_file:
+                    offset = int(sent_file.read() or 0)
+            for offset, params, points, body in self.read_records(path, offset):
+                send(params, points, body)
+                points_sent += points
+                with open(sent_path, 'w') as sent_file:
+                    sent_file.write(str(offset))
+            if offset != os.path.getsize(path):
+                # stopped at a torn record, the rest of the segment cannot be read
+                os.replace(path, path[:-len('.spool')] + '.torn')
+                LOGGER.error(f"{path} kept as .torn from offset {offset}, not sent again.")
+                continue
+            os.remove(path)
+            if os.path.exists(sent_path):
+                os.remove(sent_path)
+        with self.lock:
+            self.has_pending = self.current is not None or bool(self.segments())
+        return points_sent
+
+    def close(self):
+        self.seal()
+
+
+class SpoolDrainer(threading.Thread):
+    ''' background thread sending spooled records, waits min_backoff to max_backoff seconds after failures '''
+
+    def __init__(self, spool, send, min_backoff=1.0, max_backoff=300.0, idle_interval=1.0):
+        super().__init__(daemon=True)
+        self.spool = spool
+        self.send = send
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.idle_interval = idle_interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        backoff = self.min_backoff
+        while not self.stop_event.is_set():
+            if not self.spool.has_pending:
+                self.stop_event.wait(self.idle_interval)
+                continue
+            try:
+                points = self.spool.drain(self.send)
+                LOGGER.info(f"{points} spooled points written to influx.")
+                backoff = self.min_backoff
+            except Exception as error:
+                LOGGER.warning(f"Spooled points not written ({type(error).__name__}), next try in {backoff:.0f} s.")
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def wait_until_empty(self, timeout):
+        ''' returns True when spool was emptied within timeout seconds '''
+        deadline = time.monotonic() + timeout
+        while self.spool.has_pending and time.monotonic() < deadline and self.is_alive():
+            time.sleep(0.1)
+        return not self.spool.has_pending
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
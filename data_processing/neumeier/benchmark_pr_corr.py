@@ -0,0 +1,124 @@
+#Anna Wojciechowska, Oslo, October 2026
+# compares pr_corr with a line by line transcription of pr_corr.m (loop over segments with fft/ifft, one column at a time)
+# with given depth and in detrend mode, with NaN values, partial last segments and several columns,
+# times both on a month of 4 Hz data, exits with 1 if any result differs
+# usage: python3 benchmark_pr_corr.py --days 30
+
+import numpy as np
+
+import sys
+import time
+import argparse
+
+from pr_corr import pr_corr, wavenumbers, MAX_ATTENUATION_CORRECTION
+
+
+def reference_pr_corr(pt, h, fs, zpt, M=None, corr_lim=(0.05, 0.33)):
+    ''' pr_corr.m transcribed statement by statement for one column, 0-based indices '''
+    min_frequency, max_frequency = corr_lim
+    H_with_NaN = np.array(pt, dtype=float)
+    not_NaN = ~np.isnan(H_with_NaN)
+    pt = H_with_NaN[not_NaN]
+    do_detrend = h is None
+    m = len(pt)
+    if M is None:
+        M = min(512, m)
+    Noverlap = M // 2
+    N = int(np.ceil(m / M)) * M
+    f = np.concatenate([[np.nan], np.arange(1, M // 2 + 1) * fs / M])
+
+    def correction(h):
+        K = wavenumbers(f, h)
+        with np.errstate(over='ignore', invalid='ignore'):
+            Kpt = np.cosh(K * zpt) / np.cosh(K * h)
+            Kpt[(f < min_frequency) | (f > max_frequency)] = 1
+            Kpt[Kpt < 1 / MAX_ATTENUATION_CORRECTION] = 1 / MAX_ATTENUATION_CORRECTION
+        fb_max = np.flatnonzero(f <= max_frequency).max()
+        fKlin = np.arange(fb_max, min(fb_max + len(K) // 10, len(K) - 1) + 1)
+        Kpt[fKlin] = np.arange(len(fKlin), 0, -1) * (Kpt[fb_max] - 1) / len(fKlin) + 1
+        Kpt[0] = 1
+        full = np.zeros(M)
+        full[:M // 2 + 1] = Kpt
+        full[M // 2 + 1:] = Kpt[1:M // 2][::-1]
+        return full
+
+    if not do_detrend:
+        Kpt = correction(h)
+    x = np.arange(1, M + 1)
+    H = np.zeros(N)
+    overlap_window = np.hanning(M)
+    overlap_window[M // 2:] = 1 - overlap_window[:M // 2]
+    for q in range(0, N - Noverlap, Noverlap):
+        o = min(q + M, m)
+        ptseg = pt[q:o].copy()
+        seg_len = len(ptseg)
+        if do_detrend:
+            trend = np.polyfit(x[:seg_len], ptseg, 1)
+            h = np.polyval(trend, (seg_len + 1) / 2)
+            ptseg = ptseg - np.polyval(trend, x[:seg_len])
+            Kpt = correction(h)
+        ptseg = np.concatenate([ptseg, np.zeros(M - seg_len)])
+        Hseg = np.real(np.fft.ifft(np.fft.fft(ptseg) / Kpt))[:seg_len]
+        if do_detrend:
+            Hseg = Hseg + np.polyval(trend, x[:seg_len])
+        H[q:o] = H[q:o] + Hseg * overlap_window[:seg_len]
+        if q == 0:
+            H[:min(Noverlap, seg_len)] = Hseg[:min(Noverlap, seg_len)]
+        if q + M >= N and seg_len > Noverlap:
+            H[q + Noverlap:o] = Hseg[Noverlap:]
+    H_with_NaN[not_NaN] = H[:m]
+    return H_with_NaN
+
+
+def synthetic_surface(values, fs, depth, seed=0):
+    ''' sea surface above bottom (m): tide, swell and wind sea, pressure attenuated waves are not modelled '''
+    rng = np.random.default_rng(seed)
+    t = np.arange(values) / fs
+    return (depth + 0.5 * np.sin(2 * np.pi * t / 44700) + 0.4 * np.sin(2 * np.pi * t / 11)
+            + 0.1 * np.sin(2 * np.pi * t / 3.3) + rng.normal(0, 0.01, values))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--days', type=int, default=30, help="days of 4 Hz data timed")
+parser.add_argument('--fs', type=float, default=4)
+parser.add_argument('--depth', type=float, default=6, help="mean water depth (m)")
+parser.add_argument('--zpt', type=float, default=0.5, help="height of sensor above seabed (m)")
+args = parser.parse_args()
+
+differences = 0
+cases = []
+for values in (14400, 14400 + 100, 14400 + 300, 1000, 30):
+    series = synthetic_surface(values, args.fs, args.depth, seed=values)
+    with_nan = series.copy()
+    with_nan[np.random.default_rng(values).choice(values, values // 50)] = np.nan
+    for data in (series, with_nan):
+        cases.append((data - np.nanmean(data), args.depth, None))
+        cases.append((data, None, None))
+        cases.append((data, None, 256))
+for data, depth, M in cases:
+    expected = reference_pr_corr(data, depth, args.fs, args.zpt, M)
+    result = pr_corr(data, depth, args.fs, args.zpt, M)
+    if not np.allclose(result, expected, rtol=1e-9, atol=1e-9, equal_nan=True):
+        differences += 1
+        print(f"{len(data)} values, depth {depth}, M {M}: max difference {np.nanmax(np.abs(result - expected))}")
+columns = np.column_stack([synthetic_surface(14400, args.fs, args.depth, seed=i) for i in range(5)])
+columns[100:110, 3] = np.nan
+zpt = np.linspace(0.3, 1.0, 5)
+expected = np.column_stack([reference_pr_corr(columns[:, i], None, args.fs, zpt[i]) for i in range(5)])
+if not np.allclose(pr_corr(columns, None, args.fs, zpt), expected, rtol=1e-9, atol=1e-9, equal_nan=True):
+    differences += 1
+    print("columns differ")
+print(f"{len(cases) + 1} cases compared with the reference, {differences} differences")
+
+series = synthetic_surface(int(args.days * 86400 * args.fs), args.fs, args.depth)
+for depth, mode in ((args.depth, 'given depth'), (None, 'detrend')):
+    data = series - series.mean() if depth is not None else series
+    start = time.perf_counter()
+    pr_corr(data, depth, args.fs, args.zpt)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    reference_pr_corr(data[:86400 * int(args.fs)], depth, args.fs, args.zpt)
+    reference_elapsed = (time.perf_counter() - start) * args.days
+    print(f"{args.days} days of {args.fs:g} Hz data, {mode}: {elapsed:.2f} s, reference loop about {reference_elapsed:.1f} s")
+if differences:
+    sys.exit(1)
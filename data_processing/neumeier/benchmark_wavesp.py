@@ -0,0 +1,111 @@
+#Anna Wojciechowska, Oslo, October 2026
+# compares wavesp_bursts with a transcription of wavesp.m processing one burst at a time
+# (spectrum as a loop over segments with fft, pr_corr and zero_crossing ports checked by their own benchmarks),
+# times the batched engine with and without worker processes on hourly 4 Hz bursts, exits with 1 if any result differs
+# usage: python3 benchmark_wavesp.py --days 30 --workers 4
+
+import numpy as np
+import pandas as pd
+
+import sys
+import time
+import argparse
+
+from wavesp import wavesp_bursts, wave_parameters, hanning, wavesp_names
+from pr_corr import pr_corr, wavenumbers
+from zero_crossing import zero_crossing_bursts, detrend_bursts, MBAR_TO_M
+
+
+def reference_wavesp(PT, Zpt, Fs, corr_lim=(0.05, 0.33), Noseg=4):
+    ''' wavesp.m with option 'az' transcribed statement by statement for one burst, 0-based indices '''
+    min_frequency, max_frequency = corr_lim
+    PT = np.asarray(PT, dtype=float)
+    if np.isnan(PT).any():
+        return np.full(15, np.nan)
+    m = len(PT)
+    M = int(m / Noseg / 2) * 2
+    h = np.mean(PT)
+    PT = detrend_bursts(PT[np.newaxis])[0]
+    # spectrum(PT,M,M/2,[],Fs)
+    window = hanning(M)
+    k = (m - M // 2) // (M - M // 2)
+    P = np.zeros(M)
+    for i in range(k):
+        P += np.abs(np.fft.fft(window * PT[i * (M // 2):i * (M // 2) + M])) ** 2
+    P = P[:M // 2 + 1] / (k * np.linalg.norm(window) ** 2)
+    F = np.arange(M // 2 + 1) * Fs / M
+    p = P[1:] * 2 / Fs
+    F = F[1:]
+    if Zpt is not None:
+        K = wavenumbers(F, h)
+        with np.errstate(over='ignore', invalid='ignore'):
+            Kpt = np.cosh(K * Zpt) / np.cosh(K * h)
+            Kpt[(F < min_frequency) | (F > max_frequency)] = 1
+            Kpt[Kpt < 0.2] = 0.2
+        fb_max = np.flatnonzero(F <= max_frequency).max()
+        fKlin = np.arange(fb_max, min(fb_max + len(K) // 10, len(K) - 1) + 1)
+        Kpt[fKlin] = np.arange(len(fKlin), 0, -1) * (Kpt[fb_max] - 1) / len(fKlin) + 1
+        Snf = p / Kpt ** 2
+    else:
+        Snf = p
+    integmin = np.flatnonzero(F >= 0).min()
+    integmax = np.flatnonzero(F <= max_frequency * 1.5).max()
+    df = F[0]
+    moment = {i: np.sum(F[integmin:integmax + 1] ** i * Snf[integmin:integmax + 1]) * df for i in range(-2, 5)}
+    m0 = moment[0]
+    Hm0 = 4 * np.sqrt(m0)
+    Tp = 1 / F[np.argmax(Snf)]
+    T_0_1 = moment[0] / moment[1]
+    T_0_2 = (moment[0] / moment[2]) ** 0.5
+    T_pc = moment[-2] * moment[1] / moment[0] ** 2
+    EPS2 = (moment[0] * moment[2] / moment[1] ** 2 - 1) ** 0.5
+    EPS4 = (1 - moment[2] ** 2 / (moment[0] * moment[4])) ** 0.5
+    pt_surf = pr_corr(PT, h, Fs, Zpt, M, corr_lim) if Zpt is not None else PT
+    resZcross = zero_crossing_bursts([pt_surf], Fs)[0]
+    return np.concatenate([[h, Hm0, Tp, m0, T_0_1, T_0_2, T_pc, EPS2, EPS4], resZcross])
+
+
+def synthetic_bursts(count, samples, fs, seed=0):
+    ''' sea surface above seabed bursts in m: depth, tide, swell with varying period and height, wind sea, noise '''
+    rng = np.random.default_rng(seed)
+    t = np.arange(samples) / fs
+    depth = rng.uniform(3, 12, (count, 1)) + 0.3 * t / t[-1]
+    swell = rng.uniform(0.1, 0.8, (count, 1)) * np.sin(2 * np.pi * t / rng.uniform(6, 14, (count, 1)))
+    wind_sea = rng.uniform(0.02, 0.3, (count, 1)) * np.sin(2 * np.pi * t / rng.uniform(2, 4, (count, 1)))
+    return depth + swell + wind_sea + rng.normal(0, 0.01, (count, samples))
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--days', type=int, default=30, help="days of hourly 4 Hz bursts timed")
+parser.add_argument('-w', '--workers', type=int, default=4)
+parser.add_argument('--fs', type=float, default=4)
+parser.add_argument('--zpt', type=float, default=0.5, help="height of sensor above seabed (m)")
+args = parser.parse_args()
+
+samples = int(3600 * args.fs)
+bursts = list(synthetic_bursts(40, samples, args.fs)) + list(synthetic_bursts(5, samples // 3, args.fs, seed=1))
+bursts[3] = bursts[3].copy()
+bursts[3][10] = np.nan
+differences = 0
+for zpt in (args.zpt, None):
+    results = wavesp_bursts(bursts, zpt, args.fs, all_spectral=True)
+    for i, burst in enumerate(bursts):
+        expected = reference_wavesp(burst, zpt, args.fs)
+        if not np.allclose(results[i], expected, rtol=1e-9, atol=1e-12, equal_nan=True):
+            differences += 1
+            print(f"burst {i} zpt {zpt}:\n{results[i]}\ninstead of\n{expected}")
+print(f"{2 * len(bursts)} bursts compared with the reference, {differences} differences")
+
+values = synthetic_bursts(24 * args.days, samples, args.fs, seed=2)
+index = pd.date_range('2024-07-01', periods=values.size, freq=pd.Timedelta(seconds=1 / args.fs), name='time')
+pressure = pd.Series(values.ravel() / MBAR_TO_M + 1013.25 - args.zpt / MBAR_TO_M, index=index)
+for workers in (1, args.workers):
+    start = time.perf_counter()
+    waves = wave_parameters(pressure, args.zpt, args.fs, workers=workers)
+    print(f"{args.days} days of {args.fs:g} Hz data ({waves.shape[0]} bursts), {workers} workers: {time.perf_counter() - start:.2f} s")
+start = time.perf_counter()
+for burst in values[:24]:
+    reference_wavesp(burst, args.zpt, args.fs)
+print(f"reference one burst at a time: about {(time.perf_counter() - start) * args.days:.1f} s")
+if differences:
+    sys.exit(1)
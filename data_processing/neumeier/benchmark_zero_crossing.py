@@ -0,0 +1,114 @@
+#Anna Wojciechowska, Oslo, October 2026
+# compares zero_crossing_bursts with a line by line transcription of zero_crossing.m (loop per burst and per wave)
+# on synthetic test vectors (swell + wind sea + noise, so that small waves are joined) and times both,
+# exits with 1 if any result differs
+# usage: python3 benchmark_zero_crossing.py --days 30
+
+import numpy as np
+
+import sys
+import time
+import argparse
+
+from zero_crossing import zero_crossing_bursts, matlab_round, detrend_bursts
+
+
+def reference_zero_crossing(data, frequency, threshold=None):
+    ''' zero_crossing.m transcribed statement by statement, 0-based indices '''
+    ''' detrend is the same as in zero_crossing.py (checked against polyfit separately), so that rounding '''
+    ''' does not order waves of equal height differently '''
+    data = detrend_bursts(-np.asarray(data, dtype=float)[np.newaxis])[0]
+    res = np.full(6, np.nan)
+    back0 = np.flatnonzero(data != 0)
+    d0 = data[back0]
+    f = np.flatnonzero(d0[:-1] * d0[1:] < 0)
+    crossing = list(back0[f])
+    if data[0] > 0:
+        if not crossing:
+            return res
+        del crossing[0]
+    crossing = crossing[::2]
+    wave = [[0.0, max(data[crossing[i]:crossing[i + 1] + 1]), -min(data[crossing[i]:crossing[i + 1] + 1]),
+             (crossing[i + 1] - crossing[i]) / frequency] for i in range(len(crossing) - 1)]
+    if len(wave) < 1:
+        return res
+    if threshold is None:
+        threshold = 0.01 * max(w[1] + w[2] for w in wave)
+    i = 0
+    while i < len(wave):
+        i += 1
+        if wave[i - 1][1] < threshold:
+            if i != 1:
+                wave[i - 2][1:] = [max(wave[i - 2][1], wave[i - 1][1]), max(wave[i - 2][2], wave[i - 1][2]), wave[i - 2][3] + wave[i - 1][3]]
+            del wave[i - 1]
+        elif wave[i - 1][2] < threshold:
+            if i != len(wave):
+                wave[i - 1][1:] = [max(wave[i - 1][1], wave[i][1]), max(wave[i - 1][2], wave[i][2]), wave[i - 1][3] + wave[i][3]]
+                del wave[i]
+            else:
+                del wave[i - 1]
+    for w in wave:
+        w[0] = w[1] + w[2]
+    nb = len(wave)
+    wave = np.array(sorted(wave, reverse=True)).reshape(-1, 4)
+    with np.errstate(invalid='ignore'):
+        res[0] = np.mean(wave[:int(matlab_round(nb / 3)), 0]) if matlab_round(nb / 3) else np.nan
+        res[1] = np.mean(wave[:, 0]) if nb else np.nan
+        res[2] = np.mean(wave[:int(matlab_round(nb * 0.1)), 0]) if matlab_round(nb * 0.1) else np.nan
+        res[3] = np.max(wave[:, 0]) if nb else np.nan
+        res[4] = np.mean(wave[:, 3]) if nb else np.nan
+        res[5] = np.mean(wave[:int(matlab_round(nb / 3)), 3]) if matlab_round(nb / 3) else np.nan
+    return res
+
+
+def synthetic_bursts(count, samples, frequency, seed=0):
+    ''' water elevation bursts in m: swell, wind sea, tide trend and sensor noise '''
+    rng = np.random.default_rng(seed)
+    t = np.arange(samples) / frequency
+    swell = rng.uniform(0.1, 0.8, (count, 1)) * np.sin(2 * np.pi * t / rng.uniform(8, 14, (count, 1)) + rng.uniform(0, 6, (count, 1)))
+    wind_sea = rng.uniform(0.02, 0.3, (count, 1)) * np.sin(2 * np.pi * t / rng.uniform(2, 4, (count, 1)))
+    tide = rng.uniform(-0.5, 0.5, (count, 1)) * t / t[-1]
+    noise = rng.normal(0, 0.01, (count, samples))
+    # pressure sensor resolution, some values are exactly zero after rounding
+    return np.round(swell + wind_sea + tide + noise, 3)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--days', type=int, default=30, help="days of hourly 4 Hz bursts timed")
+parser.add_argument('--check-bursts', type=int, default=200, help="bursts compared with the reference")
+parser.add_argument('--frequency', type=float, default=4)
+args = parser.parse_args()
+
+samples = int(3600 * args.frequency)
+test_vectors = [np.array([0.5, -1, 2, -1.5, 0, 1, -0.2, 0.1, -2, 1.5, 0.3, -0.8, 2.2, -1.0, 0.4]),
+                np.array([-0.3, 0.0, 0.0, 1.0, -1.0, 0.0, 2.0, -0.01, 0.02, -2.0, 1.0, -1.0, 0.5])]
+test_vectors += list(synthetic_bursts(args.check_bursts, samples, args.frequency))
+test_vectors += [burst[:samples // 7] for burst in synthetic_bursts(20, samples, args.frequency, seed=1)]
+
+differences = 0
+for burst in test_vectors:
+    x = np.arange(len(burst))
+    if not np.allclose(detrend_bursts(burst[np.newaxis])[0], burst - np.polyval(np.polyfit(x, burst, 1), x), atol=1e-12):
+        differences += 1
+        print("detrend differs from polyfit")
+for threshold in (None, 0.05):
+    results = zero_crossing_bursts(test_vectors, args.frequency, threshold)
+    for i, burst in enumerate(test_vectors):
+        expected = reference_zero_crossing(burst, args.frequency, threshold)
+        if not np.allclose(results[i], expected, rtol=1e-9, atol=1e-12, equal_nan=True):
+            differences += 1
+            print(f"burst {i} threshold {threshold}: {results[i]} instead of {expected}")
+print(f"{len(test_vectors)} test vectors compared with the reference, {differences} differences")
+
+bursts = synthetic_bursts(24 * args.days, samples, args.frequency, seed=2)
+start = time.perf_counter()
+zero_crossing_bursts(bursts, args.frequency)
+elapsed = time.perf_counter() - start
+start = time.perf_counter()
+for burst in bursts[:24]:
+    reference_zero_crossing(burst, args.frequency)
+reference_elapsed = (time.perf_counter() - start) * args.days
+print(f"{args.days} days of {args.frequency:g} Hz data ({bursts.size} values, {bursts.shape[0]} bursts): "
+      f"{elapsed:.2f} s, reference loop about {reference_elapsed:.1f} s")
+if differences:
+    sys.exit(1)
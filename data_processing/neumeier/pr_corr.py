@@ -0,0 +1,221 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Correction of depth attenuation of pressure, port of pr_corr.m (Urs Neumeier, version 1.09).
+#  Same results as the MATLAB function:
+#  - the series is cut in segments of M values overlapping by M/2, each one is zero padded to M,
+#    its spectrum divided by the correction factor cosh(k zpt)/cosh(k h), and the segments are joined with
+#    the half hann window overlap (first half of the first and second half of the last segment unweighted)
+#  - correction only between Corr_lim frequencies, never more than max_attenuation_correction, decreasing linearly
+#    above the maximum frequency
+#  - NaN values are left out during the processing and returned in the output
+#  - with depth h None (empty in MATLAB) each segment is detrended, corrected with its mean depth and the trend added back
+#  Instead of a loop over segments and a recursion over columns, all segments of all columns are put in one
+#  array (segments x M) and corrected with one rfft/irfft. Correction factors for a depth are computed once
+#  for the frequency grid and cached, in detrend mode the wave numbers of all segment depths are computed at once.
+
+import numpy as np
+import pandas as pd
+
+import functools
+
+from zero_crossing import MBAR_TO_M
+
+MAX_ATTENUATION_CORRECTION = 5
+CORR_LIM = (0.05, 0.33)
+MAX_SEGMENT_LENGTH = 512
+STANDARD_ATMOSPHERE_MBAR = 1013.25
+
+
+def wavenumbers(frequencies, depth):
+    ''' wave number of each frequency for depth (wavenumL, polynomial approximation of the dispersion relation) '''
+    ''' frequencies and depth are broadcast, e.g. depth column of segment depths and row of frequencies '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = 2 * np.pi * frequencies
+        dum1 = w ** 2 * depth / 9.81
+        # 1 + 0.6522 d + 0.4622 d^2 + 0.0864 d^4 + 0.0675 d^5 in Horner form
+        dum2 = dum1 + 1 / (1.0 + dum1 * (0.6522 + dum1 * (0.4622 + dum1 * dum1 * (0.0864 + 0.0675 * dum1))))
+        dum3 = np.sqrt(9.81 * depth * dum2 ** -1) / frequencies
+        return 2 * np.pi * dum3 ** -1
+
+
+def segment_frequencies(fs, M):
+    ''' frequency grid of a segment, first element NaN as in pr_corr.m '''
+    return np.concatenate([[np.nan], np.arange(1, M // 2 + 1) * fs / M])
+
+
+def theoretical_correction(frequencies, depth, zpt):
+    ''' cosh(k zpt)/cosh(k h), NaN where cosh overflows (deep water, high frequencies) '''
+    k = wavenumbers(frequencies, depth)
+    with np.errstate(over='ignore', invalid='ignore'):
+        return np.cosh(k * zpt) / np.cosh(k * depth)
+
+
+def correction_factors(frequencies, depth, zpt, corr_lim, max_attenuation_correction):
+    ''' correction factor used: 1 outside corr_lim, limited to max_attenuation_correction, linear decrease above corr_lim '''
+    ''' depth: scalar or array of depths (e.g. one per segment with trailing axis of length 1), frequencies in the last axis '''
+    min_frequency, max_frequency = corr_lim
+    length = frequencies.shape[0]
+    kpt = np.ones(np.broadcast_shapes(np.shape(depth), np.shape(zpt), frequencies.shape))
+    # factors outside corr_lim are 1 or replaced by the linear decrease, only those inside are computed
+    with np.errstate(invalid='ignore'):
+        band = np.flatnonzero((frequencies >= min_frequency) & (frequencies <= max_frequency))
+    kpt[..., band] = theoretical_correction(frequencies[band], depth, zpt)
+    with np.errstate(invalid='ignore'):
+        kpt[kpt < 1 / max_attenuation_correction] = 1 / max_attenuation_correction
+    fb_max = np.flatnonzero(frequencies <= max_frequency)[-1]
+    linear = np.arange(fb_max, min(fb_max + length // 10, length - 1) + 1)
+    kpt[..., linear] = (np.arange(len(linear), 0, -1) * (kpt[..., fb_max:fb_max + 1] - 1) / len(linear)) + 1
+    return kpt
+
+
+def segment_correction(depth, fs, M, zpt, corr_lim, max_attenuation_correction):
+    ''' correction factors of the rfft frequencies of a segment, mean (first element) is not corrected '''
+    kpt = correction_factors(segment_frequencies(fs, M), depth, zpt, corr_lim, max_attenuation_correction)
+    kpt[..., 0] = 1
+    return kpt
+
+
+@functools.lru_cache(maxsize=256)
+def cached_correction(depth, fs, M, zpt, corr_lim, max_attenuation_correction):
+    ''' correction factors of the rfft frequencies of a segment for one depth, computed once per argument set '''
+    kpt = segment_correction(depth, fs, M, zpt, corr_lim, max_attenuation_correction)
+    kpt.setflags(write=False)
+    return kpt
+
+
+def correction_table(h, fs, zpt, M, corr_lim=CORR_LIM, max_attenuation_correction=MAX_ATTENUATION_CORRECTION):
+    ''' data frame with theoretical and used correction factor for each frequency, as pr_corr([],H,Fs,Zpt,M) '''
+    frequencies = segment_frequencies(fs, M)
+    kpt = cached_correction(float(h), float(fs), int(M), float(zpt), tuple(corr_lim), max_attenuation_correction)
+    return pd.DataFrame({'frequency': frequencies[1:],
+                         'theoretical_correction': 1 / theoretical_correction(frequencies, h, zpt)[1:],
+                         'used_correction': 1 / kpt[1:]})
+
+
+def overlap_window(M):
+    ''' hann(M) with the second half replaced by 1 - first half, so overlapping halves add up to 1 '''
+    window = np.hanning(M)
+    window[M // 2:] = 1 - window[:M // 2]
+    return window
+
+
+def segments_of(series, M):
+    ''' segments of M values starting every M/2 values as in the pr_corr.m loop, zero padded '''
+    ''' series: 2d array (columns x values), returns array (columns x segments x M) and length of each segment '''
+    m = series.shape[-1]
+    N = -(-m // M) * M
+    count = 2 * N // M - 1
+    padded = np.zeros(series.shape[:-1] + (N + M // 2,))
+    padded[..., :m] = series
+    segments = np.lib.stride_tricks.sliding_window_view(padded, M, axis=-1)[..., :count * (M // 2):M // 2, :]
+    lengths = np.clip(m - np.arange(count) * (M // 2), 0, M)
+    return segments, lengths
+
+
+def linear_trends(segments, lengths):
+    ''' least squares line through the first length values of each segment (x = 1..length), returns (slope, intercept) '''
+    ''' values after length are zero padding, so sums over the whole segment are sums over the first length values '''
+    x = np.arange(1, segments.shape[-1] + 1, dtype=float)
+    n = lengths.astype(float)
+    sum_x = n * (n + 1) / 2
+    sum_xx = n * (n + 1) * (2 * n + 1) / 6
+    sum_y = segments.sum(axis=-1)
+    sum_xy = segments @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(n >= 2, (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x ** 2), 0.0)
+        intercept = np.where(n >= 1, (sum_y - slope * sum_x) / n, 0.0)
+    return slope, intercept
+
+
+def join_segments(corrected, lengths, m):
+    ''' overlap-add of corrected segments (columns x segments x M) into series of m values '''
+    M = corrected.shape[-1]
+    half = M // 2
+    weighted = corrected * overlap_window(M)
+    blocks = np.zeros(corrected.shape[:-2] + (corrected.shape[-2] + 1, half))
+    blocks[..., :-1, :] += weighted[..., :half]
+    blocks[..., 1:, :] += weighted[..., half:]
+    # first half of the first segment and second half of the last segment are not weighted
+    blocks[..., 0, :] = corrected[..., 0, :half]
+    if lengths[-1] > half:
+        blocks[..., -1, :] = corrected[..., -1, half:]
+    return blocks.reshape(corrected.shape[:-2] + (-1,))[..., :m]
+
+
+def correct_series(series, h, fs, zpt, M, corr_lim, max_attenuation_correction):
+    ''' pr_corr of columns x values array without NaN, h and zpt scalar or one value per column '''
+    m = series.shape[-1]
+    segments, lengths = segments_of(series, M)
+    zpt = np.asarray(zpt, dtype=float).reshape(-1, 1, 1)
+    if h is None:
+        slope, intercept = linear_trends(segments, lengths)
+        x = np.arange(1, M + 1, dtype=float)
+        trend = (intercept[..., np.newaxis] + slope[..., np.newaxis] * x) * (x <= lengths[:, np.newaxis])
+        segments = segments - trend
+        # mean water depth of each segment
+        depth = (intercept + slope * (lengths + 1) / 2)[..., np.newaxis]
+        kpt = segment_correction(depth, fs, M, zpt, corr_lim, max_attenuation_correction)
+    elif np.size(h) > 1:
+        # depth of each column, e.g. bursts with different mean depth
+        kpt = segment_correction(np.asarray(h, dtype=float).reshape(-1, 1, 1), fs, M, zpt, corr_lim, max_attenuation_correction)
+    elif zpt.size == 1:
+        kpt = cached_correction(float(h), float(fs), int(M), float(zpt[0, 0, 0]), tuple(corr_lim), max_attenuation_correction)
+    else:
+        kpt = np.stack([cached_correction(float(h), float(fs), int(M), float(z), tuple(corr_lim), max_attenuation_correction)
+                        for z in zpt.ravel()])[:, np.newaxis, :]
+    corrected = np.fft.irfft(np.fft.rfft(segments, axis=-1) / kpt, n=M, axis=-1)
+    if h is None:
+        corrected += trend
+    return join_segments(corrected, lengths, m)
+
+
+def pr_corr(pt, h, fs, zpt, M=None, corr_lim=CORR_LIM, max_attenuation_correction=MAX_ATTENUATION_CORRECTION):
+    ''' corrects detrended sea surface series pt (m) for depth attenuation of pressure, returns array shaped as pt '''
+    ''' h: mean water depth (m), can have one value per column, None: pt is sea surface above bottom and each segment is detrended '''
+    ''' fs: sampling frequency (Hz), zpt: height of pressure sensor above seabed (m), None: pt is returned unchanged '''
+    ''' M: segment length (even, default 512 or length of pt), corr_lim: (min, max) frequency of correction (Hz) '''
+    ''' pt can be 2d array (values x columns) as in MATLAB, each column is corrected separately, zpt can have one value per column '''
+    if zpt is None:
+        return pt
+    if len(corr_lim) != 2 or corr_lim[1] - corr_lim[0] <= 0 or min(corr_lim) < 0:
+        raise ValueError('Incorrect Corr_lim argument.')
+    pt = np.asarray(pt, dtype=float)
+    columns = pt.reshape(pt.shape[0], -1).T if pt.ndim > 1 else pt[np.newaxis]
+    zpt = np.broadcast_to(np.asarray(zpt, dtype=float).ravel(), (columns.shape[0],)) if np.size(zpt) in (1, columns.shape[0]) else None
+    if zpt is None:
+        raise ValueError('Incorrect length of argument Zpt !')
+    if h is not None:
+        if np.size(h) not in (1, columns.shape[0]):
+            raise ValueError('Incorrect length of argument H !')
+        h = np.broadcast_to(np.asarray(h, dtype=float).ravel(), (columns.shape[0],))
+    result = columns.copy()
+    not_nan = ~np.isnan(columns)
+    complete = not_nan.all(axis=1)
+    # columns without NaN are corrected together, columns with NaN one by one without their NaN values
+    groups = ([np.flatnonzero(complete)] if complete.any() else []) + [[i] for i in np.flatnonzero(~complete)]
+    for group in groups:
+        values = columns[group][not_nan[group]].reshape(len(group), -1)
+        m = values.shape[-1]
+        if m == 0:
+            continue
+        segment_length = min(MAX_SEGMENT_LENGTH, m) if M is None else M
+        if segment_length % 2:
+            raise ValueError('M must be even')
+        depth = None if h is None else (h[group] if len(set(h[group])) > 1 else h[group][0])
+        corrected = correct_series(values, depth, fs, zpt[group], segment_length, tuple(corr_lim), max_attenuation_correction)
+        rows = result[group]
+        rows[not_nan[group]] = corrected.ravel()
+        result[group] = rows
+    return result.T.reshape(pt.shape) if pt.ndim > 1 else result[0]
+
+
+def water_column(pressure_mbar, zpt, atmospheric_mbar=STANDARD_ATMOSPHERE_MBAR):
+    ''' sea surface above seabed (m) without attenuation correction: water above the sensor plus sensor height '''
+    return (pressure_mbar - atmospheric_mbar) * MBAR_TO_M + zpt
+
+
+def surface_elevation(pressure_mbar, zpt, fs=4, atmospheric_mbar=STANDARD_ATMOSPHERE_MBAR, M=None, corr_lim=CORR_LIM):
+    ''' sea surface above seabed (m) from OWHL pressure series, corrected for depth attenuation segment by segment '''
+    ''' zpt: height of the sensor above seabed (m), atmospheric_mbar: scalar or series aligned with pressure_mbar '''
+    corrected = pr_corr(water_column(pressure_mbar, zpt, atmospheric_mbar).to_numpy(dtype=float), None, fs, zpt, M, corr_lim)
+    return pd.Series(corrected, index=pressure_mbar.index, name='surface_elevation_m')
@@ -0,0 +1,133 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Spectral wave parameters from pressure data, port of wavesp.m (Urs Neumeier, version 1.11).
+#  Same steps as the MATLAB function for each burst (record) of sea surface above seabed in m:
+#  - h is the mean depth, the burst is detrended
+#  - spectral density with Welch method as the MATLAB spectrum function: Noseg segments of M values
+#    overlapping by M/2, hanning window, no detrending of segments, normalised by 2/Fs, first (mean) element removed
+#  - correction of the spectrum for pressure attenuation (as pr_corr, without zero padding or overlap)
+#  - moments m-2..m4 up to 1.5 x maximum correction frequency, Hm0 = 4 sqrt(m0), Tp at the spectrum maximum
+#  - zero crossing parameters of the burst corrected with pr_corr (zero_crossing.py)
+#  - bursts containing NaN give NaN results
+#  All bursts of the same length are processed at once: segments of all bursts are windowed and transformed with
+#  one rfft, corrections and moments are computed for all bursts in arrays. For large backfills bursts are
+#  split between worker processes.
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+from zero_crossing import zero_crossing_bursts, detrend_bursts, ZERO_CROSSING_NAMES
+from pr_corr import pr_corr, correction_factors, water_column, CORR_LIM, MAX_ATTENUATION_CORRECTION, STANDARD_ATMOSPHERE_MBAR
+
+SPECTRAL_NAMES = ['h', 'Hm0', 'Tp', 'm0']
+ALL_SPECTRAL_NAMES = SPECTRAL_NAMES + ['T_0_1', 'T_0_2', 'T_pc', 'EPS2', 'EPS4']
+DEFAULT_SEGMENTS = 4
+
+
+def wavesp_names(all_spectral=False, zero_crossing=True):
+    ''' names of the wave parameters returned, as NAMES of wavesp.m '''
+    names = ALL_SPECTRAL_NAMES if all_spectral else SPECTRAL_NAMES
+    return names + ZERO_CROSSING_NAMES if zero_crossing else list(names)
+
+
+def hanning(M):
+    ''' MATLAB hanning window (without the zero end points of hann) '''
+    return 0.5 * (1 - np.cos(2 * np.pi * np.arange(1, M + 1) / (M + 1)))
+
+
+def welch_spectra(bursts, fs, M):
+    ''' spectral density of each row of bursts (detrended) as P(2:end)*2/Fs of spectrum(PT,M,M/2,[],Fs) in wavesp.m '''
+    ''' returns frequencies (without 0) and array bursts x frequencies '''
+    half = M // 2
+    count = (bursts.shape[-1] - half) // (M - half)
+    window = hanning(M)
+    segments = np.lib.stride_tricks.sliding_window_view(bursts, M, axis=-1)[:, :count * half:half, :]
+    power = (np.abs(np.fft.rfft(segments * window, axis=-1)) ** 2).sum(axis=1)
+    power /= count * (window @ window)
+    frequencies = np.arange(1, half + 1) * fs / M
+    return frequencies, power[:, 1:] * 2 / fs
+
+
+def spectral_parameters(spectra, frequencies, depth, zpt, corr_lim, all_spectral):
+    ''' h, Hm0, Tp, m0 (and T_0_1, T_0_2, T_pc, EPS2, EPS4) of each spectrum, corrected for attenuation when zpt is given '''
+    if zpt is not None:
+        kpt = correction_factors(frequencies, depth[:, np.newaxis], np.asarray(zpt, dtype=float).reshape(-1, 1),
+                                 corr_lim, MAX_ATTENUATION_CORRECTION)
+        spectra = spectra / kpt ** 2
+    # frequency range over which the spectrum is integrated for the moments
+    integrated = frequencies <= corr_lim[1] * 1.5
+    df = frequencies[0]
+    moment = {i: (frequencies[integrated] ** i * spectra[:, integrated]).sum(axis=1) * df for i in range(-2, 5)}
+    m0 = moment[0]
+    parameters = [depth, 4 * np.sqrt(m0), 1 / frequencies[np.argmax(spectra, axis=1)], m0]
+    if all_spectral:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            parameters += [m0 / moment[1], np.sqrt(m0 / moment[2]), moment[-2] * moment[1] / m0 ** 2,
+                           np.sqrt(m0 * moment[2] / moment[1] ** 2 - 1), np.sqrt(1 - moment[2] ** 2 / (m0 * moment[4]))]
+    return np.column_stack(parameters)
+
+
+def wavesp_bursts(bursts, zpt, fs, corr_lim=CORR_LIM, noseg=DEFAULT_SEGMENTS, all_spectral=False, zero_crossing=True):
+    ''' wave parameters (columns wavesp_names(all_spectral, zero_crossing)) of each burst, one row per burst '''
+    ''' bursts: 2d array with one burst per row or sequence of 1d arrays, sea surface above seabed in m '''
+    ''' zpt: height of the sensor above seabed (m), scalar or one value per burst, None: no attenuation correction '''
+    if len(corr_lim) != 2 or corr_lim[1] - corr_lim[0] <= 0 or min(corr_lim) < 0:
+        raise ValueError('Incorrect Corr_lim argument.')
+    if isinstance(bursts, np.ndarray) and bursts.ndim == 2:
+        bursts = list(bursts)
+    bursts = [np.asarray(burst, dtype=float).ravel() for burst in bursts]
+    zpts = None if zpt is None else np.broadcast_to(np.asarray(zpt, dtype=float).ravel(), (len(bursts),))
+    results = np.full((len(bursts), len(wavesp_names(all_spectral, zero_crossing))), np.nan)
+    lengths = np.array([0 if np.isnan(burst).any() else len(burst) for burst in bursts])
+    # bursts of the same length (segment length M) are processed together
+    for length in np.unique(lengths):
+        M = int(length / noseg / 2) * 2
+        if M < 2:
+            continue
+        rows = np.flatnonzero(lengths == length)
+        values = np.vstack([bursts[i] for i in rows])
+        depth = values.mean(axis=1)
+        detrended = detrend_bursts(values)
+        frequencies, spectra = welch_spectra(detrended, fs, M)
+        burst_zpt = None if zpts is None else zpts[rows]
+        spectral = spectral_parameters(spectra, frequencies, depth, burst_zpt, corr_lim, all_spectral)
+        if zero_crossing:
+            surface = detrended if burst_zpt is None else pr_corr(detrended.T, depth, fs, burst_zpt, M, corr_lim).T
+            spectral = np.hstack([spectral, zero_crossing_bursts(surface, fs)])
+        results[rows] = spectral
+    return results
+
+
+def split_bursts(series, fs, burst, min_samples):
+    ''' bursts starts and values of series indexed by time, bursts with less than min_samples values are left out '''
+    expected = pd.Timedelta(burst).total_seconds() * fs
+    min_samples = int(0.9 * expected) if min_samples is None else min_samples
+    starts, bursts = [], []
+    for start, values in series.groupby(series.index.floor(burst)):
+        if values.shape[0] >= min_samples:
+            starts.append(start)
+            bursts.append(values.to_numpy(dtype=float))
+    return starts, bursts
+
+
+def wave_parameters(pressure_mbar, zpt, fs=4, burst='1h', min_samples=None, atmospheric_mbar=STANDARD_ATMOSPHERE_MBAR,
+                    corr_lim=CORR_LIM, all_spectral=False, workers=1, bursts_per_task=24):
+    ''' wave parameters of each burst of OWHL pressure series indexed by time, data frame indexed by burst start '''
+    ''' zpt: height of the sensor above seabed (m), None: no attenuation correction (depth is then water above sensor) '''
+    ''' bursts with less than min_samples values (default 90% of a burst) are left out '''
+    ''' workers > 1: bursts are processed in a pool of worker processes, bursts_per_task bursts at a time '''
+    names = wavesp_names(all_spectral)
+    surface = water_column(pressure_mbar, 0 if zpt is None else zpt, atmospheric_mbar)
+    starts, bursts = split_bursts(surface, fs, burst, min_samples)
+    if not bursts:
+        return pd.DataFrame(columns=names, index=pd.DatetimeIndex([], name='time'), dtype=float)
+    if workers > 1 and len(bursts) > bursts_per_task:
+        tasks = [bursts[i:i + bursts_per_task] for i in range(0, len(bursts), bursts_per_task)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(wavesp_bursts, task, zpt, fs, corr_lim, DEFAULT_SEGMENTS, all_spectral) for task in tasks]
+            results = np.vstack([future.result() for future in futures])
+    else:
+        results = wavesp_bursts(bursts, zpt, fs, corr_lim, DEFAULT_SEGMENTS, all_spectral)
+    return pd.DataFrame(results, columns=names, index=pd.DatetimeIndex(starts, name='time'))
@@ -0,0 +1,221 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Zero crossing analysis of wave data, port of zero_crossing.m (Urs Neumeier, version 1.06).
+#  Same steps as the MATLAB function, zero downward-crossing:
+#  - the data is negated and the linear trend removed (detrend)
+#  - crossings are sign changes between consecutive non zero values, the first one is dropped when it is downward,
+#    every second crossing starts a wave
+#  - crest and trough of each wave are max and -min from its crossing to the next one (both included)
+#  - waves with crest or trough below threshold (1% of the highest wave by default) are joined to the adjacent wave
+#    exactly as the MATLAB loop does it (the wave following a removed or joined wave is not checked)
+#  - H_significant and T_s are the means of the highest third of the waves, H_10 of the highest tenth (MATLAB rounding)
+#  Many bursts (e.g. hourly bursts of OWHL data) are analysed in one call: crossings and crests of all bursts
+#  are found with numpy on the concatenated data (np.maximum.reduceat), only waves below threshold are handled in python.
+#  Bursts containing NaN give NaN results.
+#  Pressure data must be corrected for depth attenuation (pr_corr.m) before, see burst_statistics.
+
+import numpy as np
+import pandas as pd
+
+ZERO_CROSSING_NAMES = ['H_significant', 'H_mean', 'H_10', 'H_max', 'T_mean', 'T_s']
+
+SEAWATER_DENSITY = 1025.0
+GRAVITY = 9.81
+# metres of sea water per mbar of pressure
+MBAR_TO_M = 100 / (SEAWATER_DENSITY * GRAVITY)
+
+
+def matlab_round(values):
+    ''' round half away from zero as MATLAB round, numpy rounds half to even '''
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+def detrend_bursts(bursts):
+    ''' removes least squares straight line from each row of 2d array '''
+    x = np.arange(bursts.shape[1], dtype=float)
+    x -= x.mean()
+    centred = bursts - bursts.mean(axis=1, keepdims=True)
+    # row wise sums, the result of a burst does not depend on the other bursts
+    slope = (centred * x).sum(axis=1) / (x * x).sum()
+    return centred - slope[:, np.newaxis] * x
+
+
+def as_bursts(bursts):
+    ''' list of float arrays from 2d array (one burst per row) or sequence of 1d arrays of any length '''
+    if isinstance(bursts, np.ndarray) and bursts.ndim == 2:
+        return [row for row in bursts.astype(float)]
+    return [np.asarray(burst, dtype=float).ravel() for burst in bursts]
+
+
+def detrended_series(bursts):
+    ''' negated and detrended bursts concatenated, with start of each burst, NaN bursts are left empty '''
+    bursts = as_bursts(bursts)
+    lengths = np.array([len(burst) if len(burst) and not np.isnan(burst).any() else 0 for burst in bursts], dtype=np.int64)
+    pieces = []
+    # bursts of the same length are detrended together
+    for length in np.unique(lengths[lengths > 0]):
+        indices = np.flatnonzero(lengths == length)
+        pieces.extend(zip(indices, detrend_bursts(-np.vstack([bursts[i] for i in indices]))))
+    pieces.sort(key=lambda piece: piece[0])
+    data = np.concatenate([piece[1] for piece in pieces]) if pieces else np.zeros(0)
+    starts = np.concatenate([[0], np.cumsum(lengths)])
+    return data, starts
+
+
+def upward_crossings(data, starts):
+    ''' index of the last value before each zero upward crossing of negated data, and its burst number '''
+    burst_of = np.repeat(np.arange(len(starts) - 1), np.diff(starts))
+    nonzero = np.flatnonzero(data != 0)
+    values = data[nonzero]
+    pairs = np.flatnonzero((values[:-1] * values[1:] < 0) & (burst_of[nonzero[:-1]] == burst_of[nonzero[1:]]))
+    crossings = nonzero[pairs]
+    bursts = burst_of[crossings]
+    # rank of each crossing within its burst
+    first_of_burst = np.searchsorted(bursts, bursts, side='left')
+    rank = np.arange(len(crossings)) - first_of_burst
+    # first crossing is downward when the burst starts above zero
+    burst_starts_positive = np.zeros(len(starts) - 1, dtype=bool)
+    not_empty = np.diff(starts) > 0
+    burst_starts_positive[not_empty] = data[starts[:-1][not_empty]] > 0
+    rank -= burst_starts_positive[bursts]
+    keep = (rank >= 0) & (rank % 2 == 0)
+    return crossings[keep], bursts[keep]
+
+
+def join_small_waves(crest, trough, period, threshold, burst_start, burst_end):
+    ''' joins waves with crest or trough below threshold to adjacent waves as the loop in zero_crossing.m '''
+    ''' arrays are changed in place, returns mask of waves kept '''
+    ''' burst_start, burst_end: index of the first wave and after the last wave of the burst of each wave '''
+    keep = np.ones(len(crest), dtype=bool)
+    small = np.flatnonzero((crest < threshold) | (trough < threshold))
+    # waves before position are processed, last_kept is the last wave kept so far
+    position = last_kept = current_end = -1
+    for i in small:
+        if burst_end[i] != current_end:
+            current_end = burst_end[i]
+            position = burst_start[i]
+            last_kept = position - 1
+        if i < position:
+            # joined to the previous wave or skipped by the MATLAB loop
+            continue
+        if i > position:
+            last_kept = i - 1
+        if crest[i] < threshold[i]:
+            keep[i] = False
+            if last_kept >= burst_start[i]:
+                crest[last_kept] = max(crest[last_kept], crest[i])
+                trough[last_kept] = max(trough[last_kept], trough[i])
+                period[last_kept] += period[i]
+            # the next wave takes the place of the removed one and is not checked
+            if i + 1 < current_end:
+                last_kept = i + 1
+            position = i + 2
+        elif i + 1 < current_end:
+            crest[i] = max(crest[i], crest[i + 1])
+            trough[i] = max(trough[i], trough[i + 1])
+            period[i] += period[i + 1]
+            keep[i + 1] = False
+            last_kept = i
+            position = i + 2
+        else:
+            # last wave of the burst with small trough
+            keep[i] = False
+            position = i + 1
+    return keep
+
+
+def wave_statistics(crest, trough, period, burst, burst_count):
+    ''' H_significant, H_mean, H_10, H_max, T_mean, T_s of each burst, NaN for bursts without waves '''
+    height = crest + trough
+    # waves of each burst in descending order of rows (height, crest, trough, period), as flipud(sortrows(wave)),
+    # crest, trough and period only matter for waves of equal height
+    order = np.lexsort((-height, burst))
+    if np.any((height[order][1:] == height[order][:-1]) & (burst[order][1:] == burst[order][:-1])):
+        order = np.lexsort((-period, -trough, -crest, -height, burst))
+    height, period, burst = height[order], period[order], burst[order]
+    count = np.bincount(burst, minlength=burst_count)
+    first = np.concatenate([[0], np.cumsum(count)[:-1]])
+    rank = np.arange(len(burst)) - first[burst]
+    third = rank < matlab_round(count / 3)[burst]
+    tenth = rank < matlab_round(count * 0.1)[burst]
+
+    def mean(values, mask=None):
+        weights = values if mask is None else values * mask
+        selected = count if mask is None else np.bincount(burst, mask.astype(float), minlength=burst_count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.bincount(burst, weights, minlength=burst_count) / selected
+
+    h_max = np.full(burst_count, np.nan)
+    h_max[count > 0] = height[first[count > 0]]
+    return np.column_stack([mean(height, third), mean(height), mean(height, tenth), h_max, mean(period), mean(period, third)])
+
+
+def zero_crossing_bursts(bursts, frequency, threshold=None, return_waves=False):
+    ''' zero crossing parameters (columns ZERO_CROSSING_NAMES) of each burst, one row per burst '''
+    ''' bursts: 2d array with one burst per row or sequence of 1d arrays, water elevation in m '''
+    ''' threshold: minimum crest and trough of a wave, default 1% of the highest wave of each burst '''
+    ''' return_waves: returns also list with (height, period) array of the waves of each burst, as RESULT.wave in MATLAB '''
+    if frequency <= 0:
+        raise ValueError('Frequency must be greater than zero')
+    if threshold is not None and threshold < 0:
+        raise ValueError('Wave threshold must not be negative')
+    data, starts = detrended_series(bursts)
+    burst_count = len(starts) - 1
+    if burst_count == 0:
+        results = np.zeros((0, len(ZERO_CROSSING_NAMES)))
+        return (results, []) if return_waves else results
+    crossings, crossing_burst = upward_crossings(data, starts)
+    # waves between consecutive crossings of the same burst
+    same_burst = crossing_burst[:-1] == crossing_burst[1:]
+    wave_start = crossings[:-1][same_burst]
+    wave_end = crossings[1:][same_burst]
+    burst = crossing_burst[:-1][same_burst]
+    if len(crossings):
+        # reduceat over [start, next crossing) of all crossings, the end value is included separately
+        crest = np.maximum(np.maximum.reduceat(data, crossings)[:-1][same_burst], data[wave_end])
+        trough = -np.minimum(np.minimum.reduceat(data, crossings)[:-1][same_burst], data[wave_end])
+    else:
+        crest = trough = np.zeros(0)
+    period = (wave_end - wave_start) / frequency
+    if threshold is None:
+        burst_threshold = np.zeros(burst_count)
+        np.maximum.at(burst_threshold, burst, 0.01 * (crest + trough))
+    else:
+        burst_threshold = np.full(burst_count, float(threshold))
+    waves_per_burst = np.bincount(burst, minlength=burst_count)
+    after_last_wave = np.cumsum(waves_per_burst)
+    first_wave = after_last_wave - waves_per_burst
+    keep = join_small_waves(crest, trough, period, burst_threshold[burst], first_wave[burst], after_last_wave[burst])
+    crest, trough, period, burst = crest[keep], trough[keep], period[keep], burst[keep]
+    results = wave_statistics(crest, trough, period, burst, burst_count)
+    if not return_waves:
+        return results
+    height = crest + trough
+    bounds = np.searchsorted(burst, np.arange(burst_count + 1))
+    waves = [np.column_stack([height[bounds[i]:bounds[i + 1]], period[bounds[i]:bounds[i + 1]]]) for i in range(burst_count)]
+    return results, waves
+
+
+def zero_crossing(data, frequency, threshold=None):
+    ''' zero crossing parameters of one series as dict with ZERO_CROSSING_NAMES and 'wave' (height, period) as in MATLAB '''
+    results, waves = zero_crossing_bursts([data], frequency, threshold, return_waves=True)
+    result = dict(zip(ZERO_CROSSING_NAMES, results[0]))
+    result['wave'] = waves[0]
+    return result
+
+
+def burst_statistics(pressure_mbar, frequency=4, burst='1h', min_samples=None, correct=None):
+    ''' zero crossing parameters of each burst of OWHL pressure series indexed by time, data frame indexed by burst start '''
+    ''' pressure is converted to metres of sea water, correct: optional function applied to each burst in metres '''
+    ''' (e.g. depth attenuation correction), bursts with less than min_samples values (default 90%) are left out '''
+    groups = pressure_mbar.groupby(pressure_mbar.index.floor(burst))
+    expected = pd.Timedelta(burst).total_seconds() * frequency
+    min_samples = int(0.9 * expected) if min_samples is None else min_samples
+    starts, bursts = [], []
+    for start, values in groups:
+        if values.shape[0] >= min_samples:
+            elevation = values.to_numpy(dtype=float) * MBAR_TO_M
+            starts.append(start)
+            bursts.append(correct(elevation) if correct is not None else elevation)
+    results = zero_crossing_bursts(bursts, frequency) if bursts else np.zeros((0, len(ZERO_CROSSING_NAMES)))
+    return pd.DataFrame(results, columns=ZERO_CROSSING_NAMES, index=pd.DatetimeIndex(starts, name='time'))
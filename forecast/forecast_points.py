@@ -0,0 +1,199 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Extraction of forecast time series at the testing locations from MyWave wam800 NetCDF files
+#  (forecast_files/MyWave_wam800_c4WAVE*.nc, downloaded by get_forecast_data.py).
+#  - every location is mapped to the nearest wet grid point: the curvilinear latitude/longitude grid (rlat, rlon)
+#    is converted to points on the unit sphere and put in a KD-tree (scipy cKDTree), land points (masked
+#    in the first time step of the first variable) are left out
+#  - the grid does not change between forecast runs, wet points and the grid point of each location are cached
+#    in --cache-dir, the cache is found by the grid shape and a few coordinate values, which are read lazily,
+#    so a run with a known grid does not read latitude, longitude or the land mask at all
+#  - values are read per location and variable as var[:, y, x], netCDF4 reads only the chunks holding the cell,
+#    the time of extraction depends on the number of locations and time steps, not on the size of the file
+#  Variables with more dimensions than (time, y, x), e.g. spectra of the SPC files, are not extracted.
+
+import netCDF4
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+import os
+import json
+import hashlib
+import logging
+
+EARTH_RADIUS_KM = 6371.0
+WAVE_VARIABLES = ['hs', 'tp', 'tm1', 'tm2', 'thq', 'Pdir', 'hs_sea', 'tp_sea', 'thq_sea', 'hs_swell', 'tp_swell', 'thq_swell', 'ff', 'dd']
+LATITUDE_NAMES = ['latitude', 'lat']
+LONGITUDE_NAMES = ['longitude', 'lon']
+
+LOGGER = logging.getLogger(__name__)
+
+
+def unit_vectors(lat_deg, lon_deg):
+    ''' points on the unit sphere, euclidean distance between them grows with great circle distance '''
+    lat, lon = np.radians(lat_deg), np.radians(lon_deg)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    ''' great circle distance of chord length on the unit sphere '''
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord, 2.0) / 2)
+
+
+def coordinate_variable(dataset, names, standard_name):
+    ''' latitude or longitude variable of dataset, by standard_name or by common names '''
+    for variable in dataset.variables.values():
+        if getattr(variable, 'standard_name', None) == standard_name:
+            return variable
+    for name in names:
+        if name in dataset.variables:
+            return dataset.variables[name]
+    raise KeyError(f"no {standard_name} variable in {dataset.filepath()}")
+
+
+def grid_variables(dataset):
+    ''' (latitude, longitude) variables, 2D over (y, x) or 1D of a regular grid '''
+    return (coordinate_variable(dataset, LATITUDE_NAMES, 'latitude'), coordinate_variable(dataset, LONGITUDE_NAMES, 'longitude'))
+
+
+def grid_shape(latitude, longitude):
+    ''' (ny, nx) of the grid '''
+    if latitude.ndim == 2:
+        return tuple(latitude.shape)
+    return (latitude.shape[0], longitude.shape[0])
+
+
+def coordinates_at(latitude, longitude, y, x):
+    ''' (lat, lon) of grid point (y, x), reads only the point '''
+    if latitude.ndim == 2:
+        return float(latitude[y, x]), float(longitude[y, x])
+    return float(latitude[y]), float(longitude[x])
+
+
+def grid_key(latitude, longitude):
+    ''' name of the grid cache: shape and coordinates of corners and center, read lazily '''
+    ny, nx = grid_shape(latitude, longitude)
+    probes = [(0, 0), (0, nx - 1), (ny - 1, 0), (ny - 1, nx - 1), (ny // 2, nx // 2)]
+    values = [value for y, x in probes for value in coordinates_at(latitude, longitude, y, x)]
+    digest = hashlib.sha1(','.join(f"{value:.5f}" for value in values).encode()).hexdigest()[:8]
+    return f"grid_{ny}x{nx}_{digest}"
+
+
+def wet_mask(dataset, variables):
+    ''' True for grid points with a value in the first time step of the first of variables '''
+    for name in variables:
+        if name in dataset.variables and dataset.variables[name].ndim == 3:
+            values = np.ma.masked_invalid(dataset.variables[name][0, :, :])
+            return ~np.ma.getmaskarray(values)
+    raise KeyError(f"none of {variables} in {dataset.filepath()}")
+
+
+class GridIndex:
+    ''' nearest wet grid point of locations, cached in cache_dir for the grid of dataset '''
+
+    def __init__(self, dataset, cache_dir, variables=WAVE_VARIABLES):
+        self.dataset = dataset
+        self.variables = variables
+        self.latitude, self.longitude = grid_variables(dataset)
+        self.shape = grid_shape(self.latitude, self.longitude)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        key = grid_key(self.latitude, self.longitude)
+        self.points_path = os.path.join(cache_dir, key + '.npz')
+        self.locations_path = os.path.join(cache_dir, key + '.json')
+        self.tree = None
+        self.flat_index = None
+        self.locations = {}
+        if os.path.exists(self.locations_path):
+            with open(self.locations_path) as file:
+                self.locations = json.load(file)
+
+    def load_tree(self):
+        ''' KD-tree of wet points, from the cache or built from the grid and the land mask '''
+        if os.path.exists(self.points_path):
+            cached = np.load(self.points_path)
+            points, self.flat_index = cached['points'], cached['flat_index']
+            LOGGER.info(f"{len(self.flat_index)} wet grid points loaded from {self.points_path}.")
+        else:
+            if self.latitude.ndim == 2:
+                lat, lon = self.latitude[:, :], self.longitude[:, :]
+            else:
+                lon, lat = np.meshgrid(self.longitude[:], self.latitude[:])
+            wet = wet_mask(self.dataset, self.variables) & np.isfinite(np.ma.filled(lat, np.nan)) & np.isfinite(np.ma.filled(lon, np.nan))
+            self.flat_index = np.flatnonzero(wet)
+            points = unit_vectors(np.ma.filled(lat, np.nan).ravel()[self.flat_index], np.ma.filled(lon, np.nan).ravel()[self.flat_index])
+            tmp_path = self.points_path + '.tmp.npz'
+            np.savez(tmp_path, points=points, flat_index=self.flat_index)
+            os.replace(tmp_path, self.points_path)
+            LOGGER.info(f"{len(self.flat_index)} wet of {wet.size} grid points cached in {self.points_path}.")
+        self.tree = cKDTree(points)
+
+    def location_key(self, lat_deg, lon_deg):
+        return f"{lat_deg:.6f},{lon_deg:.6f}"
+
+    def nearest(self, locations):
+        ''' (y, x, distance km) of the nearest wet grid point for each (lat, lon) of locations '''
+        missing = [location for location in locations if self.location_key(*location) not in self.locations]
+        if missing:
+            if self.tree is None:
+                self.load_tree()
+            distances, indices = self.tree.query(unit_vectors(*np.array(missing).T))
+            for (lat_deg, lon_deg), distance, index in zip(missing, distances, indices):
+                y, x = np.unravel_index(self.flat_index[index], self.shape)
+                self.locations[self.location_key(lat_deg, lon_deg)] = [int(y), int(x), float(chord_to_km(distance))]
+            tmp_path = self.locations_path + '.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(self.locations, file, indent=1)
+            os.replace(tmp_path, self.locations_path)
+        return [tuple(self.locations[self.location_key(*location)]) for location in locations]
+
+
+def forecast_times(dataset):
+    ''' UTC times of the time dimension '''
+    time = dataset.variables['time']
+    times = netCDF4.num2date(time[:], time.units, getattr(time, 'calendar', 'standard'),
+        only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+    return pd.DatetimeIndex(pd.to_datetime(times)).tz_localize('UTC')
+
+
+def point_variables(dataset, variables):
+    ''' names of variables over (time, y, x) present in dataset '''
+    names = []
+    for name in variables:
+        if name not in dataset.variables:
+            continue
+        if dataset.variables[name].ndim != 3:
+            LOGGER.info(f"{name} has dimensions {dataset.variables[name].dimensions}, not extracted.")
+            continue
+        names.append(name)
+    return names
+
+
+def extract_points(file_path, locations_df, cache_dir, variables=WAVE_VARIABLES, max_distance_km=None):
+    ''' forecast time series at locations (data frame with lat_deg, lon_deg), nearest wet grid point of each '''
+    ''' locations farther than max_distance_km from the nearest wet grid point (outside of the model domain) are left out '''
+    ''' returns (data frame indexed by time with the columns of locations_df, grid_lat, grid_lon, grid_distance_km and variables, variables) '''
+    with netCDF4.Dataset(file_path) as dataset:
+        index = GridIndex(dataset, cache_dir, variables)
+        grid_points = index.nearest(list(zip(locations_df['lat_deg'], locations_df['lon_deg'])))
+        names = point_variables(dataset, variables)
+        times = forecast_times(dataset)
+        frames = []
+        for (_, location), (y, x, distance) in zip(locations_df.iterrows(), grid_points):
+            if max_distance_km is not None and distance > max_distance_km:
+                LOGGER.warning(f"{location.get('code', location.name)}: nearest wet grid point {distance:.1f} km away, not extracted.")
+                continue
+            df = pd.DataFrame(index=times)
+            for name in names:
+                df[name] = np.ma.filled(np.ma.masked_invalid(dataset.variables[name][:, y, x]).astype(float), np.nan)
+            for column, value in location.items():
+                df[column] = value
+            df['grid_lat'], df['grid_lon'] = coordinates_at(index.latitude, index.longitude, y, x)
+            df['grid_distance_km'] = distance
+            frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=list(locations_df.columns) + names).rename_axis('time'), names
+    df = pd.concat(frames)
+    df.index.name = 'time'
+    return df, names
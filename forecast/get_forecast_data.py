@@ -1,7 +1,8 @@
 #Anna Wojciechowska, Oslo August 2024
 # script to download wave forecast file from met.no threads server
-import requests
-
+# files are streamed to disk, skipped when not modified on the server, resumed when interrupted
+# and downloaded concurrently, see common/http_download.py
+# usage: python3 get_forecast_data.py [-d] [--base-url http://127.0.0.1:8087 (e.g. common/fake_file_server.py)]
 import pytz
 from datetime import datetime as dt
 from datetime import timedelta
@@ -15,31 +16,12 @@ import argparse
 import traceback
 import logging
 
-def get_script_name():
-    ''' gets a script name, log are named after the script '''
-    script_path = sys.argv[0]
-    path_elems = script_path.split('/')
-    script_name = path_elems[len(path_elems) - 1]
-    res = script_name.split('.py')
-    return res[0]
-
-def set_up_log(log_dir, log_filename):
-    # to do create log when does not exist even if folder exists
-    ''' creates a log in script running directory '''
-    script_run_dir = os.getcwd()
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
-    #check if log dir exist, create both log dir and log file if necessary
-    if not os.path.isdir(os.path.join(script_run_dir, log_dir)):
-        os.mkdir(os.path.join(script_run_dir, log_dir))
-    file_handler = logging.FileHandler(os.path.join(script_run_dir, log_dir, log_filename), mode='w')
-    file_handler.setFormatter(logging.Formatter(fmt='%(asctime)s [%(pathname)s:%(lineno)d] [%(levelname)s] %(message)s', datefmt='%a, %d %b %Y %H:%M:%S'))
-    logger = logging.getLogger()
-    logger.addHandler(file_handler)
-    logger.setLevel(logging.INFO)
-    return logger
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_setup import set_up_log, get_script_name
+from http_download import Downloader
 
-def download_forecast():
+def forecast_downloads(base_url):
+    ''' (url, file name) of WAVE and SPC forecast files of the latest run, file names get the date '''
     # since bolge server is in UTC I need to localize the time to Oslo CEST +2/3
     oslo_time = pytz.timezone("Europe/Oslo")
     now = oslo_time.localize(dt.now())
@@ -47,37 +29,67 @@ def download_forecast():
     hour_suffix  = '00'
     if now.hour // 12 == 1:
         hour_suffix  = '12'
-    file_name = f"MyWave_wam800_c4WAVE{hour_suffix}_{formatted_date}.nc"
-    download_directory = "forecast_files"
-    download_location = (os.path.join(os.getcwd(), download_directory, file_name))
-    url  = f"https://thredds.met.no/thredds/fileServer/fou-hi/mywavewam800s/MyWave_wam800_c4WAVE{hour_suffix}.nc"
-    response = requests.get(url)
-    if response.status_code == 200:
-        LOGGER.info(f"Status code ok: {response.status_code}")
-        with open(download_location, 'wb') as file:
-            file.write(response.content)
-        LOGGER.info(f"Downloaded: {file_name}")
-    else:
-        LOGGER.error(f"Not ok status code: {response.status_code}")
-    file_name = f"MyWave_wam800_c4SPC{hour_suffix}_{formatted_date}.nc"
-    download_directory = "forecast_files"
-    download_location = (os.path.join(os.getcwd(), download_directory, file_name))
-    url  = f"https://thredds.met.no/thredds/fileServer/fou-hi/mywavewam800s/MyWave_wam800_c4SPC{hour_suffix}.nc"
-    response = requests.get(url)
-    if response.status_code == 200:
-        LOGGER.info(f"Status code ok: {response.status_code}")
-        with open(download_location, 'wb') as file:
-            file.write(response.content)
-        LOGGER.info(f"Downloaded: {file_name}")
-    else:
-        LOGGER.error(f"Not ok status code: {response.status_code}")
-    
-START_SCRIPT_TIME = dt.now()
-LOGNAME = get_script_name() + '.log'
+    downloads = []
+    for product in ['WAVE', 'SPC']:
+        file_name = f"MyWave_wam800_c4{product}{hour_suffix}_{formatted_date}.nc"
+        url  = f"{base_url}/MyWave_wam800_c4{product}{hour_suffix}.nc"
+        downloads.append((url, file_name))
+    return downloads
+
+def download_forecast(base_url, download_directory, workers):
+    ''' downloads WAVE and SPC files concurrently, files not modified on the server since the last run are skipped '''
+    ''' returns True when both files are downloaded or up to date '''
+    download_location = os.path.join(os.getcwd(), download_directory)
+    if not os.path.isdir(download_location):
+        os.mkdir(download_location)
+    downloader = Downloader(download_location, pool_size=workers)
+    downloads = forecast_downloads(base_url)
+    results = downloader.download_all(downloads, workers)
+    downloader.close()
+    for (url, file_name), result in zip(downloads, results):
+        if isinstance(result, Exception):
+            LOGGER.error(f"Not downloaded: {file_name}, a partial file is kept and resumed by the next run.")
+        elif result[0] == 'not modified':
+            LOGGER.info(f"{url} not modified since last download, {file_name} not downloaded.")
+        else:
+            LOGGER.info(f"Downloaded: {file_name} ({result[0]}, {result[1]} bytes transferred)")
+    return not any(isinstance(result, Exception) for result in results)
+
+THREDDS_URL = 'https://thredds.met.no/thredds/fileServer/fou-hi/mywavewam800s'
 LOG_DIR = 'logs'
-LOGGER = set_up_log(LOG_DIR, LOGNAME)
+LOGGER = logging.getLogger(__name__)
 
-if __name__ == "__main__":
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--dry-run', action='store_true',
+        help="does not download, just lists the urls and file names")
+    parser.add_argument('--base-url', default=THREDDS_URL,
+        help="directory url of the forecast files")
+    parser.add_argument('--download-dir', default='forecast_files',
+        help="directory the files are downloaded to")
+    parser.add_argument('-w', '--workers', type=int, default=2,
+        help="number of files downloaded at the same time")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, writers=None):
+    ''' runs the script in the current directory, argv without the script name (sys.argv[1:] by default) '''
+    ''' writers (InfluxWriters of ingest.py) are not used, forecast files are only downloaded '''
+    start_script_time = dt.now()
+    set_up_log(LOG_DIR, get_script_name(__file__) + '.log', mode='w')
+    args = parse_arguments(argv)
     LOGGER.info("start script")
-    download_forecast()
-    LOGGER.info("end script")
+    if args.dry_run:
+        for url, file_name in forecast_downloads(args.base_url):
+            LOGGER.info(f"{url} -> {file_name}")
+        downloaded = True
+    else:
+        downloaded = download_forecast(args.base_url, args.download_dir, args.workers)
+    LOGGER.info(f"end script, duration: {dt.now() - start_script_time} [ms]")
+    if not downloaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
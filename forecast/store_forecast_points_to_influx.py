@@ -0,0 +1,141 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Script to write wave forecast at the testing locations (owhl/sensor_location_data.csv) to influx db 1.8.
+#  Reads the latest MyWave_wam800_c4WAVE*.nc in "forecast_files" (downloaded by get_forecast_data.py),
+#  or the files given as arguments, values of the nearest wet grid point of each location, see forecast_points.py.
+#  Locations outside of the model domain (--max-distance-km from a wet grid point) are left out.
+#  The nearest grid points are cached in "forecast_files/grid_index", a forecast file of a known grid
+#  is read only at the cells of the locations.
+#  Points of a newer forecast run overwrite the points of the older run at the same time.
+#  usage: python3 store_forecast_points_to_influx.py [-d] [forecast_files/MyWave_wam800_c4WAVE00_18_10_2026.nc]
+#
+#  This script is wrting to
+#  database: 'sensor'
+#  measurement: 'wave_forecast'
+#  tags: 'location_name', 'code'
+#  fields: variables of the file (WAVE_VARIABLES of forecast_points.py: 'hs' (m), 'tp' (s), 'thq' (deg) ...),
+#          'grid_lat', 'grid_lon', 'grid_distance_km' (distance of the grid point from the location)
+
+
+import pandas as pd
+import glob
+
+import sys
+import os
+
+import argparse
+
+import traceback
+import logging
+
+from datetime import datetime as dt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_setup import set_up_log, get_script_name, open_influx_writer, store_points
+from batch_writer import write_in_batches, DEFAULT_BATCH_SIZE
+
+from forecast_points import extract_points, WAVE_VARIABLES
+
+
+def latest_forecast_file(forecast_dir):
+    ''' most recently downloaded WAVE file, None when there is none '''
+    files = glob.glob(os.path.join(forecast_dir, 'MyWave_wam800_c4WAVE*.nc'))
+    if not files:
+        return None
+    return max(files, key=os.path.getmtime)
+
+
+def read_locations(locations_path):
+    ''' testing locations, code and location_name without the padding of the csv file '''
+    locations_df = pd.read_csv(locations_path, sep=',', skipinitialspace=True)
+    for column in locations_df.select_dtypes(include=['object', 'string']).columns:
+        locations_df[column] = locations_df[column].str.strip()
+    return locations_df[['location_name', 'code', 'lat_deg', 'lon_deg']]
+
+
+def store_forecast_points(file_path, locations_df, write_run):
+    ''' extracts forecast at locations from file_path and writes it, returns number of points written '''
+    start_time = dt.now()
+    df, variables = extract_points(file_path, locations_df, CACHE_DIR, args.variables, args.max_distance_km)
+    df = df.dropna(how='all', subset=variables)
+    LOGGER.info(f"{os.path.basename(file_path)}: {len(variables)} variables, {df.shape[0]} rows extracted in {dt.now() - start_time}.")
+    for code, grid_point in df.groupby('code')[['grid_lat', 'grid_lon', 'grid_distance_km']].first().iterrows():
+        LOGGER.info(f"{code}: grid point {grid_point['grid_lat']:.5f} {grid_point['grid_lon']:.5f}, {grid_point['grid_distance_km']:.2f} km from the location.")
+    if not write_run or df.empty:
+        df.to_csv(os.path.join(os.getcwd(), os.path.basename(file_path).replace('.nc', '_points.csv')))
+        return 0
+    fields = variables + ['grid_lat', 'grid_lon', 'grid_distance_km']
+    result, datapoints_count, batch_size = write_in_batches(df, lambda batch: store_points(INFLUX_WRITE_CLIENT, batch, MEASUREMENT, TAGS, fields), args.batch_size)
+    return datapoints_count
+
+
+
+MEASUREMENT = 'wave_forecast'
+TAGS = ['location_name', 'code']
+
+LOG_DIR = 'logs'
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*',
+        help="forecast files, default the latest MyWave_wam800_c4WAVE*.nc of --forecast-dir")
+    parser.add_argument('-d', '--dry-run', action='store_true',
+        help="does not write to database, just show result in csv file")
+    parser.add_argument('--forecast-dir', default='forecast_files',
+        help="directory of the downloaded forecast files")
+    parser.add_argument('--locations', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'owhl', 'sensor_location_data.csv'),
+        help="csv file with location_name, code, lat_deg, lon_deg of the testing locations")
+    parser.add_argument('--cache-dir', default=None,
+        help="directory of the cached nearest grid points, default grid_index in --forecast-dir")
+    parser.add_argument('--variables', nargs='+', default=WAVE_VARIABLES,
+        help="variables extracted when present in the file")
+    parser.add_argument('--max-distance-km', type=float, default=10.0,
+        help="locations farther from the nearest wet grid point (outside of the model domain) are not extracted")
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help="number of datapoints written in one request, halved when influx answers 413 Request Entity Too Large")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, writers=None):
+    ''' runs the script in the current directory, argv without the script name (sys.argv[1:] by default) '''
+    ''' writers: InfluxWriters of ingest.py, by default the script creates and closes its own writer '''
+    global args, CACHE_DIR, INFLUX_WRITE_CLIENT
+    start_script_time = dt.now()
+    set_up_log(LOG_DIR, get_script_name(__file__) + '.log')
+
+    LOGGER.info("start script")
+    args = parse_arguments(argv)
+
+    forecast_dir = os.path.join(os.getcwd(), args.forecast_dir)
+    CACHE_DIR = args.cache_dir or os.path.join(forecast_dir, 'grid_index')
+
+    files = args.files
+    if not files:
+        latest_file = latest_forecast_file(forecast_dir)
+        if latest_file is None:
+            LOGGER.error(f"No forecast file in {forecast_dir}, run get_forecast_data.py first.")
+            sys.exit(1)
+        files = [latest_file]
+
+    INFLUX_WRITE_CLIENT = open_influx_writer(writers, 'sensor', get_script_name(__file__), precision='s')
+
+    locations_df = read_locations(args.locations)
+    datapoints_count = 0
+    for file_path in files:
+        try:
+            datapoints_count += store_forecast_points(file_path, locations_df, not args.dry_run)
+        except (OSError, KeyError):
+            LOGGER.error(f"Extraction from {file_path} failed.")
+            LOGGER.error(traceback.format_exc())
+
+    LOGGER.info(f"{datapoints_count} datapoints written from {len(files)} files.")
+    LOGGER.info(INFLUX_WRITE_CLIENT.report())
+    if writers is None:
+        INFLUX_WRITE_CLIENT.close()
+    LOGGER.info(f"end script script, duration: {dt.now() - start_script_time} [ms]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Single entry point of the ingest scripts, runs one or more pipelines in one process, e.g. from one cron job:
+#  python3 ingest.py owhl -w 2 + weather-cloud + locations + forecast + forecast-points
+#  Pipelines are separated by '+', each gets the arguments of its script and runs in the directory of the script
+#  (under --base-dir, by default this repository), as the cron jobs did, so logs, spools, checkpoints and
+#  data directories stay where they are:
+#  pipeline          script                                          directory
+#  owhl              owhl/csv_to_influx.py                           owhl
+#  weather-cloud     weather_cloud/store_weather_cloud_data.py       weather_cloud
+#  locations         owhl/store_sensor_location_data_to_influx.py    owhl
+#  forecast          forecast/get_forecast_data.py                   forecast
+#  forecast-points   forecast/store_forecast_points_to_influx.py     forecast
+#  waves             owhl/store_wave_parameters_to_influx.py         owhl
+#  replay            owhl/replay_to_influx.py                        owhl
+#  Compared to one cron job per script:
+#  - python, pandas, numpy and influxdb are loaded once for all pipelines of the run
+#  - the module of a pipeline is imported only when the pipeline runs, e.g. forecast does not load pandas or influxdb
+#  - pipelines writing to influx share one requests session, see InfluxWriters of common/script_setup.py
+#  A failing pipeline (sys.exit or an exception of its script, logged with its traceback) does not stop the
+#  following ones, the exit code is then 1.
+#  Startup of the scripts and of this runner is compared by common/benchmark_startup.py.
+
+import sys
+import os
+import time
+import argparse
+import importlib
+import traceback
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(REPO_DIR, 'common'))
+from script_setup import InfluxWriters
+
+# pipeline: (directory, module, description)
+PIPELINES = {
+    'owhl': ('owhl', 'csv_to_influx', "OWHL sensor csv files to influx"),
+    'weather-cloud': ('weather_cloud', 'store_weather_cloud_data', "Weather Cloud exports to influx"),
+    'locations': ('owhl', 'store_sensor_location_data_to_influx', "testing locations to influx"),
+    'forecast': ('forecast', 'get_forecast_data', "download of MyWave forecast files"),
+    'forecast-points': ('forecast', 'store_forecast_points_to_influx', "forecast at the testing locations to influx"),
+    'waves': ('owhl', 'store_wave_parameters_to_influx', "backfill of wave parameters of processed files"),
+    'replay': ('owhl', 'replay_to_influx', "replay of processed files to influx"),
+}
+SEPARATOR = '+'
+
+
+def split_pipelines(argv):
+    ''' splits argv at SEPARATOR, returns list of argument lists '''
+    groups = [[]]
+    for arg in argv:
+        if arg == SEPARATOR:
+            groups.append([])
+        else:
+            groups[-1].append(arg)
+    return [group for group in groups if group]
+
+
+def run_pipeline(name, argv, writers, base_dir):
+    ''' imports the module of the pipeline and runs its main in the pipeline directory, returns exit code '''
+    directory, module_name, description = PIPELINES[name]
+    script_dir = os.path.join(REPO_DIR, directory)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    start = time.perf_counter()
+    imported = start
+    run_dir = os.getcwd()
+    try:
+        module = importlib.import_module(module_name)
+        imported = time.perf_counter()
+        os.chdir(os.path.join(base_dir, directory))
+        module.main(argv, writers)
+        code = 0
+    except SystemExit as exit:
+        code = exit.code if isinstance(exit.code, int) else (0 if exit.code is None else 1)
+    except Exception:
+        # e.g. a malformed export, the following pipelines still run as their cron jobs did
+        print(f"{name}: failed\n{traceback.format_exc()}", file=sys.stderr, flush=True)
+        code = 1
+    finally:
+        # scripts change directory (e.g. to sensor_data), the next pipeline starts from the same place
+        os.chdir(run_dir)
+    print(f"{name}: exit code {code}, import {imported - start:.3f} s, run {time.perf_counter() - imported:.3f} s", flush=True)
+    return code
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        description="runs ingest pipelines in one process, pipelines are separated by '" + SEPARATOR + "'",
+        epilog='\n'.join(f"{name}: {description}" for name, (directory, module, description) in PIPELINES.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-dir', default=REPO_DIR,
+        help="directory with owhl, weather_cloud, forecast and database_settings the pipelines run in")
+    parser.add_argument('pipeline', choices=PIPELINES)
+    parser.add_argument('arguments', nargs=argparse.REMAINDER,
+        help="arguments of the script of the pipeline, see e.g. ingest.py owhl --help")
+    groups = split_pipelines(argv)
+    if not groups:
+        parser.print_usage()
+        return 2
+    runs = [parser.parse_args(group) for group in groups]
+    base_dir = os.path.abspath(runs[0].base_dir)
+    writers = InfluxWriters()
+    codes = []
+    try:
+        for run in runs:
+            codes.append(run_pipeline(run.pipeline, run.arguments, writers, base_dir))
+    finally:
+        writers.close()
+    return 1 if any(codes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Time range index of processed OWHL files (csv files and .owhl archives in sensor_processed),
+#  used by replay_to_influx.py to pick the files of a sensor overlapping a time window without reading them.
+#  sqlite table archive_files: file_name, size, mtime_ns, sensor_position, sensor_model,
+#                              first_time, last_time (ns since epoch), rows, indexed_at
+#  refresh indexes new and changed files (size or modification time differ) and removes files which are gone:
+#  - .owhl archives: meta data from the header, times from the memory mapped time deltas
+#  - csv files: meta data from the settings line, times of the first and the last row, rows counted by lines
+
+import numpy as np
+import pandas as pd
+
+import os
+import io
+import glob
+import sqlite3
+import threading
+import logging
+
+from datetime import datetime as dt
+
+from owhl_csv import read_settings_line
+from owhl_timestamps import build_timestamps
+from owhl_archive import open_archive, archive_times, ARCHIVE_EXTENSION
+
+TAIL_BYTES = 4096
+COUNT_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS archive_files (
+    file_name TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sensor_position TEXT,
+    sensor_model TEXT,
+    first_time INTEGER,
+    last_time INTEGER,
+    rows INTEGER,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS archive_files_time ON archive_files (sensor_position, sensor_model, first_time, last_time);
+'''
+
+LOGGER = logging.getLogger(__name__)
+
+
+def csv_time_range(file_path):
+    ''' (sensor meta data, first time, last time, rows) of OWHL csv file, None when it has no data '''
+    with open(file_path, 'rb') as file:
+        settings_line = file.readline().decode('utf-8').strip()
+        column_line = file.readline()
+        first_line = file.readline()
+        if not first_line.strip():
+            return None
+        file.seek(max(0, os.path.getsize(file_path) - TAIL_BYTES))
+        tail = file.read()
+        last_line = tail.rstrip(b'\n').split(b'\n')[-1]
+        file.seek(0)
+        rows = sum(chunk.count(b'\n') for chunk in iter(lambda: file.read(COUNT_CHUNK_SIZE), b''))
+    meta_data = read_settings_line(settings_line)
+    df = pd.read_csv(io.BytesIO(column_line + first_line + last_line + b'\n'))
+    times = build_timestamps(df).to_numpy().view(np.int64)
+    # settings line and column names are not rows, the last line may miss its new line
+    rows = rows - 2 + (not tail.endswith(b'\n'))
+    return meta_data, int(times[0]), int(times[-1]), rows
+
+
+def archive_time_range(file_path):
+    ''' (sensor meta data, first time, last time, rows) of .owhl archive, None when it has no data '''
+    header, columns = open_archive(file_path)
+    if header['rows'] == 0:
+        return None
+    times = archive_times(header, columns).view(np.int64)
+    return (header['sensor_position'], header['sensor_model'], header['utc_shift']), int(times.min()), int(times.max()), header['rows']
+
+
+class ArchiveIndex:
+    ''' sqlite index of time ranges of processed files '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+
+    def refresh(self, data_dir):
+        ''' indexes new and changed files of data_dir, removes files not found any more, returns number of files indexed '''
+        files = {os.path.basename(path): os.stat(path) for path in
+                 glob.glob(os.path.join(data_dir, '*.csv')) + glob.glob(os.path.join(data_dir, '*' + ARCHIVE_EXTENSION))}
+        with self.lock:
+            indexed = {row[0]: row[1:] for row in self.connection.execute('SELECT file_name, size, mtime_ns FROM archive_files')}
+        rows = []
+        for file_name, stat in sorted(files.items()):
+            if indexed.get(file_name) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            file_path = os.path.join(data_dir, file_name)
+            try:
+                time_range = archive_time_range(file_path) if file_name.endswith(ARCHIVE_EXTENSION) else csv_time_range(file_path)
+            except Exception:
+                LOGGER.error(f"{file_path} could not be indexed.", exc_info=True)
+                continue
+            if time_range is None or time_range[0][0] == 'not_set':
+                LOGGER.info(f"{file_path} has no data or default meta data, not indexed.")
+                continue
+            meta_data, first_time, last_time, count = time_range
+            rows.append((file_name, stat.st_size, stat.st_mtime_ns, meta_data[0], meta_data[1], first_time, last_time, count,
+                         dt.now().isoformat()))
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO archive_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.connection.executemany('DELETE FROM archive_files WHERE file_name = ?',
+                                        [(file_name,) for file_name in indexed if file_name not in files])
+        return len(rows)
+
+    def select(self, start=None, end=None, sensor_position=None, sensor_model=None):
+        ''' files with data in [start, end) (pandas timestamps, None is open) of the sensor, ordered by first time '''
+        ''' returns list of (file_name, sensor_position, sensor_model, first_time, last_time, rows) '''
+        conditions, values = [], []
+        if end is not None:
+            conditions.append('first_time < ?')
+            values.append(end.value)
+        if start is not None:
+            conditions.append('last_time >= ?')
+            values.append(start.value)
+        if sensor_position is not None:
+            conditions.append('sensor_position = ?')
+            values.append(sensor_position)
+        if sensor_model is not None:
+            conditions.append('sensor_model = ?')
+            values.append(sensor_model)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        with self.lock:
+            return self.connection.execute('SELECT file_name, sensor_position, sensor_model, first_time, last_time, rows '
+                                           'FROM archive_files' + where + ' ORDER BY first_time', values).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,196 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Barometric compensation of OWHL pressure: the logger measures water and atmospheric pressure together,
+#  the atmospheric pressure of the weather station (atm_pressure_hpa of measurement 'weather_cloud',
+#  written by weather_cloud/store_weather_cloud_data.py every 10 minutes) is subtracted to get the depth of the sensor
+#  depth_m = (pressure_mbar - atm_pressure_hpa) * 100 / (density * g), density from water_type_m of the location
+#  (sensor_locations.py).
+#  Times of sensor_test are the logger's local clock (utc_offset hours ahead of UTC, not shifted at ingest),
+#  the atmospheric pressure of a sample is taken at its time minus utc_offset (weather_cloud is stored in UTC).
+#  Readings are fetched from influx one WINDOW (a day) at a time, padded by MAX_GAP on both sides, and kept as a
+#  pre-interpolated series on a regular GRID_STEP grid: linear between readings not further than MAX_GAP apart,
+#  the nearest reading within NEAREST_TOLERANCE elsewhere (e.g. after the last reading), missing otherwise.
+#  The samples of a batch are grouped by window and joined to its cached grid (as-of merge) with linear interpolation
+#  between the two grid points around each sample, influx is queried only for windows containing samples and not
+#  cached yet (BarometricSeries), so a sample of a reset logger clock (e.g. in 2000) costs one window, not every day between.
+#  Windows the station has not reported past yet are fetched again after REFETCH_S, so depth appears for files
+#  ingested before the Weather Cloud export covering them once it is written; the cache keeps MAX_WINDOWS windows
+#  (least recently used are dropped).
+#  Sensors further than MAX_STATION_DISTANCE_KM from the station (Peniche, Baleal) are not compensated,
+#  depth is left out (NaN) where no reading is close enough.
+
+import numpy as np
+import pandas as pd
+
+import time
+import threading
+import collections
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+BAROMETER_MEASUREMENT = 'weather_cloud'
+BAROMETER_FIELD = 'atm_pressure_hpa'
+WINDOW = pd.Timedelta(days=1)
+GRID_STEP = pd.Timedelta(minutes=1)
+MAX_GAP = pd.Timedelta(minutes=30)
+NEAREST_TOLERANCE = pd.Timedelta(minutes=10)
+REFETCH_S = 600
+MAX_WINDOWS = 64
+MAX_STATION_DISTANCE_KM = 150
+GRAVITY = 9.80665
+# kg/m3 by water_type_m of sensor_location_data.csv
+WATER_DENSITY = {'fresh': 1000.0, 'fjord': 1020.0, 'sea': 1025.0, 'ocean': 1025.0}
+DEFAULT_WATER_DENSITY = 1025.0
+# depth is written in m with 0.1 mm resolution (pressure is logged with 0.01 mbar resolution)
+DEPTH_DECIMALS = 4
+HOUR_NS = 3600 * 10**9
+
+
+def hydrostatic_depth(pressure_mbar, atm_pressure_hpa, density=DEFAULT_WATER_DENSITY):
+    ''' depth in m of water column of pressure_mbar minus atm_pressure_hpa (1 mbar = 1 hPa = 100 Pa) '''
+    return (pressure_mbar - atm_pressure_hpa) * 100 / (density * GRAVITY)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    ''' great circle distance in km '''
+    lat1, lon1, lat2, lon2 = np.radians([lat1, lon1, lat2, lon2])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * np.arcsin(np.sqrt(a))
+
+
+def interpolate_grid(reading_times, readings, grid_times):
+    ''' values of readings (sorted int64 ns times) at grid_times, see the header for the rules '''
+    values = np.full(grid_times.shape, np.nan)
+    keep = ~np.isnan(readings)
+    reading_times, readings = reading_times[keep], readings[keep]
+    if reading_times.size == 0:
+        return values
+    right = np.searchsorted(reading_times, grid_times, side='left')
+    left = np.clip(right - 1, 0, reading_times.size - 1)
+    right = np.clip(right, 0, reading_times.size - 1)
+    exact = reading_times[right] == grid_times
+    left = np.where(exact, right, left)
+    span = reading_times[right] - reading_times[left]
+    between = (reading_times[left] <= grid_times) & (grid_times <= reading_times[right]) & (span <= MAX_GAP.value)
+    weight = np.where(span > 0, (grid_times - reading_times[left]) / np.where(span > 0, span, 1), 0.0)
+    values[between] = (readings[left] + weight * (readings[right] - readings[left]))[between]
+    # nearest reading where there is no reading on one side or the readings are too far apart
+    nearest = np.where(np.abs(grid_times - reading_times[left]) <= np.abs(reading_times[right] - grid_times), left, right)
+    close = ~between & (np.abs(reading_times[nearest] - grid_times) <= NEAREST_TOLERANCE.value)
+    values[close] = readings[nearest][close]
+    return values
+
+
+def influx_barometer(client, measurement=BAROMETER_MEASUREMENT, field=BAROMETER_FIELD):
+    ''' fetch function of BarometricSeries querying client (LineProtocolWriter of database weather_cloud) '''
+    def fetch(start, end):
+        answer = client.query(f'SELECT "{field}", "lat", "lon" FROM "{measurement}" '
+                              f'WHERE time >= {start.value} AND time < {end.value}', epoch='ns')
+        series = answer.get('results', [{}])[0].get('series', [])
+        if not series:
+            return pd.DataFrame(columns=[field, 'lat', 'lon'], index=pd.DatetimeIndex([], name='time'))
+        df = pd.DataFrame(series[0]['values'], columns=series[0]['columns'])
+        df['time'] = pd.to_datetime(df['time'], unit='ns')
+        return df.set_index('time').rename(columns={field: BAROMETER_FIELD}).astype(np.float64)
+    return fetch
+
+
+class BarometricSeries:
+    ''' atmospheric pressure at any time, cached pre-interpolated grids of WINDOW length, shared by writer threads '''
+    ''' fetch(start, end): data frame indexed by time (UTC) with atm_pressure_hpa, lat, lon of the station '''
+
+    def __init__(self, fetch, max_windows=MAX_WINDOWS):
+        self.fetch = fetch
+        self.max_windows = max_windows
+        # window start (ns) -> (grid values, complete, fetched at)
+        self.windows = collections.OrderedDict()
+        # last known position of the station (lat, lon)
+        self.station = None
+        self.fetches = 0
+        # codes of locations too far from the station, logged once
+        self.far = set()
+        self.lock = threading.Lock()
+
+    def fetch_window(self, start):
+        ''' grid values of the window starting at start and true when the station reported after its end '''
+        window_start = pd.Timestamp(start, unit='ns')
+        window_end = window_start + WINDOW
+        try:
+            readings = self.fetch(window_start - MAX_GAP, window_end + MAX_GAP).sort_index()
+        except Exception as error:
+            LOGGER.error(f"{BAROMETER_FIELD} of {window_start} - {window_end} not read: {error}")
+            readings = pd.DataFrame(columns=[BAROMETER_FIELD], index=pd.DatetimeIndex([]))
+        self.fetches += 1
+        if {'lat', 'lon'} <= set(readings.columns):
+            position = readings[['lat', 'lon']].dropna()
+            if not position.empty:
+                self.station = tuple(position.iloc[-1])
+        grid_times = start + np.arange(WINDOW // GRID_STEP + 1, dtype=np.int64) * GRID_STEP.value
+        reading_times = readings.index.to_numpy().astype('datetime64[ns]').view(np.int64)
+        values = interpolate_grid(reading_times, readings[BAROMETER_FIELD].to_numpy(dtype=np.float64), grid_times)
+        complete = reading_times.size > 0 and reading_times[-1] >= window_end.value
+        return values, complete
+
+    def window(self, start):
+        ''' cached grid values of the window starting at start (ns), fetched when missing or incomplete and old '''
+        with self.lock:
+            cached = self.windows.get(start)
+            if cached is not None and (cached[1] or time.monotonic() - cached[2] < REFETCH_S):
+                self.windows.move_to_end(start)
+                return cached[0]
+            values, complete = self.fetch_window(start)
+            self.windows[start] = (values, complete, time.monotonic())
+            self.windows.move_to_end(start)
+            while len(self.windows) > self.max_windows:
+                self.windows.popitem(last=False)
+            return values
+
+    def at(self, times_ns):
+        ''' atmospheric pressure in hPa at times_ns (int64 ns since epoch, UTC), NaN where unknown '''
+        result = np.full(times_ns.shape, np.nan)
+        if times_ns.size == 0:
+            return result
+        windows = times_ns // WINDOW.value
+        order = np.argsort(windows, kind='stable')
+        keys, bounds = np.unique(windows[order], return_index=True)
+        for key, first, last in zip(keys, bounds, np.append(bounds[1:], order.size)):
+            start = int(key) * WINDOW.value
+            # the grid of a window includes its end point, samples are interpolated within their own window
+            grid = self.window(start)
+            selected = order[first:last]
+            offset = times_ns[selected] - start
+            index = np.clip(offset // GRID_STEP.value, 0, grid.size - 2)
+            weight = (offset - index * GRID_STEP.value) / GRID_STEP.value
+            result[selected] = grid[index] + weight * (grid[index + 1] - grid[index])
+        return result
+
+    def covers(self, location):
+        ''' false when location (of sensor_locations.py) is known to be further than MAX_STATION_DISTANCE_KM from the station '''
+        if location is None or self.station is None or pd.isna(location['lat_deg']) or pd.isna(location['lon_deg']):
+            return True
+        distance = distance_km(location['lat_deg'], location['lon_deg'], *self.station)
+        if distance <= MAX_STATION_DISTANCE_KM:
+            return True
+        with self.lock:
+            if location['code'] not in self.far:
+                self.far.add(location['code'])
+                LOGGER.warning(f"{location['location_name']} is {distance:.0f} km from the weather station, depth not compensated.")
+        return False
+
+
+def compensated_depth(df, barometer, location=None):
+    ''' depth_m of each row of df (indexed by logger time, pressure_mbar, utc_offset), NaN where atmospheric pressure is unknown '''
+    ''' location: row of sensor_locations.py, its water_type_m gives the density of the water '''
+    times_ns = df.index.to_numpy().astype('datetime64[ns]').view(np.int64)
+    if 'utc_offset' in df.columns:
+        times_ns = times_ns - df['utc_offset'].to_numpy(dtype=np.int64) * HOUR_NS
+    # covers is true while the station position is unknown, it is known after the first fetch of at
+    if not barometer.covers(location):
+        return np.full(times_ns.shape, np.nan)
+    atm_pressure_hpa = barometer.at(times_ns)
+    if not barometer.covers(location):
+        return np.full(times_ns.shape, np.nan)
+    density = DEFAULT_WATER_DENSITY if location is None else WATER_DENSITY.get(str(location['water_type_m']).lower(), DEFAULT_WATER_DENSITY)
+    depth = hydrostatic_depth(df['pressure_mbar'].to_numpy(dtype=np.float64), atm_pressure_hpa, density)
+    return np.round(depth, DEPTH_DECIMALS)
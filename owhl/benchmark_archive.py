@@ -0,0 +1,88 @@
+#Anna Wojciechowska, Oslo, October 2026
+# benchmark of the .owhl archive (owhl_archive.py) against the processed csv files
+# for each file: size of csv and archive, time to parse the csv with read_sensor_file,
+# time to load the archive with read_archive and to map it with open_archive (mean of pressure from the memmap),
+# checks that read_archive gives the same data frame as read_sensor_file, exits with 1 if not
+# usage: python3 benchmark_archive.py [csv files], default are files in sensor_processed
+# when no file is found a synthetic 30 day file sampled at 4 Hz is used
+
+import pandas as pd
+import numpy as np
+
+import os
+import sys
+import glob
+import time
+import tempfile
+
+import argparse
+
+from owhl_csv import read_sensor_file
+from owhl_archive import write_archive, read_archive, open_archive, archive_path
+
+
+def synthetic_csv(file_path, days=30, frequency=4):
+    ''' OWHL like csv file with the settings line, frac.seconds are 0, 25, 50, 75 as written by the logger at 4 Hz '''
+    start = int(pd.Timestamp('2024-06-18 00:00:00').value // 1_000_000_000)
+    seconds = np.repeat(np.arange(start, start + days * 86400), frequency)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'POSIXt': seconds,
+        'DateTime': pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%d %H:%M:%S'),
+        'frac.seconds': np.tile(np.arange(frequency) * (100 // frequency), days * 86400),
+        'Pressure.mbar': (1500 + 300 * np.sin(2 * np.pi * seconds / 44700) + rng.normal(0, 20, seconds.size)).round(2),
+        'TempC': (15 + np.sin(2 * np.pi * seconds / 86400)).round(1)})
+    with open(file_path, 'w') as file:
+        file.write('SYNTHETIC_POSITION sensor_synthetic UTC+2,startMinute,0,minutes per hour,60\n')
+        df.to_csv(file, index=False)
+
+
+def best_time(function, file_path, repeat):
+    ''' returns result and best run time in seconds '''
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function(file_path)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def mapped_pressure_mean(file_path):
+    header, columns = open_archive(file_path)
+    return columns['pressure_mbar'].mean()
+
+
+def benchmark(csv_path, archive_dir, repeat):
+    (df, meta_data), csv_time = best_time(read_sensor_file, csv_path, repeat)
+    path = os.path.join(archive_dir, os.path.basename(archive_path(csv_path)))
+    write_archive(path, df, meta_data)
+    (archived, archived_meta_data), archive_time = best_time(read_archive, path, repeat)
+    mean, map_time = best_time(mapped_pressure_mean, path, repeat)
+    identical = archived.equals(df) and tuple(archived_meta_data) == tuple(meta_data)
+    csv_size, archive_size = os.path.getsize(csv_path), os.path.getsize(path)
+    print(f"{csv_path}: {df.shape[0]} rows, csv {csv_size / 1e6:.1f} MB, archive {archive_size / 1e6:.1f} MB "
+          f"({csv_size / archive_size:.1f}x smaller), read_sensor_file {csv_time * 1000:.0f} ms, "
+          f"read_archive {archive_time * 1000:.1f} ms ({csv_time / archive_time:.0f}x faster), "
+          f"memmap mean {map_time * 1000:.1f} ms, identical: {identical}")
+    return identical
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('files', nargs='*', help="processed OWHL csv files")
+parser.add_argument('-r', '--repeat', type=int, default=3, help="number of runs, best time is reported")
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as archive_dir:
+    files = args.files or sorted(glob.glob('sensor_processed/*.csv'))
+    if not files:
+        files = [os.path.join(archive_dir, 'synthetic.csv')]
+        synthetic_csv(files[0])
+    all_identical = True
+    for file_path in files:
+        all_identical = benchmark(file_path, archive_dir, args.repeat) and all_identical
+
+if not all_identical:
+    print("archives differ from csv files")
+    sys.exit(1)
@@ -0,0 +1,77 @@
+#Anna Wojciechowska, Oslo, October 2026
+# benchmark of timestamp building for OWHL csv files
+# compares the old string concatenation with build_timestamps from owhl_timestamps.py,
+# checks both give identical times and prints the timings
+# usage: python3 benchmark_timestamps.py [csv files], default are files in sensor_data and sensor_processed
+# when no file is found a synthetic 24 hour file sampled at 4 Hz is used
+
+import pandas as pd
+import numpy as np
+
+import sys
+import glob
+import time
+
+import argparse
+
+from owhl_timestamps import build_timestamps
+
+
+def legacy_timestamps(df):
+    ''' timestamps as built by csv_to_influx.py before build_timestamps '''
+    frac_string = df['frac.seconds'].apply(lambda x: str(x))
+    dt_string = df['DateTime'].apply(lambda x: str(x))
+    return pd.to_datetime(dt_string + '.' + frac_string)
+
+
+def synthetic_frame(hours=24, frequency=4):
+    ''' OWHL like data frame, frac.seconds are 0, 25, 50, 75 as written by the logger at 4 Hz '''
+    start = int(pd.Timestamp('2024-06-18 00:00:00').value // 1_000_000_000)
+    seconds = np.repeat(np.arange(start, start + hours * 3600), frequency)
+    frac = np.tile(np.arange(frequency) * (100 // frequency), hours * 3600)
+    return pd.DataFrame({
+        'POSIXt': seconds,
+        'DateTime': pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%d %H:%M:%S'),
+        'frac.seconds': frac,
+        'Pressure.mbar': np.random.default_rng(0).normal(1013, 5, seconds.size).round(2),
+        'TempC': 15.0})
+
+
+def best_time(function, df, repeat):
+    ''' returns result and best run time in seconds '''
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function(df)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def benchmark(name, df, repeat):
+    legacy, legacy_time = best_time(legacy_timestamps, df, repeat)
+    fast, fast_time = best_time(build_timestamps, df, repeat)
+    identical = np.array_equal(legacy.to_numpy().astype('datetime64[ns]'), fast.to_numpy())
+    print(f"{name}: {df.shape[0]} rows, legacy {legacy_time * 1000:.1f} ms, "
+          f"build_timestamps {fast_time * 1000:.1f} ms, speedup {legacy_time / fast_time:.1f}x, identical: {identical}")
+    return identical
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('files', nargs='*', help="OWHL csv files")
+parser.add_argument('-r', '--repeat', type=int, default=3, help="number of runs, best time is reported")
+args = parser.parse_args()
+
+files = args.files or sorted(glob.glob('sensor_data/*.csv') + glob.glob('sensor_processed/*.csv'))
+all_identical = True
+if not files:
+    all_identical = benchmark('synthetic 24h 4Hz', synthetic_frame(), args.repeat)
+for file_path in files:
+    df = pd.read_csv(file_path, skiprows=1)
+    if df.shape[0] > 0:
+        all_identical = benchmark(file_path, df, args.repeat) and all_identical
+
+if not all_identical:
+    print("timestamps differ")
+    sys.exit(1)
@@ -2,12 +2,31 @@
 
 #  Script to process data from sensor generated csv files
 #  The scripts reads all csv files in "sensor_data" directory and after successful read moved the file to "processed_data".
+#  With --archive written files are stored in "processed_data" as compact columnar .owhl files instead, see owhl_archive.py
+#  With --chunk-size files are read, transformed and written --chunk-size rows at a time (streaming mode),
+#  so memory does not grow with the length of the file, see stream_csv_and_store; a resumed file skips the derived work
+#  (depth, quality control, waves, rollups) of the chunks before the one with the last written batch, those were done
+#  by the interrupted run (with the same --chunk-size), only the context and last hour the next chunks need are kept
 #  
 #  This script is wrting to 
 #  database: 'pressure_sensor'
 #  measurement: 'pressure' 
 #  tags: 'place'
 #  fields: 'pressure_mbar' (unit mBars), 'temp_c' (unit degrees Celcius )
+#  points carry the tags location_name, code, water_type_m and field sensor_depth_m of the testing location
+#  of their sensor_position in sensor_location_data.csv (tags left out when not found), see sensor_locations.py
+#  and field depth_m, depth of the sensor compensated with atm_pressure_hpa of the weather station (database
+#  'weather_cloud'), left out when unknown, see barometric_compensation.py
+#  measurement: 'sensor_test_waves' wave parameters of hourly bursts (h, Hm0, Tp, m0, H_significant, H_mean, H_10,
+#  H_max, T_mean, T_s as named in wavesp.m), same tags, see data_processing/neumeier/wavesp.py
+#  measurements: 'sensor_test_1m' in retention policy 'rollup_1m', 'sensor_test_1h' in 'rollup_1h'
+#  per minute and per hour mean, min, max, stddev and count of pressure_mbar and temp_c, same tags, see common/rollups.py
+#  measurement: 'sensor_test_qc' samples flagged by quality control (spikes, out of range values, gaps, irregular
+#  sampling, logger clock resets), fields qc_flags (bit mask), interval_s, pressure_mbar, temp_c, same tags and
+#  duplicate (number of a row after the previous row with the same time), see owhl_qc.py
+#  measurement: 'ingest_stats' duration, rows, bytes sent, retries and memory of the stages of each file
+#  (read, parse, transform, encode, write, move) and of each batch, see common/ingest_stats.py,
+#  with --prometheus-dir also as csv_to_influx.prom for the node_exporter textfile collector
   
 # TAGS
 # +---------+--------+--------------+--------------+
@@ -25,16 +44,11 @@
 # +-------------+--------------+---------+
 
 
-from influxdb import DataFrameClient
-
-from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
-from requests.exceptions import Timeout, ConnectionError
 
 from datetime import datetime
 
 import pandas as pd
 import numpy as np
-import json
 
 import sys
 import os
@@ -42,220 +56,537 @@ import glob
 
 import argparse
 
+import queue
+import signal
+import threading
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
 import traceback
 import logging
 
 from datetime import datetime as dt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_setup import set_up_log, get_script_name, open_influx_writer, store_points
+
+from owhl_csv import read_sensor_file, get_metadata, sensor_file_metadata, read_sensor_file_chunks, float64_fields, remove_empty_data_file
+from owhl_archive import write_archive, ARCHIVE_EXTENSION
+from owhl_qc import StreamQC, QC_FIELD_NAMES, DUPLICATE_TAG
+from sensor_locations import load_locations, LOCATIONS_FILE, LOCATION_TAGS, LOCATION_FIELDS
+from barometric_compensation import BarometricSeries, influx_barometer, compensated_depth, BAROMETER_FIELD
+from batch_writer import write_in_batches, DEFAULT_BATCH_SIZE
+from ingest_checkpoint import IngestCheckpoint, file_content_hash
+from file_watcher import DirectoryWatcher
+from rollups import ROLLUPS, RollupState, file_rollup, rollup_field_names, create_retention_policies
+from ingest_stats import IngestStats, BatchStats
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_processing', 'neumeier'))
+from wavesp import wave_parameters, wavesp_names
 
 
-def set_up_log(log_dir, log_filename):
-    # to do create log when does not exist even if folder exists
-    ''' creates a log in script running directory '''
-    script_run_dir = os.getcwd()
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
-    #check if log dir exist, create both log dir and log file if necessary
-    if not os.path.isdir(os.path.join(script_run_dir, log_dir)):
-        os.mkdir(os.path.join(script_run_dir, log_dir))
-    file_handler = logging.FileHandler(os.path.join(script_run_dir, log_dir, log_filename), mode='a')
-    file_handler.setFormatter(logging.Formatter(fmt='%(asctime)s [%(pathname)s:%(lineno)d] [%(levelname)s] %(message)s', datefmt='%a, %d %b %Y %H:%M:%S'))
-    logger = logging.getLogger()
-    logger.addHandler(file_handler)
-    logger.setLevel(logging.INFO)
-    return logger
-
-def get_script_name():
-    ''' gets a script name, log are named after the script '''
-    script_path = sys.argv[0]
-    path_elems = script_path.split('/')
-    script_name = path_elems[len(path_elems) - 1]
-    res = script_name.split('.py')
-    return res[0]
-
-
-def read_settings_line(settings_line):
-    if settings_line == 'Default mission information for csv file header':
-        return "not_set", "not_named", "UTC+0"
-    res = settings_line.split(' ')
-    position = res[0]
-    model = res[1]
-    utc_shift = res[2].split(',')[0]
-    print("position ", position)
-    print("model ", model)
-    return position, model, utc_shift
-
-def get_metadata(file_path):
+
+def store_wave_parameters(df):
+    ''' writes wave parameters of hourly bursts of df (indexed by time) as WAVES_MEASUREMENT, tagged as the pressure points '''
+    ''' bursts not complete in the file (less than 90% of the values) are left out, see wave_parameters in wavesp.py '''
     try:
-        with open(file_path, 'r') as file:
-            first_line = file.readline().strip()
-            LOGGER.info(f"Processing {file_path}.")
-            return read_settings_line(first_line)
-    except FileNotFoundError:
-        LOGGER.errof(f" {file_path} was not found.")
-    except IOError:
-        LOGGER.errof(f"An io error occurred trying to read the file {file_path}.")
-
-def get_utc_time_offset(utc_string):
-    print(utc_string)
-    #reading utf time offset information
-    # tested against utc_string = ["UTC+0", "UTC-1", "UTC+2" , "utc-0"]
-    offset_list = utc_string.lower().split('utc')
-    offset_sign  = offset_list[1][0]
-    offset_val = offset_list[1][1:]
-    offset_int_val = int(offset_val)
-    if offset_sign == '-':
-        offset_int_val *= -1
-    return  offset_int_val
-
-def store_points(df):
+        waves = wave_parameters(df['pressure_mbar'], args.sensor_height)
+        if waves.empty:
+            return
+        for tag in TAGS:
+            waves[tag] = df[tag].iloc[0]
+        INFLUX_WRITE_CLIENT.write_points(waves, WAVES_MEASUREMENT, tag_columns = TAGS, field_columns = wavesp_names())
+        LOGGER.info(f"Wave parameters of {waves.shape[0]} hourly bursts written to {WAVES_MEASUREMENT}.")
+    except Exception:
+        # pressure points are written, missing wave parameters can be written later with store_wave_parameters_to_influx.py
+        LOGGER.error("Wave parameters not written.")
+        LOGGER.error(traceback.format_exc())
+
+def store_rollups(df, file_hash):
+    ''' writes per minute and per hour rollups of df (indexed by time) to their retention policies, see rollups.py '''
+    ''' buckets cut by the start or the end of the file are combined with the parts of them in other files '''
     try:
-        result = INFLUX_WRITE_CLIENT.write_points(df,'sensor_test',tag_columns = ['sensor_model', 'sensor_position'], field_columns = ['pressure_mbar', 'temp_c', 'utc_offset'],protocol='line')
-        if result:
-            LOGGER.info(f" {df.shape[0]} data points written.")
-            return (result,df.shape[0])
-        else: 
-            LOGGER.error(f"No data written.")
-            return (result,0)
-    except ConnectionError:
-            # thrown if influxdb is down or (spelling) errors in connection configuration
-            LOGGER.error("ConnectionError, check connection setting and if influxdb is up: 'systemctl status influxdb'.")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-    except Timeout:
-            LOGGER.error("Timeout, check influx timeout setting and network connection.")
-            LOGGER.error(traceback.format_exc())
-    except InfluxDBClientError:
-            LOGGER.error("InfluxDBClientError, check if database exist in influx: 'SHOW DATABASES'.")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-    except InfluxDBServerError:
-            LOGGER.error("InfluxDBServerError")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
+        # edge buckets of files written by several writer threads are combined and written one file at a time
+        with ROLLUP_LOCK:
+            for freq, retention_policy, suffix in ROLLUPS:
+                rollup = file_rollup(df, freq, retention_policy, TAGS, ROLLUP_FIELDS, ROLLUP_STATE, file_hash)
+                write_rollup = lambda batch: (INFLUX_WRITE_CLIENT.write_points(batch, f"{MEASUREMENT}_{suffix}",
+                    tag_columns = TAGS, field_columns = rollup_field_names(ROLLUP_FIELDS), retention_policy = retention_policy), batch.shape[0])
+                result, rollup_count, batch_size = write_in_batches(rollup, write_rollup, args.batch_size)
+                LOGGER.info(f"{rollup_count} {freq} rollups written to {retention_policy}.{MEASUREMENT}_{suffix}.")
+    except Exception:
+        LOGGER.error("Rollups not written.")
+        LOGGER.error(traceback.format_exc())
+
+def store_qc(qc, df, filename, final=True):
+    ''' flags rows of df (indexed by time, file order, float64 fields) with qc (StreamQC of the file), '''
+    ''' writes flagged rows to QC_MEASUREMENT, df None: last rows of a streamed file '''
+    try:
+        with STATS.stage('qc', file=filename) as record:
+            flagged = qc.flagged(df, final)
+            record['rows'] = 0 if df is None else df.shape[0]
+        if flagged is not None and flagged.shape[0] > 0:
+            write_flagged = lambda batch: (INFLUX_WRITE_CLIENT.write_points(batch, QC_MEASUREMENT,
+                tag_columns = TAGS + [DUPLICATE_TAG], field_columns = QC_FIELD_NAMES), batch.shape[0])
+            write_in_batches(flagged, write_flagged, args.batch_size)
+        if final and qc.counts:
+            LOGGER.warning(f"{filename} quality control: " + ', '.join(f"{count} {name}" for name, count in qc.counts.items()))
+    except Exception:
+        # points are written, quality control of the file is left out
+        LOGGER.error("Quality control flags not written.")
+        LOGGER.error(traceback.format_exc())
 
 # influx cannot handle large data frame to be written in one go - it would generte excepton
 # influxdb.exceptions.InfluxDBClientError: 413: {"error":"Request Entity Too Large"}
-# hence data needs to be sliced to hourly chunks: 24 hour dataframe from single file will be sliced to 24 hourly chunks
-def slice_data_and_store(df):
-    # the stored time is from start_timestap to df.time.max()
-    start_timestamp = df.time.min()
-    time_range = df.time.max() -  start_timestamp
-    start_timestamp_pd_type = pd.Timestamp(year=start_timestamp.year, month=start_timestamp.month, day=start_timestamp.day, hour=start_timestamp.hour, minute=0)
-    hours = round(time_range.seconds/3600)
-
-    file_datapoints_count = 0
-    for i in range (0,hours+1):
-        
-        lower_limit = start_timestamp_pd_type +  pd.Timedelta(i, "h")
-        upper_limit = start_timestamp_pd_type +  pd.Timedelta(i+1, "h")
-        # select slice of data for given hour
-        df_hour = df[(df.time >= lower_limit) & (df.time < upper_limit)]
-        df_hour.set_index('time', inplace=True)
-        res = store_points(df_hour)
-        LOGGER.info(f"Processed chunk of {res[1]} datapoints.")
-        file_datapoints_count += res[1]
-    LOGGER.info(f"Processed total of {file_datapoints_count} datapoints from a file.")
-    return res
-
-
-
-def process_csv_and_store(file_path, write_run): 
+# hence data is sorted once and written in batches of --batch-size datapoints, see batch_writer.py
+# written batches are recorded in CHECKPOINT, if the run is interrupted the next one starts after the last written batch
+def slice_data_and_store(df, file_hash, filename):
+    df = add_depth(add_location(df.set_index('time')), filename)
+    committed_rows = CHECKPOINT.committed_rows(file_hash)
+    if committed_rows > 0:
+        LOGGER.info(f"{filename}: {committed_rows} datapoints written in previous run, resuming after them.")
+    # encode and write time, bytes sent and retries of each batch, see ingest_stats.py
+    write_batch = BatchStats(STATS, lambda batch: store_points(INFLUX_WRITE_CLIENT, batch, MEASUREMENT, TAGS, FIELDS),
+        INFLUX_WRITE_CLIENT, file=filename, sensor_position=df['sensor_position'].iloc[0])
+    result, file_datapoints_count, batch_size = write_in_batches(df, write_batch, args.batch_size,
+        committed_rows, CHECKPOINT.batch_recorder(file_hash))
+    write_batch.finish()
+    if result:
+        if args.qc:
+            store_qc(StreamQC(TAGS), df, filename)
+        if args.waves:
+            store_wave_parameters(df)
+        if args.rollups:
+            store_rollups(df, file_hash)
+        CHECKPOINT.complete_file(file_hash, filename, committed_rows + file_datapoints_count)
+    LOGGER.info(f"Processed total of {file_datapoints_count} datapoints from a file in batches of {batch_size} datapoints.")
+    return (result, file_datapoints_count)
+
+
+
+def add_location(df):
+    ''' df with the location tags and fields of its sensor_position, registry read again only when the csv changes '''
+    return load_locations(LOCATIONS_PATH).enrich(df)
+
+
+def add_depth(df, filename):
+    ''' df (indexed by time, with location) with depth_m compensated for atmospheric pressure, NaN without --compensation '''
+    if BAROMETER is None:
+        return df.assign(depth_m=np.nan)
+    location = load_locations(LOCATIONS_PATH).lookup(df['sensor_position'].iloc[0])
+    with STATS.stage('compensate', file=filename, sensor_position=df['sensor_position'].iloc[0]) as record:
+        depth = compensated_depth(df, BAROMETER, location)
+        record['rows'] = int(np.count_nonzero(~np.isnan(depth)))
+    return df.assign(depth_m=depth)
+
+
+def store_segment(segment, file_hash):
+    ''' writes wave parameters and rollups of segment (float64 fields) of a streamed file '''
+    if segment.shape[0] == 0:
+        return
+    if args.waves:
+        store_wave_parameters(segment)
+    if args.rollups:
+        store_rollups(segment, file_hash)
+
+
+def stream_csv_and_store(file_path, write_run, file_hash=None):
+    ''' --chunk-size: reads, transforms and writes the file at file_path one chunk at a time '''
+    ''' returns as process_csv_and_store, data frame is None (the file is moved as csv, not archived) '''
+    sensor_meta_data = sensor_file_metadata(file_path)
+    if sensor_meta_data is None:
+        return (False, 0, None, None)
+    filename = os.path.basename(file_path)
+    committed_rows = CHECKPOINT.committed_rows(file_hash) if write_run else 0
+    if committed_rows > 0:
+        LOGGER.info(f"{filename}: {committed_rows} datapoints written in previous run, resuming after them.")
+    write_batch = BatchStats(STATS, lambda batch: store_points(INFLUX_WRITE_CLIENT, batch, MEASUREMENT, TAGS, FIELDS),
+        INFLUX_WRITE_CLIENT, file=filename, sensor_position=sensor_meta_data[0])
+    # rows are counted in file order, each chunk is sorted by write_in_batches, OWHL files are written in time order
+    # waves (hourly bursts) and rollups are computed from segments ending at a full hour, the rows of the last
+    # hour of a chunk are carried over to the next chunk, so buckets and bursts are not cut by the chunks
+    result, datapoints_count, file_rows, batch_size = True, 0, 0, args.batch_size
+    carry = None
+    qc = StreamQC(TAGS)
+    for chunk, decimals in read_sensor_file_chunks(file_path, sensor_meta_data, args.chunk_size, STATS):
+        offset = file_rows
+        file_rows += chunk.shape[0]
+        if not write_run:
+            continue
+        chunk = add_location(chunk)
+        if file_rows < committed_rows:
+            # written and processed by the interrupted run, kept only as context of the next chunk
+            values = float64_fields(chunk, decimals).assign(depth_m=np.nan)
+            if args.qc:
+                qc.skip(values)
+            if args.waves or args.rollups:
+                segment = values if carry is None else pd.concat([carry, values])
+                carry = segment[segment.index >= segment.index.max().floor('1h')]
+            del chunk, values
+            continue
+        # depth is computed from the values of the file (float64), as for a whole file
+        values = add_depth(float64_fields(chunk, decimals), filename)
+        chunk = chunk.assign(depth_m=values['depth_m'].to_numpy())
+        if file_rows > committed_rows:
+            on_batch_written = lambda start, end, batch: CHECKPOINT.commit_batch(file_hash, offset + start, offset + end, batch.index[0], batch.index[-1])
+            result, chunk_count, batch_size = write_in_batches(chunk, write_batch, batch_size,
+                max(0, committed_rows - offset), on_batch_written)
+            datapoints_count += chunk_count
+            if not result:
+                break
+        if args.qc:
+            store_qc(qc, values, filename, final=False)
+        if args.waves or args.rollups:
+            segment = values if carry is None else pd.concat([carry, values])
+            last_hour = segment.index.max().floor('1h')
+            carry = segment[segment.index >= last_hour]
+            store_segment(segment[segment.index < last_hour], file_hash)
+        del chunk, values
+    if write_run:
+        write_batch.finish()
+    if file_rows == 0:
+        remove_empty_data_file(file_path)
+        return (False, 0, None, None)
+    if result and write_run:
+        if args.qc:
+            store_qc(qc, None, filename)
+        if carry is not None:
+            store_segment(carry, file_hash)
+        CHECKPOINT.complete_file(file_hash, filename, file_rows)
+    LOGGER.info(f"Processed total of {datapoints_count} datapoints from a file in chunks of {args.chunk_size} rows, batches of {batch_size} datapoints.")
+    return (result and write_run, (result and write_run, datapoints_count), sensor_meta_data, None)
+
+
+def process_csv_and_store(file_path, write_run, file_hash=None): 
     ''' reads from csv at file_path and stores to influx '''
-    ''' returns true if writen, together with datapoints count'''
-    if os.stat(file_path).st_size > 0:
-        sensor_meta_data = get_metadata(file_path)
-        if sensor_meta_data == None:
-            # return False, since not written, and 0 datapoints
-            return (False ,0, None)
-        if sensor_meta_data[0] == 'Default':
-            LOGGER.info(f"{file_path} contains default meta data. File skippped.")
-            return(False,0, None)
-        df = pd.read_csv(file_path, skiprows=1) 
-        if df.shape[0] > 0:
-            df['sensor_position'] = sensor_meta_data[0]
-            df['sensor_model'] = sensor_meta_data[1]
-            utc_time_offset = get_utc_time_offset(sensor_meta_data[2])
-            utc_offset_time_delta = pd.Timedelta(days=0, hours=utc_time_offset)
-            df['frac_string'] = df['frac.seconds'].apply(lambda x: str(x))
-            df['dt_string'] = df['DateTime'].apply(lambda x: str(x))
-            df['time'] = pd.to_datetime( df['dt_string'] + '.' + df['frac_string'])
-            df['utc_offset'] = utc_time_offset
-            #inflxdb default time zone is UTC, thus all data will be stored in UTC+0
-            #df['time'] = df['time'] - utc_offset_time_delta
-            df = df.drop(columns=['dt_string', 'frac_string', 'POSIXt', 'DateTime', 'frac.seconds' ])
-            df = df.rename(columns={"Pressure.mbar": "pressure_mbar", "TempC": "temp_c"})
-            if write_run:
-                write_result = slice_data_and_store(df)
-                return(True, write_result, sensor_meta_data)
-        else: 
-            os.remove(file_path)
-            LOGGER.info(f"{file_path} contains empty data frame. File removed")
-            # no datapoints
-            return (False,0, None)
-    else: 
-        os.remove(file_path)
-        LOGGER.info(f"{file_path} is empty. File removed")
-        return (False,0, None)
-
-
-           
-def process_data(write_run):
+    ''' returns true if writen, together with datapoints count, sensor meta data and data frame'''
+    if args.chunk_size:
+        return stream_csv_and_store(file_path, write_run, file_hash)
+    df, sensor_meta_data = read_sensor_file(file_path, STATS)
+    if df is None:
+        # return False, since not written, and 0 datapoints
+        return (False, 0, None, None)
+    if write_run:
+        write_result = slice_data_and_store(df, file_hash, os.path.basename(file_path))
+        return(write_result[0], write_result, sensor_meta_data, df)
+    return (False, (False, 0), sensor_meta_data, df)
+
+
+def move_processed_file(script_dir, filename, meta_data, start_processing, store_result, df=None):
+    ''' moves written file from DATA_DIR to PROCESSED_DIR, sensor position and model are added to the name '''
+    ''' with --archive the parsed data frame df is stored as .owhl archive and the csv file is removed '''
+    full_file_path = os.path.join(script_dir, DATA_DIR, filename)
+    filename_with_model  = filename.split(".csv")[0]
+    filename_with_model = filename_with_model +'_' +  meta_data[0] + '_' + meta_data[1] + '.csv'
+    dest_file_path = os.path.join(script_dir, PROCESSED_DIR, filename_with_model)
+    with STATS.stage('move', file=filename, sensor_position=meta_data[0]) as record:
+        if args.archive and df is not None:
+            filename_with_model = filename_with_model.split(".csv")[0] + ARCHIVE_EXTENSION
+            write_archive(os.path.join(script_dir, PROCESSED_DIR, filename_with_model), df, meta_data)
+            os.remove(full_file_path)
+        else:
+            os.rename(full_file_path, dest_file_path)
+        record['rows'] = store_result[1]
+    end_processing = dt.now()
+    LOGGER.info(f"{filename} processed and renamed {filename_with_model}")
+    LOGGER.info(f"processed {store_result[1]} datapoints in: { end_processing - start_processing} [ms]")
+
+
+def process_file(script_dir, filename, write_run):
+    ''' processes single file from DATA_DIR, moves it to PROCESSED_DIR when written '''
+    start_processing = dt.now()
+    #LOGGER.info(f"Trying to process: {filename}")
+    full_file_path = os.path.join(script_dir, DATA_DIR, filename)
+    file_hash = None
+    if write_run:
+        with STATS.stage('read', file=filename):
+            file_hash = file_content_hash(full_file_path)
+        if skip_ingested_file(script_dir, filename, file_hash):
+            return
+    write_result, store_result, meta_data, df = process_csv_and_store(full_file_path, write_run, file_hash)
+    if (write_run and write_result):
+        move_processed_file(script_dir, filename, meta_data, start_processing, store_result, df)
+
+
+def skip_ingested_file(script_dir, filename, file_hash):
+    ''' file with the same content was already written, it is moved to PROCESSED_DIR without parsing '''
+    if not CHECKPOINT.is_completed(file_hash):
+        return False
+    LOGGER.info(f"{filename} was already written to influx, skipped.")
+    meta_data = get_metadata(os.path.join(script_dir, DATA_DIR, filename))
+    if meta_data is not None:
+        move_processed_file(script_dir, filename, meta_data, dt.now(), (True, 0))
+    return True
+
+
+def write_worker(script_dir, write_queue, write_failed):
+    ''' writer thread: takes parsed files from write_queue, writes them and moves them to PROCESSED_DIR '''
+    while True:
+        item = write_queue.get()
+        if item is None:
+            return
+        filename, file_hash, df, meta_data, start_processing = item
+        if write_failed.is_set():
+            # influx is not available, file stays in DATA_DIR for next run
+            continue
+        try:
+            write_result = slice_data_and_store(df, file_hash, filename)
+        except SystemExit:
+            # store_points exits on connection errors, stop the pipeline
+            write_failed.set()
+            continue
+        except Exception:
+            LOGGER.error(f"Writing of {filename} failed, file stays in {DATA_DIR}.")
+            LOGGER.error(traceback.format_exc())
+            continue
+        if write_result[0]:
+            move_processed_file(script_dir, filename, meta_data, start_processing, write_result, df)
+
+
+def read_sensor_file_with_stats(file_path, trace_memory):
+    ''' read_sensor_file in worker process, returns (data frame, sensor meta data, records of parse and transform) '''
+    stats = IngestStats(STATS.script, trace_memory)
+    df, meta_data = read_sensor_file(file_path, stats)
+    return (df, meta_data, stats.take_records())
+
+
+def queue_parsed_file(write_queue, parsed_file):
+    ''' waits for a file parsed in worker process and passes it to writer threads '''
+    filename, file_hash, start_processing, future = parsed_file
+    try:
+        df, meta_data, records = future.result()
+        STATS.extend(records)
+    except Exception:
+        LOGGER.error(f"Parsing of {filename} failed, file stays in {DATA_DIR}.")
+        LOGGER.error(traceback.format_exc())
+        return
+    if df is not None:
+        write_queue.put((filename, file_hash, df, meta_data, start_processing))
+
+
+def submit_files(executor, script_dir, files_iter, count):
+    ''' submits next count files not yet written to influx for parsing '''
+    submitted = []
+    for filename in files_iter:
+        start_processing = dt.now()
+        full_file_path = os.path.join(script_dir, DATA_DIR, filename)
+        with STATS.stage('read', file=filename):
+            file_hash = file_content_hash(full_file_path)
+        if skip_ingested_file(script_dir, filename, file_hash):
+            continue
+        submitted.append((filename, file_hash, start_processing,
+            executor.submit(read_sensor_file_with_stats, full_file_path, args.trace_memory)))
+        if len(submitted) == count:
+            break
+    return submitted
+
+
+def process_data_pipelined(script_dir, files, workers, writers):
+    ''' files are parsed by a pool of worker processes, parsed data frames are passed through '''
+    ''' a bounded queue to writer threads, so writing to influx overlaps with parsing '''
+    ''' at most workers files are parsed and workers files wait in the queue, which keeps memory bounded '''
+    write_queue = queue.Queue(maxsize=workers)
+    write_failed = threading.Event()
+    files_iter = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque(submit_files(executor, script_dir, files_iter, workers))
+        # worker processes are forked on first submit, writer threads are started after that
+        writer_threads = [threading.Thread(target=write_worker, args=(script_dir, write_queue, write_failed)) for i in range(writers)]
+        for writer_thread in writer_threads:
+            writer_thread.start()
+        while pending and not write_failed.is_set():
+            queue_parsed_file(write_queue, pending.popleft())
+            pending.extend(submit_files(executor, script_dir, files_iter, 1))
+        for filename, file_hash, start_processing, future in pending:
+            future.cancel()
+    for writer_thread in writer_threads:
+        write_queue.put(None)
+    for writer_thread in writer_threads:
+        writer_thread.join()
+    if write_failed.is_set():
+        LOGGER.error("Writing to influx failed, remaining files are left for next run.")
+        sys.exit(1)
+
+
+def process_data(write_run, workers=1, writers=1, settled=None):
     ''' reads all csv from DATA_DIR, after successful writing they are moved to PROCESSED_DIR '''
+    ''' settled: files not processed again until they change (watch_data), a failing file does not stop the others '''
     SCRIPT_DIR = os.getcwd()
-    DATA_DIR = 'sensor_data'
     if not os.path.exists(os.path.join(SCRIPT_DIR, DATA_DIR)):
         LOGGER.error(f"{os.path.join(SCRIPT_DIR, DATA_DIR)} data folder is missng, aborting.")
         sys.exit(1)
 
-    PROCESSED_DIR = 'sensor_processed'
     if not os.path.exists(os.path.join(SCRIPT_DIR,  PROCESSED_DIR)):
         os.mkdir(os.path.join(SCRIPT_DIR,  PROCESSED_DIR))
 
     os.chdir(DATA_DIR)
     files = glob.glob("*.csv")
-    for filename in files:
-        start_processing = dt.now()
-        #LOGGER.info(f"Trying to process: {filename}")
-        full_file_path = os.path.join(SCRIPT_DIR, DATA_DIR, filename)
-        write_result, store_result, meta_data = process_csv_and_store(full_file_path, write_run)
-        if (write_run and write_result):
-            filename_with_model  = filename.split(".csv")[0]
-            filename_with_model = filename_with_model +'_' +  meta_data[0] + '_' + meta_data[1] + '.csv'
-            dest_file_path = os.path.join(SCRIPT_DIR, PROCESSED_DIR, filename_with_model)
-            os.rename(full_file_path, dest_file_path)
-            end_processing = dt.now()
-            LOGGER.info(f"{filename} processed and renamed {filename_with_model}")
-            LOGGER.info(f"processed {store_result[1]} datapoints in: { end_processing - start_processing} [ms]")
+    if write_run and workers > 1 and not args.chunk_size:
+        process_data_pipelined(SCRIPT_DIR, files, workers, writers)
+    else:
+        for filename in files:
+            if settled is None:
+                process_file(SCRIPT_DIR, filename, write_run)
+            else:
+                process_watched_file(SCRIPT_DIR, filename, write_run, settled)
     LOGGER.info(f"total processed {len(files)} files")
 
 
-START_SCRIPT_TIME = dt.now()
-LOGNAME = get_script_name() + '.log'
-LOG_DIR = 'logs'
-LOGGER = set_up_log(LOG_DIR, LOGNAME)
-
-LOGGER.info("start script")
-
-credentials_path = '../database_settings/influxdb_credentials'
-if not os.path.exists(os.path.join(os.getcwd(), credentials_path)):
-    LOGGER.error("influxdb_credentials file is missing")
-    sys.exit(1)
-influx_auth = json.load(open(os.path.join(os.getcwd(), credentials_path)))
-
-INFLUX_WRITE_CLIENT = DataFrameClient(
-    host = 'localhost',
-    port = 8086,
-    database ='sensor',
-    username = influx_auth['username'],
-    password = influx_auth['password'])
+def store_stats(write_run):
+    ''' writes stage records kept since the last call to influx and the totals to the Prometheus textfile '''
+    if write_run and args.stats:
+        STATS.write(INFLUX_WRITE_CLIENT)
+    else:
+        STATS.take_records()
+    if args.prometheus_dir:
+        STATS.write_textfile(args.prometheus_dir)
 
-parser = argparse.ArgumentParser()
-parser.add_argument('-d', '--dry-run', action='store_true',
-    help="does not write to database, just show result in csv file")
-args = parser.parse_args()
 
-process_data(not args.dry_run)
-
-LOGGER.info(f"end script script, duration: {dt.now() - START_SCRIPT_TIME} [ms]")
+def process_watched_file(script_dir, filename, write_run, settled):
+    ''' process_file for watch_data, errors of one file are logged and do not stop the daemon '''
+    ''' settled: (file name, size, modification time) of files not processed again until they change,
+        files that failed (e.g. malformed csv) and, in a dry run, files already shown (they are not moved) '''
+    try:
+        stat = os.stat(os.path.join(script_dir, DATA_DIR, filename))
+    except FileNotFoundError:
+        return
+    signature = (filename, stat.st_size, stat.st_mtime_ns)
+    if signature in settled:
+        return
+    try:
+        process_file(script_dir, filename, write_run)
+        if not write_run:
+            settled.add(signature)
+    except SystemExit:
+        # store_points exits on connection errors, the file stays in DATA_DIR and is retried on rescan
+        LOGGER.error(f"Writing of {filename} failed, retrying on rescan.")
+    except Exception:
+        LOGGER.error(f"Processing of {filename} failed, file stays in {DATA_DIR} and is not retried until it changes.")
+        LOGGER.error(traceback.format_exc())
+        settled.add(signature)
+
+
+def watch_data(script_dir, write_run, settled):
+    ''' daemon mode: files are processed as soon as they are completely written to DATA_DIR '''
+    ''' influx client and imports stay loaded between files, stopped by SIGTERM or Ctrl-C '''
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    watcher = DirectoryWatcher(os.path.join(script_dir, DATA_DIR), '*.csv', use_inotify=not args.poll)
+    try:
+        while not stop.is_set():
+            for filename in watcher.wait_for_files():
+                process_watched_file(script_dir, filename, write_run, settled)
+                store_stats(write_run)
+    except KeyboardInterrupt:
+        pass
+    watcher.close()
+    LOGGER.info("watching stopped")
+
+
+DATA_DIR = 'sensor_data'
+PROCESSED_DIR = 'sensor_processed'
+MEASUREMENT = 'sensor_test'
+TAGS = ['sensor_model', 'sensor_position'] + LOCATION_TAGS
+FIELDS = ['pressure_mbar', 'temp_c', 'utc_offset'] + LOCATION_FIELDS + ['depth_m']
+# fields of the per minute and per hour rollups, see common/rollups.py
+ROLLUP_FIELDS = ['pressure_mbar', 'temp_c']
+ROLLUP_LOCK = threading.Lock()
+# spectral and zero crossing wave parameters of hourly bursts, see data_processing/neumeier/wavesp.py
+WAVES_MEASUREMENT = 'sensor_test_waves'
+# samples flagged by quality control, see owhl_qc.py
+QC_MEASUREMENT = 'sensor_test_qc'
+LOG_DIR = 'logs'
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--dry-run', action='store_true',
+        help="does not write to database, just show result in csv file")
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help="number of datapoints written in one request, halved when influx answers 413 Request Entity Too Large")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+        help="number of processes parsing files, with more than 1 parsing overlaps with writing")
+    parser.add_argument('--writers', type=int, default=1,
+        help="number of threads writing parsed files to influx, used with --workers")
+    parser.add_argument('--watch', action='store_true',
+        help="keeps running and processes new files as soon as they are written to sensor_data, use instead of cron")
+    parser.add_argument('--poll', action='store_true',
+        help="with --watch: polls sensor_data instead of using inotify")
+    parser.add_argument('--no-waves', dest='waves', action='store_false',
+        help="does not write wave parameters of hourly bursts to " + WAVES_MEASUREMENT)
+    parser.add_argument('--no-qc', dest='qc', action='store_false',
+        help="does not write samples flagged by quality control (spikes, out of range, gaps, clock resets) to " + QC_MEASUREMENT)
+    parser.add_argument('--no-compensation', dest='compensation', action='store_false',
+        help="does not write depth_m (pressure compensated with atm_pressure_hpa of database weather_cloud)")
+    parser.add_argument('--sensor-height', type=float, default=None,
+        help="height of the sensor above seabed in m, used to correct wave parameters for pressure attenuation, not corrected by default")
+    parser.add_argument('--no-rollups', dest='rollups', action='store_false',
+        help="does not write per minute and per hour rollups to retention policies " + ', '.join(rp for freq, rp, suffix in ROLLUPS))
+    parser.add_argument('--archive', action='store_true',
+        help="stores written files in sensor_processed as compact .owhl archives instead of csv, see owhl_archive.py")
+    parser.add_argument('--chunk-size', type=int, default=0,
+        help="streaming mode: reads, transforms and writes files this many rows at a time (e.g. 200000), memory does not "
+             "grow with the length of the file, files are processed one at a time (no --workers) and moved as csv (no --archive)")
+    parser.add_argument('--no-stats', dest='stats', action='store_false',
+        help="does not write duration, rows, bytes and memory of the ingest stages to  ingest_stats")
+    parser.add_argument('--prometheus-dir', default=None,
+        help="directory of the node_exporter textfile collector, stage totals are written to csv_to_influx.prom")
+    parser.add_argument('--trace-memory', action='store_true',
+        help="records peak memory allocated in each stage with tracemalloc, slows down parsing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, writers=None):
+    ''' runs the script in the current directory, argv without the script name (sys.argv[1:] by default) '''
+    ''' writers: InfluxWriters of ingest.py, by default the script creates and closes its own writer '''
+    global args, CHECKPOINT, ROLLUP_STATE, INFLUX_WRITE_CLIENT, STATS, LOCATIONS_PATH, BAROMETER
+    start_script_time = dt.now()
+    set_up_log(LOG_DIR, get_script_name(__file__) + '.log')
+
+    LOGGER.info("start script")
+    args = parse_arguments(argv)
+    if args.prometheus_dir:
+        # files are processed in DATA_DIR
+        args.prometheus_dir = os.path.abspath(args.prometheus_dir)
+    # duration, rows, bytes and memory of the ingest stages, see ingest_stats.py
+    STATS = IngestStats(get_script_name(__file__), args.trace_memory)
+
+    # index of written files and batches, see ingest_checkpoint.py
+    CHECKPOINT = IngestCheckpoint(os.path.join(os.getcwd(), 'ingest_checkpoint.sqlite'))
+    # partial statistics of rollup buckets at the edges of written files, in the same database
+    ROLLUP_STATE = RollupState(os.path.join(os.getcwd(), 'ingest_checkpoint.sqlite'))
+
+    # testing locations joined into the points, see sensor_locations.py
+    LOCATIONS_PATH = os.path.join(os.getcwd(), LOCATIONS_FILE)
+    load_locations(LOCATIONS_PATH)
+
+    # block versions of MEASUREMENT for the caches of influx_query_client.py
+    INFLUX_WRITE_CLIENT = open_influx_writer(writers, 'sensor', get_script_name(__file__), block_markers={MEASUREMENT})
+    # atmospheric pressure of the weather station, queried a day at a time and cached, see barometric_compensation.py
+    barometer_client = open_influx_writer(writers, 'weather_cloud', get_script_name(__file__) + '_barometer') if args.compensation else None
+    BAROMETER = BarometricSeries(influx_barometer(barometer_client)) if args.compensation else None
+
+    if args.rollups and not args.dry_run:
+        create_retention_policies(INFLUX_WRITE_CLIENT)
+
+    script_dir = os.getcwd()
+    settled = set() if args.watch else None
+    process_data(not args.dry_run, args.workers, args.writers, settled)
+    if args.watch:
+        watch_data(script_dir, not args.dry_run, settled)
+
+    store_stats(not args.dry_run)
+    LOGGER.info(f"ingest stages: {STATS.summary()}")
+    LOGGER.info(INFLUX_WRITE_CLIENT.report())
+    if BAROMETER is not None:
+        LOGGER.info(f"{BAROMETER.fetches} windows of {BAROMETER_FIELD} fetched for compensation.")
+    if writers is None:
+        INFLUX_WRITE_CLIENT.close()
+        if barometer_client is not None:
+            barometer_client.close()
+    LOGGER.info(f"end script script, duration: {dt.now() - start_script_time} [ms]")
+
+
+if __name__ == "__main__":
+    main()
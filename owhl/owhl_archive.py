@@ -0,0 +1,172 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Compact columnar archive of processed OWHL files (csv_to_influx.py --archive).
+#  Instead of keeping the csv text (repeated DateTime strings, about 47 bytes per sample) every file is stored as
+#  <name>_<sensor_position>_<sensor_model>.owhl in sensor_processed, about 8 bytes per sample:
+#  - 8 bytes magic 'OWHLARC1', uint32 (little endian) length of the json header, json header:
+#    sensor_position, sensor_model, utc_shift (as in the settings line), utc_offset, rows, first_time (ns since epoch),
+#    and for every column its dtype, shape, byte offset in the file and for fields the decimals of the csv values
+#  - columns start at multiples of 64 bytes, so they can be mapped with np.memmap without copying:
+#    time_deltas, time_runs  int64  differences between consecutive timestamps (ns), run length encoded:
+#                                   delta time_deltas[i] repeats time_runs[i] times, a 4 Hz file has a single run
+#    pressure_mbar, temp_c   float32 (float64 when the csv values have more digits than float32 keeps)
+#  Timestamps are rebuilt with one cumsum, fields are rounded back to the decimals of the csv,
+#  so read_archive gives the same data frame as read_sensor_file (owhl_csv.py).
+#  Existing csv files can be converted with: python3 owhl_archive.py sensor_processed/*.csv [--remove]
+
+import numpy as np
+import pandas as pd
+
+import os
+import sys
+import json
+import struct
+import argparse
+
+MAGIC = b'OWHLARC1'
+ARCHIVE_EXTENSION = '.owhl'
+ALIGNMENT = 64
+FIELD_COLUMNS = ['pressure_mbar', 'temp_c']
+MAX_DECIMALS = 6
+
+
+def column_decimals(values):
+    ''' smallest number of decimals representing all values exactly (as parsed from csv), None if there is none '''
+    finite = values[np.isfinite(values)]
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(finite, decimals), finite):
+            return decimals
+    return None
+
+
+def run_length_deltas(times_ns):
+    ''' differences between consecutive timestamps as (deltas, runs) '''
+    deltas = np.diff(times_ns)
+    if deltas.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], deltas[1:] != deltas[:-1]]))
+    return deltas[starts], np.diff(np.append(starts, deltas.size)).astype(np.int64)
+
+
+def write_archive(file_path, df, sensor_meta_data):
+    ''' writes data frame as returned by read_sensor_file with its sensor meta data, replaces file_path atomically '''
+    times_ns = df['time'].to_numpy().astype('datetime64[ns]').view(np.int64)
+    deltas, runs = run_length_deltas(times_ns)
+    columns = {'time_deltas': deltas, 'time_runs': runs}
+    decimals = {}
+    for field in FIELD_COLUMNS:
+        values = df[field].to_numpy(dtype=np.float64)
+        decimals[field] = column_decimals(values)
+        columns[field] = values.astype(np.float32)
+        if not np.array_equal(restore_values(columns[field], decimals[field]), values, equal_nan=True):
+            columns[field] = values
+    header = {
+        'sensor_position': sensor_meta_data[0],
+        'sensor_model': sensor_meta_data[1],
+        'utc_shift': sensor_meta_data[2],
+        'utc_offset': int(df['utc_offset'].iloc[0]) if df.shape[0] else 0,
+        'rows': int(df.shape[0]),
+        'first_time': int(times_ns[0]) if times_ns.size else 0,
+        'columns': {}}
+    # offsets depend on the header length, header is built twice with a generous estimate first
+    header_size = len(json.dumps(header)) + 200 * len(columns)
+    offset = -(-(len(MAGIC) + 4 + header_size) // ALIGNMENT) * ALIGNMENT
+    for name, values in columns.items():
+        header['columns'][name] = {'dtype': values.dtype.newbyteorder('<').str, 'shape': list(values.shape), 'offset': offset,
+                                   'decimals': decimals.get(name)}
+        offset += -(-values.nbytes // ALIGNMENT) * ALIGNMENT
+    encoded = json.dumps(header).encode('utf-8')
+    if len(encoded) > header_size:
+        raise ValueError(f"archive header of {file_path} longer than expected")
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(MAGIC + struct.pack('<I', len(encoded)) + encoded)
+        for name, values in columns.items():
+            file.seek(header['columns'][name]['offset'])
+            file.write(values.astype(header['columns'][name]['dtype'], copy=False).tobytes())
+        file.truncate(offset)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+    return offset
+
+
+def read_header(file_path):
+    ''' json header of the archive, raises ValueError if file_path is not an archive '''
+    with open(file_path, 'rb') as file:
+        start = file.read(len(MAGIC) + 4)
+        if len(start) < len(MAGIC) + 4 or start[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{file_path} is not an OWHL archive")
+        return json.loads(file.read(struct.unpack('<I', start[len(MAGIC):])[0]))
+
+
+def open_archive(file_path):
+    ''' returns (header, dict column name -> read only np.memmap), nothing is copied or read until used '''
+    header = read_header(file_path)
+    columns = {}
+    for name, column in header['columns'].items():
+        if column['shape'][0] == 0:
+            columns[name] = np.empty(column['shape'], dtype=column['dtype'])
+        else:
+            columns[name] = np.memmap(file_path, dtype=column['dtype'], mode='r', offset=column['offset'], shape=tuple(column['shape']))
+    return header, columns
+
+
+def archive_times(header, columns):
+    ''' datetime64[ns] timestamps of all rows '''
+    times_ns = np.empty(header['rows'], dtype=np.int64)
+    if header['rows']:
+        times_ns[0] = header['first_time']
+        np.cumsum(np.repeat(columns['time_deltas'], columns['time_runs']), out=times_ns[1:])
+        times_ns[1:] += header['first_time']
+    return times_ns.view('datetime64[ns]')
+
+
+def restore_values(values, decimals):
+    ''' float64 values rounded back to the decimals of the csv file '''
+    values = values.astype(np.float64)
+    return values if decimals is None else np.round(values, decimals)
+
+
+def field_values(header, columns, field):
+    ''' float64 values of field as in the csv file '''
+    return restore_values(columns[field], header['columns'][field]['decimals'])
+
+
+def read_archive(file_path):
+    ''' reads archive at file_path, returns (data frame, sensor meta data) as read_sensor_file '''
+    header, columns = open_archive(file_path)
+    df = pd.DataFrame({field: field_values(header, columns, field) for field in FIELD_COLUMNS})
+    df['sensor_position'] = header['sensor_position']
+    df['sensor_model'] = header['sensor_model']
+    df['time'] = archive_times(header, columns)
+    df['utc_offset'] = header['utc_offset']
+    return df, (header['sensor_position'], header['sensor_model'], header['utc_shift'])
+
+
+def archive_path(csv_path):
+    ''' path of the archive replacing csv file '''
+    return os.path.splitext(csv_path)[0] + ARCHIVE_EXTENSION
+
+
+if __name__ == "__main__":
+    from owhl_csv import read_sensor_file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+', help="processed OWHL csv files")
+    parser.add_argument('--remove', action='store_true', help="removes csv files after checking their archive")
+    args = parser.parse_args()
+    failed = 0
+    for csv_path in args.files:
+        df, sensor_meta_data = read_sensor_file(csv_path)
+        if df is None:
+            continue
+        size = write_archive(archive_path(csv_path), df, sensor_meta_data)
+        archived, archived_meta_data = read_archive(archive_path(csv_path))
+        if not archived.equals(df[archived.columns]):
+            failed += 1
+            print(f"{csv_path}: archive differs from csv, csv kept")
+            continue
+        print(f"{csv_path}: {os.path.getsize(csv_path)} bytes, archive {size} bytes")
+        if args.remove:
+            os.remove(csv_path)
+    sys.exit(1 if failed else 0)
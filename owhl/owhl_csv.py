@@ -0,0 +1,193 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Reading of OWHL sensor csv files into data frames ready to be written to influx.
+#  Kept apart from csv_to_influx.py so files can be parsed in worker processes.
+#  First line of the file is the mission information from settings.txt, for example:
+#  SALTSTEIN_E sensor_05.07.2024 UTC+2,startMinute,0,minutes per hour,60
+#  read_sensor_file_chunks reads files too large to be held in memory (continuous sampling over several days)
+#  in chunks with compact dtypes: DateTime is not read when POSIXt agrees with it at the start and the end
+#  of the file, fields are float32 when they keep the decimals of the file, tags are categorical.
+
+import numpy as np
+import pandas as pd
+
+import sys
+import io
+import os
+import logging
+
+from owhl_timestamps import build_timestamps, posix_matches_datetime
+from owhl_archive import column_decimals, restore_values
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from ingest_stats import stage
+
+LOGGER = logging.getLogger(__name__)
+
+# raw field columns and their names in influx
+FIELD_COLUMNS = {'Pressure.mbar': 'pressure_mbar', 'TempC': 'temp_c'}
+# columns and dtypes of read_sensor_file_chunks, DateTime is added when POSIXt cannot be used
+CHUNK_DTYPES = {'POSIXt': 'int64', 'frac.seconds': 'int16', 'Pressure.mbar': 'float64', 'TempC': 'float64'}
+EDGE_BYTES = 4096
+
+
+def read_settings_line(settings_line):
+    if settings_line == 'Default mission information for csv file header':
+        return "not_set", "not_named", "UTC+0"
+    res = settings_line.split(' ')
+    position = res[0]
+    model = res[1]
+    utc_shift = res[2].split(',')[0]
+    print("position ", position)
+    print("model ", model)
+    return position, model, utc_shift
+
+def get_metadata(file_path):
+    try:
+        with open(file_path, 'r') as file:
+            first_line = file.readline().strip()
+            LOGGER.info(f"Processing {file_path}.")
+            return read_settings_line(first_line)
+    except FileNotFoundError:
+        LOGGER.error(f" {file_path} was not found.")
+    except IOError:
+        LOGGER.error(f"An io error occurred trying to read the file {file_path}.")
+
+def get_utc_time_offset(utc_string):
+    print(utc_string)
+    #reading utf time offset information
+    # tested against utc_string = ["UTC+0", "UTC-1", "UTC+2" , "utc-0"]
+    offset_list = utc_string.lower().split('utc')
+    offset_sign  = offset_list[1][0]
+    offset_val = offset_list[1][1:]
+    offset_int_val = int(offset_val)
+    if offset_sign == '-':
+        offset_int_val *= -1
+    return  offset_int_val
+
+def transform_sensor_data(df, sensor_meta_data):
+    ''' adds tags and time to raw OWHL data frame and renames fields as stored in influx '''
+    df['sensor_position'] = sensor_meta_data[0]
+    df['sensor_model'] = sensor_meta_data[1]
+    utc_time_offset = get_utc_time_offset(sensor_meta_data[2])
+    utc_offset_time_delta = pd.Timedelta(days=0, hours=utc_time_offset)
+    df['time'] = build_timestamps(df)
+    df['utc_offset'] = utc_time_offset
+    #inflxdb default time zone is UTC, thus all data will be stored in UTC+0
+    #df['time'] = df['time'] - utc_offset_time_delta
+    df = df.drop(columns=['POSIXt', 'DateTime', 'frac.seconds' ])
+    return df.rename(columns={"Pressure.mbar": "pressure_mbar", "TempC": "temp_c"})
+
+def sensor_file_metadata(file_path):
+    ''' sensor meta data of OWHL csv file at file_path, None when there is nothing to write '''
+    ''' empty files are removed '''
+    if os.stat(file_path).st_size > 0:
+        sensor_meta_data = get_metadata(file_path)
+        if sensor_meta_data == None:
+            return None
+        if sensor_meta_data[0] == 'Default':
+            LOGGER.info(f"{file_path} contains default meta data. File skippped.")
+            return None
+        return sensor_meta_data
+    else:
+        os.remove(file_path)
+        LOGGER.info(f"{file_path} is empty. File removed")
+        return None
+
+def remove_empty_data_file(file_path):
+    os.remove(file_path)
+    LOGGER.info(f"{file_path} contains empty data frame. File removed")
+
+def read_sensor_file(file_path, stats=None):
+    ''' reads OWHL csv file at file_path '''
+    ''' returns (data frame, sensor meta data), data frame is None when there is nothing to write '''
+    ''' empty files are removed, with stats (IngestStats of ingest_stats.py) parse and transform stages are recorded '''
+    sensor_meta_data = sensor_file_metadata(file_path)
+    if sensor_meta_data is None:
+        return (None, None)
+    fields = {'file': os.path.basename(file_path), 'sensor_position': sensor_meta_data[0]}
+    with stage(stats, 'parse', **fields) as record:
+        df = pd.read_csv(file_path, skiprows=1)
+        record['rows'] = df.shape[0]
+    if df.shape[0] > 0:
+        with stage(stats, 'transform', **fields) as record:
+            df = transform_sensor_data(df, sensor_meta_data)
+            record['rows'] = df.shape[0]
+        return (df, sensor_meta_data)
+    else:
+        remove_empty_data_file(file_path)
+        return (None, None)
+
+def file_edge_rows(file_path):
+    ''' first and last data row of OWHL csv file as data frame, the rest of the file is not read '''
+    first = pd.read_csv(file_path, skiprows=1, nrows=1)
+    with open(file_path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - EDGE_BYTES))
+        last_line = file.read().decode('utf-8', errors='replace').strip().splitlines()[-1]
+    last = pd.read_csv(io.StringIO(last_line), header=None, names=first.columns)
+    return pd.concat([first, last], ignore_index=True)
+
+def posix_usable(file_path):
+    ''' true if POSIXt is an integer column agreeing with DateTime at the start and the end of the file '''
+    try:
+        edges = file_edge_rows(file_path)
+    except (ValueError, IndexError, pd.errors.ParserError):
+        return False
+    return (edges.shape[0] == 2 and pd.api.types.is_integer_dtype(edges['POSIXt'])
+            and pd.api.types.is_integer_dtype(edges['frac.seconds']) and posix_matches_datetime(edges))
+
+def compact_fields(df):
+    ''' converts field columns of df to float32 where it keeps their decimals (checked as in owhl_archive.py) '''
+    ''' returns decimals of each field, None for fields kept as float64 '''
+    decimals = {}
+    for field in FIELD_COLUMNS.values():
+        values = df[field].to_numpy(dtype=np.float64)
+        decimals[field] = column_decimals(values)
+        compact = values.astype(np.float32)
+        if decimals[field] is not None and np.array_equal(restore_values(compact, decimals[field]), values, equal_nan=True):
+            df[field] = compact
+        else:
+            decimals[field] = None
+    return decimals
+
+def float64_fields(df, decimals):
+    ''' copy of df with float32 fields of compact_fields restored to the float64 values of the file '''
+    return df.assign(**{field: restore_values(df[field].to_numpy(), decimals[field]) for field in FIELD_COLUMNS.values()})
+
+def transform_sensor_chunk(chunk, sensor_meta_data, utc_time_offset):
+    ''' data frame indexed by time with the columns of transform_sensor_data, built from the columns of chunk '''
+    ''' returns (data frame, decimals of compact_fields) '''
+    rows = chunk.shape[0]
+    tag = lambda value: pd.Categorical.from_codes(np.zeros(rows, dtype=np.int8), categories=[value])
+    df = pd.DataFrame({
+        'pressure_mbar': chunk['Pressure.mbar'].to_numpy(),
+        'temp_c': chunk['TempC'].to_numpy(),
+        'sensor_position': tag(sensor_meta_data[0]),
+        'sensor_model': tag(sensor_meta_data[1]),
+        'utc_offset': np.full(rows, utc_time_offset, dtype=np.int8)},
+        index=pd.DatetimeIndex(build_timestamps(chunk).to_numpy(), name='time'))
+    return (df, compact_fields(df))
+
+def read_sensor_file_chunks(file_path, sensor_meta_data, chunk_size, stats=None):
+    ''' reads OWHL csv file at file_path (sensor meta data of sensor_file_metadata) chunk_size rows at a time '''
+    ''' yields (data frame indexed by time, decimals of compact_fields), only one chunk is held in memory '''
+    ''' with stats parse and transform stages of each chunk are recorded '''
+    fields = {'file': os.path.basename(file_path), 'sensor_position': sensor_meta_data[0]}
+    dtypes = dict(CHUNK_DTYPES)
+    if not posix_usable(file_path):
+        # seconds are parsed from DateTime, as build_timestamps does for such files
+        dtypes = {'DateTime': 'str', 'frac.seconds': 'int16', 'Pressure.mbar': 'float64', 'TempC': 'float64'}
+    utc_time_offset = get_utc_time_offset(sensor_meta_data[2])
+    with pd.read_csv(file_path, skiprows=1, usecols=list(dtypes), dtype=dtypes, chunksize=chunk_size) as reader:
+        while True:
+            try:
+                with stage(stats, 'parse', **fields) as record:
+                    chunk = reader.get_chunk()
+                    record['rows'] = chunk.shape[0]
+            except StopIteration:
+                return
+            with stage(stats, 'transform', **fields) as record:
+                df, decimals = transform_sensor_chunk(chunk, sensor_meta_data, utc_time_offset)
+                record['rows'] = df.shape[0]
+            del chunk
+            yield (df, decimals)
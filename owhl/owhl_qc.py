@@ -0,0 +1,200 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Quality control of OWHL data at ingest time (csv_to_influx.py), points are flagged, not removed or changed.
+#  Flags of a sample are a bit mask (qc_flags):
+#  SPIKE_PRESSURE, SPIKE_TEMP  Hampel filter: value further from the median of its window (2 * HALF_WINDOW + 1 samples,
+#                              3.25 s at 4 Hz) than N_SIGMAS scaled median absolute deviations of the window from its median,
+#                              and at least the minimal deviation of QC_FIELDS (temperature is logged with 0.01 resolution,
+#                              a window of equal values has MAD 0), waves change pressure by tens of mbar within a window
+#  RANGE_PRESSURE, RANGE_TEMP  value outside the valid range of QC_FIELDS (sensor limits), or missing
+#  GAP                         more than GAP_FACTOR sampling intervals since the previous sample
+#                              (also the pause between bursts of files not logging the whole hour)
+#  IRREGULAR                   interval to the previous sample differs from the sampling interval by more than 10%
+#  TIME_BACKWARDS, DUPLICATE_TIME  time before or equal to the previous sample (logger reset, clock set back),
+#                              flagged rows with the time of the previous sample are tagged with their number after it
+#                              (duplicate=1, 2, ...), so each of them is a separate point of the QC measurement
+#  CLOCK_RESET                 time before CLOCK_MIN or more than a day in the future (real time clock lost)
+#  The sampling interval is the median of the positive intervals of the first SAMPLING_ROWS rows of the file
+#  (the mission information line has no sampling rate), a file whose rate changes later is flagged IRREGULAR. Everything is vectorized: the window medians are
+#  scipy.ndimage.median_filter, the MAD is computed (sliding_window_view) only for values further than the minimal
+#  deviation from their median, the rest are numpy comparisons on the values and on the differences of the timestamps.
+#  No sample of synthetic_data.py owhl files (swell and wind waves) is flagged, injected spikes are all found.
+#  Streamed files (--chunk-size) are flagged chunk by chunk with StreamQC, which carries CONTEXT rows between chunks
+#  and the sampling interval of the first rows, so the flags are the same as for the whole file (the whole file is
+#  flagged as a single final chunk), duplicate numbers too unless a run of equal times is longer than CONTEXT rows.
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import median_filter
+
+SPIKE_PRESSURE = 1
+SPIKE_TEMP = 2
+RANGE_PRESSURE = 4
+RANGE_TEMP = 8
+GAP = 16
+IRREGULAR = 32
+TIME_BACKWARDS = 64
+DUPLICATE_TIME = 128
+CLOCK_RESET = 256
+FLAG_NAMES = {SPIKE_PRESSURE: 'spike_pressure', SPIKE_TEMP: 'spike_temp', RANGE_PRESSURE: 'range_pressure',
+              RANGE_TEMP: 'range_temp', GAP: 'gap', IRREGULAR: 'irregular', TIME_BACKWARDS: 'time_backwards',
+              DUPLICATE_TIME: 'duplicate_time', CLOCK_RESET: 'clock_reset'}
+
+# field, spike flag, range flag, valid range, minimal deviation of a spike
+QC_FIELDS = [('pressure_mbar', SPIKE_PRESSURE, RANGE_PRESSURE, (800, 14000), 5.0),
+             ('temp_c', SPIKE_TEMP, RANGE_TEMP, (-5, 40), 0.5)]
+HALF_WINDOW = 6
+N_SIGMAS = 5
+# MAD of normally distributed values times MAD_SCALE is their standard deviation
+MAD_SCALE = 1.4826
+GAP_FACTOR = 2
+IRREGULAR_TOLERANCE = 0.1
+CLOCK_MIN = pd.Timestamp('2020-01-01')
+# rows before and after a sample its flags depend on
+CONTEXT = HALF_WINDOW
+# rows of the start of a file the sampling interval is taken from, an hour at 4 Hz
+SAMPLING_ROWS = 14400
+# tag of the QC measurement: number of a flagged row after the previous row with the same time
+DUPLICATE_TAG = 'duplicate'
+QC_FIELD_NAMES = ['qc_flags', 'interval_s', 'pressure_mbar', 'temp_c']
+
+
+def hampel_spikes(values, min_deviation, half_window=HALF_WINDOW, n_sigmas=N_SIGMAS):
+    ''' true for values further than n_sigmas scaled MAD (and min_deviation) from the median of their window '''
+    size = 2 * half_window + 1
+    median = median_filter(values, size=size, mode='nearest')
+    deviation = np.abs(values - median)
+    # deviations smaller than min_deviation are never spikes, the MAD is needed only where they are larger
+    candidates = np.flatnonzero(deviation > min_deviation)
+    spikes = np.zeros(values.shape, dtype=bool)
+    if candidates.size > 0:
+        windows = np.lib.stride_tricks.sliding_window_view(np.pad(values, half_window, mode='edge'), size)[candidates]
+        mad = np.median(np.abs(windows - median[candidates, np.newaxis]), axis=1)
+        spikes[candidates] = deviation[candidates] > n_sigmas * MAD_SCALE * mad
+    return spikes
+
+
+def field_flags(values, spike_flag, range_flag, valid_range, min_deviation):
+    ''' flags of one field, missing values are out of range and filled from their neighbours for the filter '''
+    flags = np.where((values >= valid_range[0]) & (values <= valid_range[1]), 0, range_flag).astype(np.int32)
+    missing = np.isnan(values)
+    if missing.any():
+        if missing.all():
+            return flags
+        values = pd.Series(values).ffill().bfill().to_numpy()
+    flags[hampel_spikes(values, min_deviation)] |= spike_flag
+    return flags
+
+
+def sampling_interval(times_ns):
+    ''' median of the positive intervals (ns) of the first SAMPLING_ROWS timestamps (int64 ns, file order), None if none '''
+    intervals = np.diff(times_ns[:SAMPLING_ROWS])
+    positive = intervals[intervals > 0]
+    return float(np.median(positive)) if positive.size > 0 else None
+
+
+def time_flags(times_ns, now=None, expected=None):
+    ''' flags of the timestamps (int64 ns, file order) and interval to the previous sample in s (NaN for the first) '''
+    ''' expected: sampling interval in ns, sampling_interval of times_ns when None '''
+    flags = np.zeros(times_ns.shape, dtype=np.int32)
+    intervals = np.diff(times_ns)
+    interval_s = np.concatenate([[np.nan], intervals / 1e9])
+    if expected is None:
+        expected = sampling_interval(times_ns)
+    if expected is not None:
+        gaps = intervals > GAP_FACTOR * expected
+        flags[1:][gaps] |= GAP
+        flags[1:][(intervals > 0) & ~gaps & (np.abs(intervals - expected) > IRREGULAR_TOLERANCE * expected)] |= IRREGULAR
+    flags[1:][intervals < 0] |= TIME_BACKWARDS
+    flags[1:][intervals == 0] |= DUPLICATE_TIME
+    now = pd.Timestamp.now() if now is None else now
+    flags[(times_ns < CLOCK_MIN.value) | (times_ns > (now + pd.Timedelta(days=1)).value)] |= CLOCK_RESET
+    return flags, interval_s
+
+
+def qc_flags(df, expected=None):
+    ''' (flags, interval_s) of each row of df indexed by time in file order, see the flags above '''
+    ''' expected: sampling interval in ns, see time_flags '''
+    flags, interval_s = time_flags(df.index.to_numpy().astype('datetime64[ns]').view(np.int64), expected=expected)
+    for field, spike_flag, range_flag, valid_range, min_deviation in QC_FIELDS:
+        flags |= field_flags(df[field].to_numpy(dtype=np.float64), spike_flag, range_flag, valid_range, min_deviation)
+    return flags, interval_s
+
+
+def duplicate_numbers(interval_s):
+    ''' number of each row after the last earlier row with a different time (0 for that row), from interval_s of qc_flags '''
+    rows = np.arange(interval_s.shape[0])
+    first = np.maximum.accumulate(np.where(interval_s == 0, 0, rows))
+    return rows - first
+
+
+def flagged_rows(df, flags, interval_s, tag_columns, duplicates=None):
+    ''' rows of df with flags, as written to the QC measurement: tags, DUPLICATE_TAG and QC_FIELD_NAMES '''
+    ''' duplicates: duplicate_numbers of the rows, of interval_s when None '''
+    rows = flags != 0
+    duplicates = duplicate_numbers(interval_s) if duplicates is None else duplicates
+    flagged = df.loc[rows, tag_columns + ['pressure_mbar', 'temp_c']].copy()
+    # empty tag (not written) for rows with a time of their own
+    flagged[DUPLICATE_TAG] = np.where(duplicates[rows] > 0, duplicates[rows].astype(str), '')
+    flagged['qc_flags'] = flags[rows]
+    flagged['interval_s'] = interval_s[rows]
+    return flagged
+
+
+def flag_counts(flags):
+    ''' number of samples with each flag, only flags found '''
+    counts = {}
+    for bit, name in FLAG_NAMES.items():
+        count = int(np.count_nonzero(flags & bit))
+        if count:
+            counts[name] = count
+    return counts
+
+
+class StreamQC:
+    ''' flags of a file given in chunks (in file order), the last CONTEXT rows of a chunk are flagged with the next one '''
+
+    def __init__(self, tag_columns):
+        self.tag_columns = tag_columns
+        # rows of the previous chunks kept as context, the last held of them are not flagged yet
+        self.tail = None
+        self.held = 0
+        # sampling interval (ns) of the first rows of the file, see sampling_interval
+        self.expected = None
+        self.sampled = False
+        self.counts = {}
+
+    def advance(self, df, final):
+        ''' (rows of the tail and df, first and end row to flag), keeps the context of the next chunk '''
+        parts = [part for part in [self.tail, df] if part is not None]
+        if not parts:
+            return None, 0, 0
+        data = pd.concat(parts) if len(parts) > 1 else parts[0]
+        start = 0 if self.tail is None else self.tail.shape[0] - self.held
+        end = data.shape[0] if final else max(start, data.shape[0] - CONTEXT)
+        if not self.sampled:
+            if final or data.shape[0] >= SAMPLING_ROWS:
+                self.expected = sampling_interval(data.index.to_numpy().astype('datetime64[ns]').view(np.int64))
+                self.sampled = True
+            else:
+                # nothing is flagged before the sampling interval is known, the rows are kept
+                end = start
+        self.tail = data.iloc[max(0, end - CONTEXT):]
+        self.held = data.shape[0] - end
+        return data, start, end
+
+    def skip(self, df):
+        ''' keeps only the context of df (a chunk flagged by an earlier run), the rows held back are flagged with the next '''
+        self.advance(df, final=False)
+
+    def flagged(self, df, final=False):
+        ''' flagged rows of df and of the rows held back from the previous chunk, except the last CONTEXT rows '''
+        ''' final: df is the last chunk (or None), all rows held back are flagged '''
+        data, start, end = self.advance(df, final)
+        if data is None:
+            return None
+        flags, interval_s = qc_flags(data, self.expected)
+        for name, count in flag_counts(flags[start:end]).items():
+            self.counts[name] = self.counts.get(name, 0) + count
+        return flagged_rows(data.iloc[start:end], flags[start:end], interval_s[start:end], self.tag_columns,
+            duplicate_numbers(interval_s)[start:end])
@@ -0,0 +1,57 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Vectorized timestamp building for OWHL csv files.
+#  Every OWHL row has: POSIXt,DateTime,frac.seconds,Pressure.mbar,TempC
+#  for example:        1718668800,2024-06-18 00:00:00,25,1013.2,15.3
+#  The time of the sample is "<DateTime>.<frac.seconds>", so frac.seconds digits are read
+#  as a decimal fraction: 25 -> 0.25 s, 50 -> 0.5 s, 0 -> 0 s.
+#  Instead of building that string for every row, seconds are taken from the POSIXt epoch column
+#  (or DateTime parsed with an explicit format) and the fraction is added as integer nanoseconds.
+
+import numpy as np
+import pandas as pd
+
+OWHL_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+NS_PER_SECOND = 1_000_000_000
+
+
+def frac_seconds_to_ns(frac_seconds):
+    ''' converts frac.seconds column to integer nanoseconds, digits are a decimal fraction of a second '''
+    frac = np.asarray(frac_seconds, dtype=np.int64)
+    # number of decimal digits of each value, 0 has one digit, same as str(x)
+    digits = np.ones(frac.shape, dtype=np.int64)
+    if frac.size > 0:
+        limit = 10
+        max_frac = frac.max()
+        while limit <= max_frac:
+            digits += frac >= limit
+            limit *= 10
+    return frac * 10 ** (9 - digits)
+
+
+def parse_datetime_ns(datetime_column):
+    ''' parses DateTime column with explicit format, returns int64 nanoseconds since epoch '''
+    parsed = pd.to_datetime(datetime_column, format=OWHL_DATETIME_FORMAT)
+    return parsed.to_numpy().astype('datetime64[ns]').view(np.int64)
+
+
+def posix_matches_datetime(df):
+    ''' POSIXt and DateTime are written from the same logger clock, check it on first and last row '''
+    edges = df.iloc[[0, -1]]
+    return np.array_equal(edges['POSIXt'].to_numpy(dtype=np.int64) * NS_PER_SECOND,
+                          parse_datetime_ns(edges['DateTime']))
+
+
+def build_timestamps(df):
+    ''' returns datetime64[ns] series with the time of each sample '''
+    ''' seconds are taken from POSIXt when it agrees with DateTime, otherwise DateTime is parsed '''
+    ''' without DateTime column (chunks of read_sensor_file_chunks, checked there) POSIXt is used '''
+    frac_ns = frac_seconds_to_ns(df['frac.seconds'].to_numpy())
+    if df.shape[0] == 0:
+        seconds_ns = np.empty(0, dtype=np.int64)
+    elif ('POSIXt' in df.columns and pd.api.types.is_integer_dtype(df['POSIXt'])
+          and ('DateTime' not in df.columns or posix_matches_datetime(df))):
+        seconds_ns = df['POSIXt'].to_numpy(dtype=np.int64) * NS_PER_SECOND
+    else:
+        seconds_ns = parse_datetime_ns(df['DateTime'])
+    return pd.Series((seconds_ns + frac_ns).view('datetime64[ns]'), index=df.index, name='time')
@@ -0,0 +1,201 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Script to replay processed OWHL files to influx, e.g. to rebuild or migrate the database,
+#  without copying the files back to "sensor_data" and running csv_to_influx.py again.
+#  Files in "sensor_processed" (or --data-dir, csv files and .owhl archives) are kept in a time range index
+#  (archive_index.py, archive_index.sqlite), only files of the sensor overlapping --from/--to are read.
+#  Rows outside the window are left out, the window is extended to whole hours so rollup buckets stay complete.
+#  Files are parsed in --workers processes with read_sensor_file or read_archive (same data frames as csv_to_influx.py)
+#  and written by as many threads; --max-rate limits points written per second, so a replay does not take
+#  the capacity of influx from csv_to_influx.py ingesting live data.
+#  Wave parameters are not replayed, they can be rebuilt with store_wave_parameters_to_influx.py.
+#  usage: python3 replay_to_influx.py --from 2024-06-01 --to 2024-07-01 --sensor-position SALTSTEIN_E -w 4 --max-rate 50000
+#
+#  This script is wrting to
+#  database: 'sensor'
+#  measurement: 'sensor_test', tags: 'sensor_model', 'sensor_position', fields: 'pressure_mbar', 'temp_c', 'utc_offset'
+#  and the location tags and fields of sensor_location_data.csv as written by csv_to_influx.py, see sensor_locations.py
+#  measurements: 'sensor_test_1m' in retention policy 'rollup_1m', 'sensor_test_1h' in 'rollup_1h', see common/rollups.py
+
+
+import pandas as pd
+
+import sys
+import os
+
+import argparse
+
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import traceback
+import logging
+
+from datetime import datetime as dt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_setup import set_up_log, get_script_name, open_influx_writer, store_points
+from batch_writer import write_in_batches, DEFAULT_BATCH_SIZE
+from rate_limiter import RateLimiter
+from rollups import ROLLUPS, RollupState, file_rollup, rollup_field_names, create_retention_policies
+
+from owhl_csv import read_sensor_file
+from owhl_archive import read_archive, ARCHIVE_EXTENSION
+from archive_index import ArchiveIndex
+from sensor_locations import load_locations, LOCATIONS_FILE, LOCATION_TAGS, LOCATION_FIELDS
+
+
+
+def store_limited_points(df):
+    ''' writes df when --max-rate allows it '''
+    RATE_LIMITER.acquire(df.shape[0])
+    return store_points(INFLUX_WRITE_CLIENT, df, MEASUREMENT, TAGS, FIELDS)
+
+
+def store_rollups(df, file_name):
+    ''' writes per minute and per hour rollups of df (indexed by time), edge buckets are combined with other files '''
+    with ROLLUP_LOCK:
+        for freq, retention_policy, suffix in ROLLUPS:
+            rollup = file_rollup(df, freq, retention_policy, TAGS, ROLLUP_FIELDS, ROLLUP_STATE, file_name)
+            def write_rollup(batch):
+                RATE_LIMITER.acquire(batch.shape[0])
+                return (INFLUX_WRITE_CLIENT.write_points(batch, f"{MEASUREMENT}_{suffix}", tag_columns = TAGS,
+                    field_columns = rollup_field_names(ROLLUP_FIELDS), retention_policy = retention_policy), batch.shape[0])
+            write_in_batches(rollup, write_rollup, args.batch_size)
+
+
+def load_file(file_path, start, end):
+    ''' reads processed file in a worker process, returns data frame indexed by time with rows in [start, end) '''
+    if file_path.endswith(ARCHIVE_EXTENSION):
+        df, meta_data = read_archive(file_path)
+    else:
+        df, meta_data = read_sensor_file(file_path)
+    if df is None:
+        return None
+    df = df.set_index('time')
+    if start is not None:
+        df = df[df.index >= start]
+    if end is not None:
+        df = df[df.index < end]
+    return df
+
+
+def replay_file(executor, data_dir, file_name, start, end, failed):
+    ''' parses file in the process pool and writes it, returns number of points written '''
+    if failed.is_set():
+        return 0
+    try:
+        df = executor.submit(load_file, os.path.join(data_dir, file_name), start, end).result()
+        if df is None or df.empty:
+            return 0
+        df = load_locations(LOCATIONS_PATH).enrich(df)
+        result, datapoints_count, batch_size = write_in_batches(df, store_limited_points, args.batch_size)
+        if result and args.rollups:
+            store_rollups(df, file_name)
+    except SystemExit:
+        # store_points exits on connection errors, stop the replay
+        failed.set()
+        return 0
+    except Exception:
+        LOGGER.error(f"Replay of {file_name} failed.")
+        LOGGER.error(traceback.format_exc())
+        return 0
+    LOGGER.info(f"{file_name}: {datapoints_count} datapoints replayed.")
+    return datapoints_count
+
+
+def replay(data_dir, start, end, write_run):
+    ''' replays indexed files of the sensor overlapping [start, end) '''
+    if not os.path.isdir(data_dir):
+        LOGGER.error(f"{data_dir} data folder is missng, aborting.")
+        sys.exit(1)
+    indexed = ARCHIVE_INDEX.refresh(data_dir)
+    files = ARCHIVE_INDEX.select(start, end, args.sensor_position, args.sensor_model)
+    LOGGER.info(f"{indexed} files indexed, {len(files)} files selected, {sum(row[5] for row in files)} rows.")
+    if not write_run:
+        for file_name, position, model, first_time, last_time, rows in files:
+            print(f"{file_name} {position} {model} {pd.Timestamp(first_time)} - {pd.Timestamp(last_time)} {rows} rows")
+        return
+    failed = threading.Event()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, ThreadPoolExecutor(max_workers=args.workers) as writers:
+        counts = list(writers.map(lambda row: replay_file(executor, data_dir, row[0], start, end, failed), files))
+    LOGGER.info(f"{sum(counts)} datapoints replayed from {len(files)} files, {RATE_LIMITER.waited:.1f} s waited for --max-rate.")
+    if failed.is_set():
+        LOGGER.error("Writing to influx failed, replay stopped.")
+        sys.exit(1)
+
+
+def window_edge(value, round_up):
+    ''' --from/--to as timestamp extended to whole hours, None when not given '''
+    if value is None:
+        return None
+    return pd.Timestamp(value).ceil('1h') if round_up else pd.Timestamp(value).floor('1h')
+
+
+
+MEASUREMENT = 'sensor_test'
+TAGS = ['sensor_model', 'sensor_position'] + LOCATION_TAGS
+FIELDS = ['pressure_mbar', 'temp_c', 'utc_offset'] + LOCATION_FIELDS
+ROLLUP_FIELDS = ['pressure_mbar', 'temp_c']
+ROLLUP_LOCK = threading.Lock()
+LOG_DIR = 'logs'
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--dry-run', action='store_true',
+        help="does not write to database, just lists the selected files")
+    parser.add_argument('--data-dir', default='sensor_processed',
+        help="directory with processed OWHL csv files and .owhl archives")
+    parser.add_argument('--from', dest='start', default=None,
+        help="start of the replayed time window, e.g. 2024-06-01 (time as in the files), rounded down to the hour")
+    parser.add_argument('--to', dest='end', default=None,
+        help="end of the replayed time window (excluded), rounded up to the hour")
+    parser.add_argument('--sensor-position', default=None, help="replays only files of this sensor position")
+    parser.add_argument('--sensor-model', default=None, help="replays only files of this sensor model")
+    parser.add_argument('-w', '--workers', type=int, default=2,
+        help="number of processes parsing files and of threads writing them")
+    parser.add_argument('--max-rate', type=int, default=50000,
+        help="maximum number of points written per second, 0 for no limit")
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help="number of datapoints written in one request, halved when influx answers 413 Request Entity Too Large")
+    parser.add_argument('--no-rollups', dest='rollups', action='store_false',
+        help="does not write per minute and per hour rollups")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, writers=None):
+    ''' runs the script in the current directory, argv without the script name (sys.argv[1:] by default) '''
+    ''' writers: InfluxWriters of ingest.py, by default the script creates and closes its own writer '''
+    global args, INFLUX_WRITE_CLIENT, ARCHIVE_INDEX, ROLLUP_STATE, RATE_LIMITER, LOCATIONS_PATH
+    start_script_time = dt.now()
+    set_up_log(LOG_DIR, get_script_name(__file__) + '.log')
+
+    LOGGER.info("start script")
+    args = parse_arguments(argv)
+
+    # block versions of MEASUREMENT for the caches of influx_query_client.py
+    INFLUX_WRITE_CLIENT = open_influx_writer(writers, 'sensor', get_script_name(__file__), block_markers={MEASUREMENT})
+
+    # testing locations joined into the points, see sensor_locations.py
+    LOCATIONS_PATH = os.path.join(os.getcwd(), LOCATIONS_FILE)
+    ARCHIVE_INDEX = ArchiveIndex(os.path.join(os.getcwd(), 'archive_index.sqlite'))
+    # partial statistics of rollup buckets at the edges of replayed files, by file name
+    ROLLUP_STATE = RollupState(os.path.join(os.getcwd(), 'archive_index.sqlite'))
+    # the burst lets one full batch through without waiting
+    RATE_LIMITER = RateLimiter(args.max_rate, max(args.max_rate, args.batch_size))
+
+    if args.rollups and not args.dry_run:
+        create_retention_policies(INFLUX_WRITE_CLIENT)
+
+    replay(os.path.join(os.getcwd(), args.data_dir), window_edge(args.start, False), window_edge(args.end, True), not args.dry_run)
+
+    LOGGER.info(INFLUX_WRITE_CLIENT.report())
+    if writers is None:
+        INFLUX_WRITE_CLIENT.close()
+    LOGGER.info(f"end script script, duration: {dt.now() - start_script_time} [ms]")
+
+
+if __name__ == "__main__":
+    main()
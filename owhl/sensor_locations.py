@@ -0,0 +1,189 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Registry of the testing locations of sensor_location_data.csv, so pressure points can carry their location
+#  (influx 1.8 cannot join sensor_test with testing_locations).
+#  The csv is read once per process and again only when it changes (csv_to_influx.py --watch), values are stripped
+#  (the file has spaces after the commas).
+#  sensor_position of the mission information (e.g. SALTSTEIN_E, position E at Saltstein) is looked up by normalized
+#  code: upper case, letters and digits only, Norwegian letters folded (Sjølyst -> SJOLYST), tried in this order
+#  - the whole position against code and location_name
+#  - the part before '_' against code and location_name
+#  - the first CODE_LENGTH letters of that part against code (codes are the first letters of the location name)
+#  Lookups are cached, a position without location is logged once and its points get no location tags.
+#  LOCATION_TAGS and LOCATION_FIELDS are named as in measurement 'testing_locations'
+#  (store_sensor_location_data_to_influx.py), so dashboards can use the same variables for both measurements.
+#  LocationState keeps a hash of each location written to 'testing_locations', so only changed rows are written again.
+
+import numpy as np
+import pandas as pd
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import logging
+
+from datetime import datetime as dt
+
+LOGGER = logging.getLogger(__name__)
+
+LOCATIONS_FILE = 'sensor_location_data.csv'
+TAG_COLUMNS = ['location_name', 'code', 'water_type_m']
+FIELD_COLUMNS = ['lat_deg', 'lon_deg', 'max_depth_m', 'sensor_depth_m']
+# tags and fields added to the pressure points
+LOCATION_TAGS = TAG_COLUMNS
+LOCATION_FIELDS = ['sensor_depth_m']
+CODE_LENGTH = 3
+# letters not decomposed by unicodedata
+FOLDED_LETTERS = str.maketrans({'Ø': 'O', 'Æ': 'AE', 'ß': 'SS'})
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS written_locations (
+    code TEXT PRIMARY KEY,
+    row_hash TEXT,
+    written_at TEXT
+);
+'''
+
+
+def normalize_code(value):
+    ''' upper case letters and digits of value without accents, 'Sjølyst Marina' -> 'SJOLYSTMARINA' '''
+    value = unicodedata.normalize('NFKD', str(value).strip().upper().translate(FOLDED_LETTERS))
+    return re.sub(r'[^A-Z0-9]', '', ''.join(char for char in value if not unicodedata.combining(char)))
+
+
+def read_locations(csv_path):
+    ''' locations of csv_path with stripped names and values, fields as floats, indexed by code '''
+    df = pd.read_csv(csv_path, sep=',', dtype=str, skipinitialspace=True, encoding='utf-8')
+    df.columns = [column.strip() for column in df.columns]
+    for column in df.columns:
+        df[column] = df[column].str.strip()
+    for column in FIELD_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float64)
+    df = df[df['code'].fillna('') != '']
+    return df.set_index('code', drop=False)
+
+
+class SensorLocations:
+    ''' locations of sensor_location_data.csv looked up by sensor_position '''
+
+    def __init__(self, locations):
+        self.locations = locations
+        self.by_code = {}
+        self.by_name = {}
+        for code, location in locations.iterrows():
+            self.by_code.setdefault(normalize_code(code), location)
+            self.by_name.setdefault(normalize_code(location['location_name']), location)
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def find(self, sensor_position):
+        ''' location (row of the csv) of sensor_position, see the lookup order above, None if not found '''
+        whole = normalize_code(sensor_position)
+        place = normalize_code(str(sensor_position).split('_')[0])
+        for key in [whole, place]:
+            if key in self.by_code:
+                return self.by_code[key]
+            if key in self.by_name:
+                return self.by_name[key]
+        return self.by_code.get(place[:CODE_LENGTH]) if len(place) > CODE_LENGTH else None
+
+    def lookup(self, sensor_position):
+        ''' cached find, a position without location is logged once '''
+        with self.lock:
+            if sensor_position not in self.cache:
+                location = self.find(sensor_position)
+                if location is None:
+                    LOGGER.warning(f"sensor position {sensor_position} not found in {LOCATIONS_FILE}, points written without location.")
+                else:
+                    LOGGER.info(f"sensor position {sensor_position} at {location['location_name']} ({location['code']}).")
+                self.cache[sensor_position] = location
+            return self.cache[sensor_position]
+
+    def location_columns(self, sensor_position, rows):
+        ''' LOCATION_TAGS (categorical, empty without location) and LOCATION_FIELDS of rows points of sensor_position '''
+        location = self.lookup(sensor_position)
+        codes = np.zeros(rows, dtype=np.int8)
+        columns = {}
+        for tag in LOCATION_TAGS:
+            value = '' if location is None or pd.isna(location[tag]) else location[tag]
+            columns[tag] = pd.Categorical.from_codes(codes, categories=[value])
+        for field in LOCATION_FIELDS:
+            columns[field] = np.full(rows, np.nan if location is None else location[field], dtype=np.float64)
+        return columns
+
+    def enrich(self, df):
+        ''' df (points of a single sensor file) with LOCATION_TAGS and LOCATION_FIELDS of its sensor_position '''
+        if df.shape[0] == 0:
+            return df
+        return df.assign(**self.location_columns(df['sensor_position'].iloc[0], df.shape[0]))
+
+
+# registries by path of the csv: (modification time, SensorLocations)
+REGISTRIES = {}
+REGISTRIES_LOCK = threading.Lock()
+
+
+def load_locations(csv_path=LOCATIONS_FILE):
+    ''' SensorLocations of csv_path, read again only when the file was modified, empty when it cannot be read '''
+    csv_path = os.path.abspath(csv_path)
+    try:
+        mtime = os.stat(csv_path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with REGISTRIES_LOCK:
+        if csv_path in REGISTRIES and REGISTRIES[csv_path][0] == mtime:
+            return REGISTRIES[csv_path][1]
+        try:
+            locations = read_locations(csv_path)
+            LOGGER.info(f"{locations.shape[0]} locations read from {csv_path}.")
+        except (OSError, ValueError, KeyError) as error:
+            LOGGER.error(f"locations not read from {csv_path}: {error}")
+            locations = pd.DataFrame(columns=TAG_COLUMNS + FIELD_COLUMNS).set_index('code', drop=False)
+        REGISTRIES[csv_path] = (mtime, SensorLocations(locations))
+        return REGISTRIES[csv_path][1]
+
+
+def location_hash(location):
+    ''' hash of the tags and fields of a location as written to testing_locations '''
+    values = {column: (None if pd.isna(location[column]) else location[column]) for column in TAG_COLUMNS + FIELD_COLUMNS}
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def location_hashes(locations):
+    ''' location_hash of each location of locations (read_locations), by code '''
+    return pd.Series([location_hash(location) for code, location in locations.iterrows()], index=locations.index, dtype=object)
+
+
+class LocationState:
+    ''' sqlite store of the hash of each location written to testing_locations '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.executescript(SCHEMA)
+
+    def changed(self, locations):
+        ''' rows of locations (read_locations) new or changed since they were last written, with their hashes '''
+        hashes = location_hashes(locations)
+        with self.lock:
+            written = dict(self.connection.execute('SELECT code, row_hash FROM written_locations').fetchall())
+        changed = np.array([written.get(code) != row_hash for code, row_hash in hashes.items()], dtype=bool)
+        return locations[changed], hashes[changed]
+
+    def record(self, hashes):
+        ''' records hashes (code -> hash) of locations written '''
+        written_at = dt.now().isoformat()
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO written_locations VALUES (?, ?, ?)',
+                [(code, row_hash, written_at) for code, row_hash in hashes.items()])
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -1,6 +1,10 @@
 #Anna Wojciechowska, Oslo, August 2024
 
 #  Script to write to influx db 1.8 location of testing data
+#  Only locations new or changed since the last run are written (upsert by code, the point of a changed location
+#  is stamped with the time of the run), hashes of written locations are kept in ingest_checkpoint.sqlite,
+#  --force writes all of them again. The same locations are joined into the pressure points by csv_to_influx.py,
+#  see sensor_locations.py
 #  
 #  This script is wrting to 
 #  database: 'sensor'
@@ -22,12 +26,7 @@
 # +-------------+-------+-------+------+------+----------------+
 
 
-from influxdb import DataFrameClient
-from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
-
-
 import pandas as pd
-import json
 
 import sys
 import os
@@ -39,32 +38,9 @@ import logging
 
 from datetime import datetime as dt
 
-
-
-
-def set_up_log(log_dir, log_filename):
-    # to do create log when does not exist even if folder exists
-    ''' creates a log in script running directory '''
-    script_run_dir = os.getcwd()
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
-    #check if log dir exist, create both log dir and log file if necessary
-    if not os.path.isdir(os.path.join(script_run_dir, log_dir)):
-        os.mkdir(os.path.join(script_run_dir, log_dir))
-    file_handler = logging.FileHandler(os.path.join(script_run_dir, log_dir, log_filename), mode='w')
-    file_handler.setFormatter(logging.Formatter(fmt='%(asctime)s [%(pathname)s:%(lineno)d] [%(levelname)s] %(message)s', datefmt='%a, %d %b %Y %H:%M:%S'))
-    logger = logging.getLogger()
-    logger.addHandler(file_handler)
-    logger.setLevel(logging.INFO)
-    return logger
-
-def get_script_name():
-    ''' gets a script name, log are named after the script '''
-    script_path = sys.argv[0]
-    path_elems = script_path.split('/')
-    script_name = path_elems[len(path_elems) - 1]
-    res = script_name.split('.py')
-    return res[0]
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_setup import set_up_log, get_script_name, open_influx_writer, store_points
+from sensor_locations import read_locations, location_hashes, LocationState, LOCATIONS_FILE, TAG_COLUMNS, FIELD_COLUMNS
 
 
 def read_settings_line(settings_line):
@@ -78,62 +54,51 @@ def read_settings_line(settings_line):
 
 
 
-def store_points(df, measurement_name, tags, fields):
-    try:
-        result = INFLUX_WRITE_CLIENT.write_points(df,measurement_name,tag_columns = tags, field_columns = fields,protocol='line')
-        if result:
-            LOGGER.info(f" {df.shape[0]} data points written.")
-            return (result,df.shape[0])
-        else: 
-            LOGGER.error(f"No data written.")
-            return (result,0)
-    except ConnectionError:
-            # thrown if influxdb is down or (spelling) errors in connection configuration
-            LOGGER.error("ConnectionError, check connection setting and if influxdb is up: 'systemctl status influxdb'.")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-    except InfluxDBClientError:
-            LOGGER.error("InfluxDBClientError, check if database exist in influx: 'SHOW DATABASES'.")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-    except InfluxDBServerError:
-            LOGGER.error("InfluxDBServerError")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-
-
-
-START_SCRIPT_TIME = dt.now()
-LOGNAME = get_script_name() + '.log'
+MEASUREMENT = 'testing_locations'
 LOG_DIR = 'logs'
-LOGGER = set_up_log(LOG_DIR, LOGNAME)
-
-LOGGER.info("start script")
-
-credentials_path = '../database_settings/influxdb_credentials'
-if not os.path.exists(os.path.join(os.getcwd(), credentials_path)):
-    LOGGER.error("influxdb_credentials file is missing")
-    sys.exit(1)
-influx_auth = json.load(open(os.path.join(os.getcwd(), credentials_path)))
-
-INFLUX_WRITE_CLIENT = DataFrameClient(
-    host = 'localhost',
-    port = 8086,
-    database ='sensor',
-    username = influx_auth['username'],
-    password = influx_auth['password'])
-
-parser = argparse.ArgumentParser()
-parser.add_argument('-d', '--dry-run', action='store_true',
-    help="does not write to database, just show result in csv file")
-args = parser.parse_args()
-
-locations_df = pd.read_table("./sensor_location_data.csv", sep = ',')
-if not args.dry_run:
-    tags = ['location_name', 'code', 'water_type_m']
-    fields = ['lat_deg', 'lon_deg', 'max_depth_m', 'sensor_depth_m']
-    locations_df['time'] = pd.to_datetime(dt.now())
-    locations_df.set_index('time', inplace=True)
-    store_points(locations_df, "testing_locations", tags, fields)
-
-LOGGER.info(f"end script script, duration: {dt.now() - START_SCRIPT_TIME} [ms]")
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--dry-run', action='store_true',
+        help="does not write to database, just show result in csv file")
+    parser.add_argument('--force', action='store_true',
+        help="writes all locations, also those not changed since the last run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, writers=None):
+    ''' runs the script in the current directory, argv without the script name (sys.argv[1:] by default) '''
+    ''' writers: InfluxWriters of ingest.py, by default the script creates and closes its own writer '''
+    start_script_time = dt.now()
+    set_up_log(LOG_DIR, get_script_name(__file__) + '.log', mode='w')
+
+    LOGGER.info("start script")
+    args = parse_arguments(argv)
+
+    influx_write_client = open_influx_writer(writers, 'sensor', get_script_name(__file__))
+
+    locations_df = read_locations(os.path.join(os.getcwd(), LOCATIONS_FILE))
+    location_state = LocationState(os.path.join(os.getcwd(), 'ingest_checkpoint.sqlite'))
+    changed_df, hashes = location_state.changed(locations_df)
+    if args.force:
+        changed_df = locations_df
+        hashes = location_hashes(locations_df)
+    LOGGER.info(f"{changed_df.shape[0]} of {locations_df.shape[0]} locations new or changed: {', '.join(changed_df['code'])}")
+    if not args.dry_run and not changed_df.empty:
+        changed_df = changed_df.reset_index(drop=True)
+        changed_df['time'] = pd.to_datetime(dt.now())
+        changed_df.set_index('time', inplace=True)
+        store_points(influx_write_client, changed_df, MEASUREMENT, TAG_COLUMNS, FIELD_COLUMNS)
+        location_state.record(hashes)
+    location_state.close()
+
+    LOGGER.info(influx_write_client.report())
+    if writers is None:
+        influx_write_client.close()
+    LOGGER.info(f"end script script, duration: {dt.now() - start_script_time} [ms]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Script to backfill wave parameters of hourly bursts from already processed OWHL files
+#  csv_to_influx.py writes wave parameters of each new file, this script computes them for all files
+#  in "sensor_processed" (or --data-dir, csv files and .owhl archives), e.g. for files written before, or with another --sensor-height.
+#  Files of a sensor are read one at a time in time order (archive_index.py, archive_index.sqlite as replay_to_influx.py),
+#  the rows of the last hour of a file are carried over to the next file, so bursts split between two files are complete
+#  and memory does not grow with the number of files (as stream_csv_and_store of csv_to_influx.py).
+#  Rows of a file before hours already computed from the previous files are left out (logged).
+#  Segments (files) are processed in one pool of --workers processes for the whole run, at most 2 x --workers segments
+#  are in flight and their wave parameters are written in time order, see data_processing/neumeier/wavesp.py
+#
+#  This script is wrting to
+#  database: 'sensor'
+#  measurement: 'sensor_test_waves'
+#  tags: 'sensor_model', 'sensor_position' and location tags of sensor_location_data.csv, see sensor_locations.py
+#  fields: h, Hm0, Tp, m0, H_significant, H_mean, H_10, H_max, T_mean, T_s (names as in wavesp.m, m and s)
+
+
+import pandas as pd
+
+import sys
+import os
+
+import argparse
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+import traceback
+import logging
+
+from datetime import datetime as dt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_setup import set_up_log, get_script_name, open_influx_writer, store_points
+from batch_writer import write_in_batches, DEFAULT_BATCH_SIZE
+
+from owhl_csv import read_sensor_file
+from owhl_archive import read_archive, ARCHIVE_EXTENSION
+from archive_index import ArchiveIndex
+from sensor_locations import load_locations, LOCATIONS_FILE, LOCATION_TAGS
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_processing', 'neumeier'))
+from wavesp import wave_parameters, wavesp_names
+
+
+
+def sensor_files(data_dir):
+    ''' OWHL csv files and archives in data_dir, returns dict (sensor_position, sensor_model) -> file paths in time order '''
+    ARCHIVE_INDEX.refresh(data_dir)
+    files = {}
+    for file_name, position, model, first_time, last_time, rows in ARCHIVE_INDEX.select():
+        file_path = os.path.join(data_dir, file_name)
+        if os.path.exists(file_path):
+            files.setdefault((position, model), []).append(file_path)
+    return files
+
+
+def read_pressure(file_path):
+    ''' pressure series of csv file or archive indexed by time, None when it could not be read '''
+    df, meta_data = read_archive(file_path) if file_path.endswith(ARCHIVE_EXTENSION) else read_sensor_file(file_path)
+    if df is None:
+        return None
+    return df.set_index('time')['pressure_mbar']
+
+
+def sensor_segments(file_paths):
+    ''' yields pressure series of file_paths (files of one sensor in time order) in segments ending at a full hour '''
+    ''' only one file and the last hour of the previous one are held in memory '''
+    carry, computed_until = None, None
+    for file_path in file_paths:
+        pressure = read_pressure(file_path)
+        if pressure is None or pressure.empty:
+            LOGGER.error(f"{file_path} could not be read, skipped.")
+            continue
+        if carry is not None:
+            late = pressure.index < computed_until
+            if late.any():
+                LOGGER.warning(f"{file_path}: {late.sum()} datapoints before {computed_until} (already computed) left out.")
+            pressure = pd.concat([carry, pressure[~late]])
+        pressure = pressure.sort_index(kind='stable')
+        pressure = pressure[~pressure.index.duplicated()]
+        computed_until = pressure.index.max().floor('1h')
+        carry = pressure[pressure.index >= computed_until]
+        yield pressure[pressure.index < computed_until]
+        del pressure
+    if carry is not None:
+        yield carry
+
+
+def store_waves(waves, position, model, write_run, stored):
+    ''' writes wave parameters of sensor, in a dry run to csv (replaced by the first segment of the sensor) '''
+    ''' stored: bursts of the sensor written before, returns it with the bursts of waves '''
+    if waves.empty:
+        return stored
+    first = stored == 0
+    waves['sensor_position'] = position
+    waves['sensor_model'] = model
+    waves = load_locations(LOCATIONS_FILE).enrich(waves)
+    if write_run:
+        write_in_batches(waves, lambda batch: store_points(INFLUX_WRITE_CLIENT, batch, WAVES_MEASUREMENT, TAGS, wavesp_names()), DEFAULT_BATCH_SIZE)
+    else:
+        waves.to_csv(f"{WAVES_MEASUREMENT}_{position}_{model}.csv", mode='w' if first else 'a', header=first)
+    return stored + waves.shape[0]
+
+
+def process_sensor(position, model, file_paths, write_run, executor):
+    ''' computes and writes wave parameters of the files of one sensor, segments run in executor (None: in this process) '''
+    start_processing = dt.now()
+    bursts, datapoints = 0, 0
+    pending = collections.deque()
+    for pressure in sensor_segments(file_paths):
+        datapoints += pressure.shape[0]
+        if executor is None:
+            bursts = store_waves(wave_parameters(pressure, args.sensor_height), position, model, write_run, bursts)
+            continue
+        pending.append(executor.submit(wave_parameters, pressure, args.sensor_height))
+        del pressure
+        # results are written in order, segments waiting for a worker are held in memory
+        if len(pending) >= 2 * args.workers:
+            bursts = store_waves(pending.popleft().result(), position, model, write_run, bursts)
+    while pending:
+        bursts = store_waves(pending.popleft().result(), position, model, write_run, bursts)
+    LOGGER.info(f"{position} {model}: wave parameters of {bursts} hourly bursts from {datapoints} datapoints of {len(file_paths)} files computed in {dt.now() - start_processing} [ms]")
+
+
+def process_data(data_dir, write_run):
+    ''' computes and writes wave parameters of hourly bursts of each sensor in data_dir '''
+    if not os.path.isdir(data_dir):
+        LOGGER.error(f"{data_dir} data folder is missng, aborting.")
+        sys.exit(1)
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        for (position, model), file_paths in sensor_files(data_dir).items():
+            process_sensor(position, model, file_paths, write_run, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+
+WAVES_MEASUREMENT = 'sensor_test_waves'
+TAGS = ['sensor_model', 'sensor_position'] + LOCATION_TAGS
+
+LOG_DIR = 'logs'
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--dry-run', action='store_true',
+        help="does not write to database, just show result in csv file")
+    parser.add_argument('--data-dir', default='sensor_processed',
+        help="directory with OWHL csv files")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+        help="number of processes computing wave parameters")
+    parser.add_argument('--sensor-height', type=float, default=None,
+        help="height of the sensor above seabed in m, used to correct wave parameters for pressure attenuation, not corrected by default")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, writers=None):
+    ''' runs the script in the current directory, argv without the script name (sys.argv[1:] by default) '''
+    ''' writers: InfluxWriters of ingest.py, by default the script creates and closes its own writer '''
+    global args, INFLUX_WRITE_CLIENT, ARCHIVE_INDEX
+    start_script_time = dt.now()
+    set_up_log(LOG_DIR, get_script_name(__file__) + '.log')
+
+    LOGGER.info("start script")
+    args = parse_arguments(argv)
+
+    INFLUX_WRITE_CLIENT = open_influx_writer(writers, 'sensor', get_script_name(__file__))
+    # time ranges of the processed files, shared with replay_to_influx.py
+    ARCHIVE_INDEX = ArchiveIndex(os.path.join(os.getcwd(), 'archive_index.sqlite'))
+
+    process_data(os.path.join(os.getcwd(), args.data_dir), not args.dry_run)
+
+    ARCHIVE_INDEX.close()
+    LOGGER.info(INFLUX_WRITE_CLIENT.report())
+    if writers is None:
+        INFLUX_WRITE_CLIENT.close()
+    LOGGER.info(f"end script script, duration: {dt.now() - start_script_time} [ms]")
+
+
+if __name__ == "__main__":
+    main()
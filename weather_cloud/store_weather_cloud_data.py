@@ -2,19 +2,16 @@
 #Anna Wojciechowska, Oslo, August 2025
 #  Script to process data from weather cloud
 #  The scripts reads csv "weather_cloud_data" directory and after successful read moved the file to "processed_data".
+#  Every export repeats months of history, the last written time of the station (high-water mark in
+#  ingest_checkpoint.sqlite) is kept and only rows after it are read, see weather_cloud_csv.py
 
 
 
-from influxdb import DataFrameClient
-
-from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
-from requests.exceptions import Timeout, ConnectionError
 
 from datetime import datetime
 
 import pandas as pd
 import numpy as np
-import json
 
 import sys
 import os
@@ -27,72 +24,39 @@ import logging
 
 from datetime import datetime as dt
 
-def store_points(df, tags, fields):
-    try:
-        result = INFLUX_WRITE_CLIENT.write_points(df,'weather_cloud',tag_columns = tags, field_columns = fields,protocol='line')
-        if result:
-            LOGGER.info(f" {df.shape[0]} data points written.")
-            return (result,df.shape[0])
-        else:  
-            LOGGER.error(f"No data written.")
-            return (result,0)
-    except ConnectionError:
-            # thrown if influxdb is down or (spelling) errors in connection configuration
-            LOGGER.error("ConnectionError, check connection setting and if influxdb is up: 'systemctl status influxdb'.")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-    except Timeout:
-            LOGGER.error("Timeout, check influx timeout setting and network connection.")
-            LOGGER.error(traceback.format_exc())
-    except InfluxDBClientError:
-            LOGGER.error("InfluxDBClientError, check if database exist in influx: 'SHOW DATABASES'.")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-    except InfluxDBServerError:
-            LOGGER.error("InfluxDBServerError")
-            LOGGER.error(traceback.format_exc())
-            sys.exit(1)
-  
-def set_up_log(log_dir, log_filename):
-    # to do create log when does not exist even if folder exists
-    ''' creates a log in script running directory '''
-    script_run_dir = os.getcwd()
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
-    #check if log dir exist, create both log dir and log file if necessary
-    if not os.path.isdir(os.path.join(script_run_dir, log_dir)):
-        os.mkdir(os.path.join(script_run_dir, log_dir))
-    file_handler = logging.FileHandler(os.path.join(script_run_dir, log_dir, log_filename), mode='w')
-    file_handler.setFormatter(logging.Formatter(fmt='%(asctime)s [%(pathname)s:%(lineno)d] [%(levelname)s] %(message)s', datefmt='%a, %d %b %Y %H:%M:%S'))
-    logger = logging.getLogger()
-    logger.addHandler(file_handler)
-    logger.setLevel(logging.INFO)
-    return logger
-
-def get_script_name():
-    ''' gets a script name, log are named after the script '''
-    script_path = sys.argv[0]
-    path_elems = script_path.split('/')
-    script_name = path_elems[len(path_elems) - 1]
-    res = script_name.split('.py')
-    return res[0]
-
-def proces_csv_and_store(full_file_path, write_run):
-    df = pd.read_csv(full_file_path, encoding="utf-16le", sep=";", index_col=0)
-    # I need to shift columns names to the left because column"Date (Europe/Oslo)" is already in index
-    df.columns =df.columns.to_list()[1:] + ['Unnamed']
-    columns_to_drop = ['Heat index (°C)', 'Gust of wind (m/s)', 'Average wind direction (°)', 'Unnamed: 14', 'Unnamed']
-    df.drop(columns=columns_to_drop, inplace=True)
-    new_columns = ['temp_c', 'wind_chill_c', 'dew_point_c', 'humidity_percent', 'average_wind_speed_m_s', 'atm_pressure_hpa', 'uv_index', 'alt_m', 'lat', 'lon']
-    df.columns = new_columns
-    df = df.dropna(how='all')
-    df.index = pd.to_datetime(df.index).tz_localize('Europe/Oslo').tz_convert('UTC')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from script_setup import set_up_log, get_script_name, open_influx_writer, store_points
+from batch_writer import write_in_batches, DEFAULT_BATCH_SIZE
+from ingest_checkpoint import IngestCheckpoint, file_content_hash
+
+from weather_cloud_csv import read_weather_cloud_file
+
+def store_in_batches(df, tags, fields, file_hash, filename):
+    ''' writes data frame in batches, written batches are recorded in CHECKPOINT '''
+    ''' the high-water mark of the station is advanced after each batch, so if the run is interrupted '''
+    ''' the next one reads only the rows after the last written batch '''
+    record_batch = CHECKPOINT.batch_recorder(file_hash)
+    def on_batch_written(start_row, end_row, batch):
+        record_batch(start_row, end_row, batch)
+        CHECKPOINT.advance_high_water_mark(STATION, batch.index[-1])
+    result, datapoints_count, batch_size = write_in_batches(df, lambda batch: store_points(INFLUX_WRITE_CLIENT, batch, MEASUREMENT, tags, fields),
+        DEFAULT_BATCH_SIZE, 0, on_batch_written)
+    if result:
+        CHECKPOINT.complete_file(file_hash, filename, datapoints_count)
+    return (result, datapoints_count)
+
+def proces_csv_and_store(full_file_path, write_run, file_hash=None):
+    ''' reads Weather Cloud export, rows up to the high-water mark of the station are not read '''
+    high_water_mark = None if args.all_rows else CHECKPOINT.high_water_mark(STATION)
+    df, skipped_rows = read_weather_cloud_file(full_file_path, high_water_mark)
+    if skipped_rows:
+        LOGGER.info(f"{skipped_rows} rows up to {high_water_mark} written before, not read.")
     fields = df.columns.to_list()
-    df['sensor_type'] = 'skywatch_bl_500'
-    df['position'] = 'Hospitveien 12b'
+    df['sensor_type'] = SENSOR_TYPE
+    df['position'] = POSITION
     tags = ['sensor_type', 'position']
     if write_run:
-        return store_points(df, tags, fields)
+        return store_in_batches(df, tags, fields, file_hash, os.path.basename(full_file_path))
 
 def process_data(write_run):
     ''' reads all csv from DATA_DIR, after successful writing they are moved to PROCESSED_DIR '''
@@ -112,7 +76,15 @@ def process_data(write_run):
         start_processing = dt.now()
         LOGGER.info(f"Trying to process: {f}")
         full_file_path = os.path.join(SCRIPT_DIR, DATA_DIR, f)
-        write_res = proces_csv_and_store(full_file_path, write_run)
+        file_hash = None
+        if write_run:
+            file_hash = file_content_hash(full_file_path)
+            if CHECKPOINT.is_completed(file_hash):
+                # file with the same content was already written
+                os.rename(full_file_path, os.path.join(SCRIPT_DIR, PROCESSED_DIR, f))
+                LOGGER.info(f"{f} was already written to influx, skipped.")
+                continue
+        write_res = proces_csv_and_store(full_file_path, write_run, file_hash)
         print(write_res)
         if (write_run and write_res[0]):
             dest_file_path = os.path.join(SCRIPT_DIR, PROCESSED_DIR, f)
@@ -123,31 +95,47 @@ def process_data(write_run):
     LOGGER.info(f"total processed {len(files)} files")
 
 
-START_SCRIPT_TIME = dt.now()
-LOGNAME = get_script_name() + '.log'
+MEASUREMENT = 'weather_cloud'
+SENSOR_TYPE = 'skywatch_bl_500'
+POSITION = 'Hospitveien 12b'
+# series of the high-water mark
+STATION = SENSOR_TYPE + ',' + POSITION
 LOG_DIR = 'logs'
-LOGGER = set_up_log(LOG_DIR, LOGNAME)
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--dry-run', action='store_true',
+        help="does not write to database, just show result in csv file")
+    parser.add_argument('--all-rows', action='store_true',
+        help="reads and writes all rows of the exports, also those before the last written time (e.g. after rebuilding the database)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, writers=None):
+    ''' runs the script in the current directory, argv without the script name (sys.argv[1:] by default) '''
+    ''' writers: InfluxWriters of ingest.py, by default the script creates and closes its own writer '''
+    global args, CHECKPOINT, INFLUX_WRITE_CLIENT
+    start_script_time = dt.now()
+    set_up_log(LOG_DIR, get_script_name(__file__) + '.log', mode='w')
+
+    LOGGER.info("start script")
+    args = parse_arguments(argv)
 
-LOGGER.info("start script")
+    # index of written files and batches, see ingest_checkpoint.py
+    CHECKPOINT = IngestCheckpoint(os.path.join(os.getcwd(), 'ingest_checkpoint.sqlite'))
 
-credentials_path = '../database_settings/influxdb_credentials'
-if not os.path.exists(os.path.join(os.getcwd(), credentials_path)):
-    LOGGER.error("influxdb_credentials file is missing")
-    sys.exit(1)
-influx_auth = json.load(open(os.path.join(os.getcwd(), credentials_path)))
+    # block versions of MEASUREMENT for the caches of influx_query_client.py
+    INFLUX_WRITE_CLIENT = open_influx_writer(writers, 'weather_cloud', get_script_name(__file__), block_markers={MEASUREMENT})
 
-INFLUX_WRITE_CLIENT = DataFrameClient(
-    host = 'localhost',
-    port = 8086,
-    database ='weather_cloud',
-    username = influx_auth['username'],
-    password = influx_auth['password'])
+    process_data(not args.dry_run)
 
-parser = argparse.ArgumentParser()
-parser.add_argument('-d', '--dry-run', action='store_true',
-    help="does not write to database, just show result in csv file")
-args = parser.parse_args()
+    LOGGER.info(INFLUX_WRITE_CLIENT.report())
+    if writers is None:
+        INFLUX_WRITE_CLIENT.close()
+    LOGGER.info(f"end script script, duration: {dt.now() - start_script_time} [ms]")
 
-process_data(not args.dry_run)
 
-LOGGER.info(f"end script script, duration: {dt.now() - START_SCRIPT_TIME} [ms]")
+if __name__ == "__main__":
+    main()
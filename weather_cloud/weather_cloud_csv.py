@@ -0,0 +1,134 @@
+#Anna Wojciechowska, Oslo, October 2026
+
+#  Reading of Weather Cloud csv exports into data frames ready to be written to influx.
+#  Exports are UTF-16LE, ';' separated, first column "Date (Europe/Oslo)" in local time, and each download
+#  repeats months of history. With after (high-water mark, last stored UTC time of the station) only the rows
+#  of the export after it are decoded and parsed:
+#  - the file is read as bytes, line starts are found on the UTF-16 code units (numpy), nothing is decoded
+#  - rows are ordered by time (ascending or descending), the first row after the mark is found by bisection,
+#    decoding only the dates of about log2(rows) lines
+#  - header line and the new lines are parsed as before (columns renamed, Europe/Oslo converted to UTC)
+#    and rows not after the mark are dropped, so the result does not depend on the cut being exact
+#  The cut is made CUT_MARGIN before the mark in local time, which covers the hour repeated when daylight
+#  saving time ends, the repeated hour is told apart by the order of the rows (local_to_utc). When dates of the export are not ordered the whole file is parsed and filtered.
+
+import numpy as np
+import pandas as pd
+
+import io
+import logging
+
+ENCODING = 'utf-16le'
+NEWLINE = 0x000A
+CUT_MARGIN = pd.Timedelta(hours=2)
+TIMEZONE = 'Europe/Oslo'
+COLUMNS_TO_DROP = ['Heat index (°C)', 'Gust of wind (m/s)', 'Average wind direction (°)', 'Unnamed: 14', 'Unnamed']
+FIELD_COLUMNS = ['temp_c', 'wind_chill_c', 'dew_point_c', 'humidity_percent', 'average_wind_speed_m_s', 'atm_pressure_hpa', 'uv_index', 'alt_m', 'lat', 'lon']
+
+LOGGER = logging.getLogger(__name__)
+
+
+def line_starts(data):
+    ''' byte offsets of the start of each line of UTF-16LE data, and of the end of data '''
+    units = np.frombuffer(data, dtype='<u2', count=len(data) // 2)
+    starts = (np.flatnonzero(units == NEWLINE) + 1) * 2
+    if starts.size == 0 or starts[-1] != len(data):
+        starts = np.append(starts, len(data))
+    return np.concatenate([[0], starts])
+
+
+def line_time(data, starts, line):
+    ''' local time of the date in the first column of line, None for an empty or unreadable line '''
+    text = data[starts[line]:starts[line + 1]].decode(ENCODING, errors='replace').strip()
+    try:
+        return pd.Timestamp(text.split(';', 1)[0].strip('"'))
+    except ValueError:
+        return None
+
+
+def transform_weather_cloud_data(df):
+    ''' renames the columns of Weather Cloud export and converts time to UTC, fields as stored in influx '''
+    # I need to shift columns names to the left because column"Date (Europe/Oslo)" is already in index
+    df.columns =df.columns.to_list()[1:] + ['Unnamed']
+    df = df.drop(columns=COLUMNS_TO_DROP)
+    df.columns = FIELD_COLUMNS
+    df = df.dropna(how='all')
+    df.index = local_to_utc(pd.to_datetime(df.index))
+    df = df[df.index.notna()]
+    return df
+
+
+def local_to_utc(times):
+    ''' Europe/Oslo times of the export to UTC, the hour repeated when daylight saving time ends is told apart '''
+    ''' by the order of the rows, times which cannot be told apart are NaT '''
+    descending = len(times) > 1 and times[0] > times[-1]
+    ordered = times[::-1] if descending else times
+    try:
+        local = ordered.tz_localize(TIMEZONE, ambiguous='infer', nonexistent='shift_forward')
+    except ValueError:
+        # only a part of the repeated hour is in the rows
+        LOGGER.warning("Times of the repeated hour at the end of daylight saving time could not be told apart, rows left out.")
+        local = ordered.tz_localize(TIMEZONE, ambiguous='NaT', nonexistent='shift_forward')
+    local = local[::-1] if descending else local
+    return local.tz_convert('UTC')
+
+
+def empty_frame():
+    ''' data frame without rows as returned by transform_weather_cloud_data '''
+    return pd.DataFrame(columns=FIELD_COLUMNS, index=pd.DatetimeIndex([], tz='UTC'), dtype=float)
+
+
+def new_lines(data, starts, after):
+    ''' (first, last) data line (header is line 0) which can be after the mark, None when lines are not ordered '''
+    first, last = 1, len(starts) - 2
+    while last >= first and line_time(data, starts, last) is None:
+        last -= 1
+    if last < first:
+        return (first, first - 1)
+    first_time, last_time = line_time(data, starts, first), line_time(data, starts, last)
+    if first_time is None:
+        return None
+    ascending = first_time <= last_time
+    cut = after.tz_convert(TIMEZONE).tz_localize(None) - CUT_MARGIN
+    # bisection for the boundary between lines up to cut and lines after it
+    low, high = first, last + 1
+    previous = {first: first_time, last: last_time}
+    while low < high:
+        middle = (low + high) // 2
+        middle_time = line_time(data, starts, middle)
+        if middle_time is None:
+            return None
+        previous[middle] = middle_time
+        if (middle_time <= cut) == ascending:
+            low = middle + 1
+        else:
+            high = middle
+    # probed lines must be ordered, otherwise the cut is not reliable
+    probed = [previous[line] for line in sorted(previous)]
+    if probed != sorted(probed, reverse=not ascending):
+        return None
+    return (low, last) if ascending else (first, low - 1)
+
+
+def read_weather_cloud_file(file_path, after=None):
+    ''' reads Weather Cloud export at file_path, with after (UTC timestamp) only rows after it '''
+    ''' returns (data frame indexed by UTC time, number of data lines not decoded) '''
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    starts = line_starts(data)
+    skipped = 0
+    if after is not None and len(starts) > 2:
+        lines = new_lines(data, starts, after)
+        if lines is None:
+            LOGGER.info(f"{file_path}: dates are not ordered, whole file is parsed.")
+        else:
+            first, last = lines
+            skipped = (len(starts) - 2) - max(0, last - first + 1)
+            if last < first:
+                return empty_frame(), skipped
+            data = data[:starts[1]] + data[starts[first]:starts[last + 1]]
+    df = pd.read_csv(io.BytesIO(data), encoding=ENCODING, sep=";", index_col=0)
+    df = transform_weather_cloud_data(df)
+    if after is not None:
+        df = df[df.index > after]
+    return df, skipped